@@ -0,0 +1,2 @@
+# -*- coding: utf-8 -*-
+"""彩虹打字大冒险的运行时支撑模块（渲染缓存等），供 type_game.py 与 tools/ 复用。"""
@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+"""
+逐键记录分析：每个字符/音节的正确率、反应时间中位数与 p95、按周趋势，以及出题权重。
+
+- load_keystrokes(path)：把 data/keystrokes.bin 读成列式的 KeystrokeTable（NumPy 数组）；
+  所有数据块的 varint 列拼接后一次性向量化解码
+- key_stats(table, by)：按应按字符（by='char'）或目标文字（by='text'，拼音音节）分组统计
+- weekly_trend(table, by)：按 (周, 字符/音节) 分组统计
+- weakness_weights(table, items)：正确率低、反应慢的字母/音节权重更高；WeightedSampler 按权重出题
+
+分组全部用 np.unique + bincount，分位数用 lexsort 后按组偏移取值，不做逐条的 Python 字典循环。
+需要 NumPy；未安装时 available 为 False，游戏照常均匀随机出题。
+"""
+import bisect
+import random
+import time
+from datetime import datetime
+
+from engine.keylog import COLUMNS, decode_header, iter_blocks
+from engine.storage import period_key
+
+try:
+    import numpy as np
+except ImportError:  # 没有 NumPy 时不提供分析功能
+    np = None
+
+available = np is not None
+
+
+def _decode_varints(buf, count):
+    """向量化解码 buf（uint8 数组）开头的 count 个 varint，返回 int64 数组。"""
+    if count == 0:
+        return np.zeros(0, dtype=np.int64)
+    ends = np.flatnonzero(buf < 0x80)[:count]
+    used = buf[:ends[-1] + 1]
+    starts = np.empty(count, dtype=np.int64)
+    starts[0] = 0
+    starts[1:] = ends[:-1] + 1
+    group = np.repeat(np.arange(count), ends - starts + 1)
+    shift = ((np.arange(len(used)) - starts[group]) * 7).astype(np.uint64)
+    values = (used & 0x7F).astype(np.uint64) << shift
+    return np.add.reduceat(values, starts).astype(np.int64)
+
+
+class KeystrokeTable:
+    """列式逐键数据：每个属性都是长度为 N 的 NumPy 数组（texts/weeks 为对应的标签表）。"""
+
+    def __init__(self, texts, weeks, session_level, session_end, columns):
+        self.texts = texts                  # 目标文字表（全局去重）
+        self.weeks = weeks                  # 周标签表，如 2025-W48
+        self.session_level = session_level  # 每局的模式
+        self.session_end = session_end      # 每局结束时间（Unix 秒）
+        for name, values in columns.items():
+            setattr(self, name, values)
+
+    def __len__(self):
+        return len(self.expected)
+
+    def select(self, mask):
+        """按布尔掩码筛选事件，返回新的 KeystrokeTable（标签表共用）。"""
+        cols = {name: getattr(self, name)[mask] for name in EVENT_FIELDS}
+        return KeystrokeTable(self.texts, self.weeks, self.session_level, self.session_end, cols)
+
+
+# session, level, week：所属局的下标/模式/周下标；text：全局文字下标；expected/typed：字符码（typed 为 0 表示未按键）
+EVENT_FIELDS = ('session', 'level', 'week', 't_ms', 'text', 'expected', 'typed', 'hit', 'react_ms')
+
+
+def load_keystrokes(path, since=None):
+    """读取逐键记录文件。since（Unix 秒）只保留此后结束的局。"""
+    texts, text_ids = [], {}
+    weeks, week_ids = [], {}
+    levels, ends, counts, tails, local_maps, session_weeks = [], [], [], [], [], []
+    for payload in iter_blocks(path):
+        level, end_ts, _dropped, local_texts, n, pos = decode_header(payload)
+        if since is not None and end_ts < since:
+            continue
+        mapping = []
+        for t in local_texts:
+            tid = text_ids.get(t)
+            if tid is None:
+                tid = text_ids[t] = len(texts)
+                texts.append(t)
+            mapping.append(tid)
+        label = period_key('weekly', datetime.fromtimestamp(end_ts).isoformat(timespec='seconds'))
+        wid = week_ids.get(label)
+        if wid is None:
+            wid = week_ids[label] = len(weeks)
+            weeks.append(label)
+        levels.append(level)
+        ends.append(end_ts)
+        counts.append(n)
+        tails.append(payload[pos:])
+        local_maps.append(mapping)
+        session_weeks.append(wid)
+
+    if not counts or not sum(counts):
+        empty = {name: np.zeros(0, dtype=np.int64) for name in EVENT_FIELDS}
+        empty['hit'] = np.zeros(0, dtype=bool)
+        return KeystrokeTable(texts, weeks, np.array(levels, dtype=np.uint8), np.array(ends, dtype=np.int64), empty)
+
+    n_cols = len(COLUMNS)
+    counts = np.array(counts, dtype=np.int64)
+    total = int(counts.sum())
+    # 每个数据块的 varint 恰好占满头部之后的部分，拼接后一次解码
+    values = _decode_varints(np.frombuffer(b''.join(tails), dtype=np.uint8), total * n_cols)
+    session = np.repeat(np.arange(len(counts), dtype=np.int32), counts)
+    # 每局的值按列排列：[dt × n, text × n, expected × n, typed × n, react × n]
+    event_start = np.cumsum(counts) - counts
+    block_start = event_start * n_cols
+    base = block_start[session] + (np.arange(total, dtype=np.int64) - event_start[session])
+    col = {name: values[base + k * counts[session]] for k, name in enumerate(COLUMNS)}
+
+    # 局内文字下标 → 全局下标
+    map_sizes = np.array([len(m) for m in local_maps], dtype=np.int64)
+    map_offsets = np.cumsum(map_sizes) - map_sizes
+    flat_map = np.array([tid for m in local_maps for tid in m], dtype=np.int32)
+    text = flat_map[map_offsets[session] + col['text']]
+
+    # 局内时间差 → 局内时间（全局累加后减去每局开始前的累计值）
+    t_ms = np.cumsum(col['dt_ms'])
+    t_ms -= (t_ms - col['dt_ms'])[event_start][session]
+
+    typed_code = col['typed'] >> 1
+    expected = col['expected'].astype(np.int32)
+    typed = np.where(typed_code == 0, expected, np.where(typed_code == 1, 0, typed_code - 2)).astype(np.int32)
+    session_level = np.array(levels, dtype=np.uint8)
+    columns = {
+        'session': session,
+        'level': session_level[session],
+        'week': np.array(session_weeks, dtype=np.int32)[session],
+        't_ms': t_ms,
+        'text': text,
+        'expected': expected,
+        'typed': typed,
+        'hit': (col['typed'] & 1).astype(bool),
+        'react_ms': col['react_ms'].astype(np.float64),
+    }
+    return KeystrokeTable(texts, weeks, session_level, np.array(ends, dtype=np.int64), columns)
+
+
+def _group_quantiles(groups, values, n_groups, qs):
+    """每组的分位数（取排序后 floor(q * (count - 1)) 处的值），空组为 NaN。"""
+    order = np.lexsort((values, groups))
+    sorted_values = values[order]
+    counts = np.bincount(groups, minlength=n_groups)
+    starts = np.cumsum(counts) - counts
+    out = []
+    for q in qs:
+        idx = starts + np.floor(q * np.maximum(counts - 1, 0)).astype(np.int64)
+        res = np.full(n_groups, np.nan)
+        nonempty = counts > 0
+        res[nonempty] = sorted_values[idx[nonempty]]
+        out.append(res)
+    return out
+
+
+def _keys(table, by):
+    if by == 'text':
+        return table.text, lambda k: table.texts[k]
+    return table.expected, chr
+
+
+def _aggregate(keys, table, n_groups):
+    attempts = np.bincount(keys, minlength=n_groups)
+    hits = np.bincount(keys, weights=table.hit, minlength=n_groups)
+    fallen = np.bincount(keys, weights=table.typed == 0, minlength=n_groups)
+    hit = table.hit
+    median, p95 = _group_quantiles(keys[hit], table.react_ms[hit], n_groups, (0.5, 0.95))
+    return attempts, hits, fallen, median, p95
+
+
+def key_stats(table, by='char'):
+    """按字符（by='char'）或目标文字（by='text'）统计，返回按正确率升序的行列表：
+    {'key', 'attempts', 'hits', 'accuracy', 'fallen', 'median_ms', 'p95_ms'}；反应时间只统计按对的按键。
+    """
+    raw, label = _keys(table, by)
+    uniq, inv = np.unique(raw, return_inverse=True)
+    attempts, hits, fallen, median, p95 = _aggregate(inv, table, len(uniq))
+    rows = []
+    for i, k in enumerate(uniq.tolist()):
+        rows.append({
+            'key': label(k),
+            'attempts': int(attempts[i]),
+            'hits': int(hits[i]),
+            'accuracy': round(float(hits[i] / attempts[i]), 4),
+            'fallen': int(fallen[i]),
+            'median_ms': None if np.isnan(median[i]) else int(median[i]),
+            'p95_ms': None if np.isnan(p95[i]) else int(p95[i]),
+        })
+    rows.sort(key=lambda r: (r['accuracy'], -(r['median_ms'] or 0)))
+    return rows
+
+
+def weekly_trend(table, by='char'):
+    """按 (周, 字符/音节) 统计，返回按周、键排序的行列表：
+    {'week', 'key', 'attempts', 'accuracy', 'median_ms'}
+    """
+    raw, label = _keys(table, by)
+    uniq, inv = np.unique(raw, return_inverse=True)
+    combined = table.week.astype(np.int64) * len(uniq) + inv
+    groups, ginv = np.unique(combined, return_inverse=True)
+    attempts, hits, _fallen, median, _p95 = _aggregate(ginv, table, len(groups))
+    rows = []
+    for i, g in enumerate(groups.tolist()):
+        week, k = divmod(g, len(uniq))
+        rows.append({
+            'week': table.weeks[week],
+            'key': label(int(uniq[k])),
+            'attempts': int(attempts[i]),
+            'accuracy': round(float(hits[i] / attempts[i]), 4),
+            'median_ms': None if np.isnan(median[i]) else int(median[i]),
+        })
+    rows.sort(key=lambda r: (r['week'], r['key']))
+    return rows
+
+
+def weakness_weights(table, items, prior=5.0, min_weight=0.5, max_weight=4.0):
+    """items（某一关卡的题目列表）中每个题目的出题权重，按目标文字统计。
+
+    错误率与反应时间中位数都向全体平均值收缩（相当于额外加 prior 次平均表现），
+    权重 = (错误率 / 平均错误率) × (反应时间 / 平均反应时间)，限制在 [min_weight, max_weight]。
+    没有任何记录时返回 None（均匀出题）。
+    """
+    index = {t: i for i, t in enumerate(table.texts)}
+    wanted = np.array([index.get(t, -1) for t in items], dtype=np.int64)
+    if not len(table) or (wanted < 0).all():
+        return None
+    n_texts = len(table.texts)
+    attempts, hits, _fallen, median, _p95 = _aggregate(table.text, table, n_texts)
+    known = wanted >= 0
+    sel = wanted[known]
+    att = np.zeros(len(items))
+    miss = np.zeros(len(items))
+    med = np.full(len(items), np.nan)
+    att[known] = attempts[sel]
+    miss[known] = attempts[sel] - hits[sel]
+    med[known] = median[sel]
+    total = att.sum()
+    if total == 0:
+        return None
+    err_avg = max(miss.sum() / total, 1e-3)
+    have_med = ~np.isnan(med)
+    med_avg = float(np.average(med[have_med], weights=att[have_med])) if have_med.any() else 0.0
+    err = (miss + prior * err_avg) / (att + prior)
+    weights = err / err_avg
+    if med_avg > 0:
+        med_filled = np.where(have_med, med, med_avg)
+        weights *= (med_filled * att + prior * med_avg) / (att + prior) / med_avg
+    weights = np.clip(weights, min_weight, max_weight)
+    return {t: float(w) for t, w in zip(items, weights)}
+
+
+class WeightedSampler:
+    """按权重随机选题：累积权重 + 二分查找，每次 O(log n)。"""
+
+    def __init__(self, items, weights=None):
+        self.items = list(items)
+        weights = weights or {}
+        self.weights = [float(weights.get(t, 1.0)) for t in self.items]
+        self._cum = []
+        acc = 0.0
+        for w in self.weights:
+            acc += w
+            self._cum.append(acc)
+        self._total = acc
+
+    def choice(self, rng=random):
+        return self.items[bisect.bisect_right(self._cum, rng.random() * self._total)]
+
+
+def level_samplers(path, levels, days=28, base_weights=None):
+    """按最近 days 天的逐键记录为每个关卡构建 WeightedSampler；没有 NumPy 或没有记录的关卡不在结果中。
+
+    base_weights 为 {关卡: {题目: 关卡包中的权重}}，与薄弱项权重相乘。"""
+    if not available:
+        return {}
+    table = load_keystrokes(path, since=time.time() - days * 86400 if days else None)
+    samplers = {}
+    for level, items in levels.items():
+        weights = weakness_weights(table, items)
+        if weights:
+            base = (base_weights or {}).get(level)
+            if base:
+                weights = {t: w * base.get(t, 1.0) for t, w in weights.items()}
+            samplers[level] = WeightedSampler(items, weights)
+    return samplers
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+asyncio 主循环的支撑部件：帧循环、成绩写入、遥测都是同一个事件循环里的协程（见 Game.run_async）。
+
+- FramePacer：按帧率上限 await 到下一帧的截止时间（绝对时间，不累积误差），等待期间事件循环
+  可以运行其他协程；不限帧率时每帧只让出一次控制权
+- WriteBehind：成绩记录与逐键记录的后写队列。游戏线程只把记录放进队列（O(1)，不碰磁盘），
+  后台协程在有新记录后等 max_delay 秒攒成一批，交给单线程 executor 写入：
+  同一存储的多条成绩合并成一次 extend（SQLite 为一个事务）。flush() 可在任意线程同步写出
+  （切换档案、生成报表、退出前调用），写入线程与调用方用锁串行，写入失败只计数，不影响游戏
+- serve_telemetry：本机遥测（占位）。TYPE_GAME_TELEMETRY=<端口> 时在 127.0.0.1 上监听，
+  每个连接每秒收到一行 JSON 状态快照，供以后的外部面板使用
+
+按键到画面的路径上不再有任何磁盘 I/O；同一个循环在无窗口模式下同样运行（bench_frames 与测试都走这里）。
+"""
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class FramePacer:
+    def __init__(self, fps):
+        self.period = 1.0 / fps if fps else 0.0
+        self._deadline = None
+
+    async def wait(self):
+        if not self.period:
+            await asyncio.sleep(0)
+            return
+        now = time.perf_counter()
+        if self._deadline is None or now - self._deadline > self.period:
+            # 落后超过一帧时不追赶，从现在重新计时
+            self._deadline = now
+        self._deadline += self.period
+        delay = self._deadline - now
+        await asyncio.sleep(delay if delay > 0 else 0)
+
+
+class WriteBehind:
+    def __init__(self, max_delay=0.5):
+        self.max_delay = max_delay
+        self._lock = threading.Lock()     # 保护待写队列
+        self._io_lock = threading.Lock()  # 同一时间只有一个线程在写
+        self._pending = []                # [(种类, 目标, 内容)]
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='persist')
+        self._wake = None                 # run() 运行期间的 asyncio.Event
+        self.written = 0
+        self.batches = 0
+        self.errors = 0
+        self.last_error = None
+
+    def __len__(self):
+        with self._lock:
+            return len(self._pending)
+
+    def add_session(self, store, rec):
+        """排队写入一局成绩（store.extend）。只能在事件循环所在的线程调用。"""
+        self._put(('session', store, rec))
+
+    def add_keylog(self, log, payload):
+        """排队写入一局逐键记录（log.append_payload，压缩也在写入线程中完成）。"""
+        self._put(('keylog', log, payload))
+
+    def _put(self, entry):
+        with self._lock:
+            self._pending.append(entry)
+        if self._wake is not None:
+            self._wake.set()
+
+    def flush(self):
+        """同步写出所有待写记录（任意线程都可调用），返回写出的条数。"""
+        with self._io_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return 0
+            sessions = {}
+            for kind, target, item in batch:
+                if kind == 'session':
+                    sessions.setdefault(id(target), (target, []))[1].append(item)
+                else:
+                    self._write(target.append_payload, item)
+            for store, records in sessions.values():
+                self._write(store.extend, records)
+            self.written += len(batch)
+            self.batches += 1
+            return len(batch)
+
+    def _write(self, fn, arg):
+        try:
+            fn(arg)
+        except Exception as e:
+            self.errors += 1
+            self.last_error = e
+
+    async def run(self):
+        """后台协程：有新记录后等 max_delay 秒攒一批，再交给写入线程。"""
+        loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        if len(self):
+            self._wake.set()
+        try:
+            while True:
+                await self._wake.wait()
+                await asyncio.sleep(self.max_delay)
+                self._wake.clear()
+                await loop.run_in_executor(self._executor, self.flush)
+        finally:
+            self._wake = None
+
+    async def drain(self):
+        """在写入线程中写出剩余记录并等待完成。"""
+        await asyncio.get_running_loop().run_in_executor(self._executor, self.flush)
+
+    def close(self):
+        self.flush()
+        self._executor.shutdown(wait=True)
+
+    def stats(self):
+        return {'pending': len(self), 'written': self.written, 'batches': self.batches, 'errors': self.errors}
+
+
+async def serve_telemetry(snapshot, port, host='127.0.0.1', interval=1.0):
+    """启动遥测服务：每个连接每 interval 秒收到一行 snapshot() 的 JSON。返回 asyncio 服务器（调用方负责 close）。"""
+    async def handle(reader, writer):
+        try:
+            while True:
+                writer.write((json.dumps(snapshot(), ensure_ascii=False) + '\n').encode('utf-8'))
+                await writer.drain()
+                await asyncio.sleep(interval)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+"""
+字形图集：每种字体、每种颜色把用到的字符各光栅化一次（预先着色），
+目标文字按字符取字形，所有目标每帧用一次 Surface.blits() 画完。
+
+- GlyphAtlasBank(font)：同一字体的所有颜色共用一套字符集与字宽；新字符出现时所有颜色一起补齐（很少发生）
+- prepare(colors, chars)：开始一关时为调色板颜色预先生成字形，练习中不再光栅化
+- batch(items, done_color)：把 [(text, color, x, y, done), ...] 转成 blits 序列与各目标的区域，
+  已打出的前 done 个字符取自 done_color 的字形（不再整段重画一遍灰色覆盖）
+
+每帧的绘制调用只有一次 blits，序列长度等于可见字符数；每段文字的排布（字符、横向偏移、总宽）按文字缓存。
+命中率按字形统计：batch 取用的字形为 lookups，其中在 batch 中才光栅化的（没有预先 prepare）为 misses。
+字形各自是一张小 Surface 而不是拼在一张大图上：软件渲染时从大图中按子区域 blit 明显更慢
+（每行都跨过整张图的行宽），实测约慢 30%。
+"""
+import pygame
+
+
+class GlyphAtlasBank:
+    def __init__(self, font):
+        self.font = font
+        self.height = 0
+        self._advance = {}  # 字符 -> 字宽
+        self._glyphs = {}   # 颜色 -> {字符: Surface}
+        self._layouts = {}  # 文字 -> ((字符, 横向偏移), ...), 总宽
+        self.rasterized = 0  # 光栅化的字形数量
+        self.lookups = 0     # batch 取用的字形数量
+        self.misses = 0      # 其中当场光栅化的数量
+
+    def __len__(self):
+        return len(self._advance)
+
+    def _render(self, ch, color):
+        surf = self.font.render(ch, True, color)
+        self.rasterized += 1
+        return surf.convert_alpha() if pygame.display.get_surface() is not None else surf
+
+    def _add_chars(self, chars):
+        new = [ch for ch in dict.fromkeys(chars) if ch not in self._advance]
+        if not new:
+            return
+        font = self.font
+        self.height = font.get_height()
+        for ch in new:
+            self._advance[ch] = font.size(ch)[0]
+        # 已有颜色一起补齐
+        for color, table in self._glyphs.items():
+            for ch in new:
+                table[ch] = self._render(ch, color)
+
+    def glyphs(self, color):
+        """color 颜色的字形表 {字符: Surface}（首次使用时生成）。"""
+        color = tuple(color)
+        table = self._glyphs.get(color)
+        if table is None:
+            table = self._glyphs[color] = {ch: self._render(ch, color) for ch in self._advance}
+        return table
+
+    def prepare(self, colors, chars):
+        """预先生成 colors 中各颜色、包含 chars 全部字符的字形。"""
+        self._add_chars(chars)
+        for color in colors:
+            self.glyphs(color)
+
+    def layout(self, text):
+        """((字符, 横向偏移), ...), 总宽"""
+        lay = self._layouts.get(text)
+        if lay is None:
+            self._add_chars(text)
+            glyphs = []
+            dx = 0
+            for ch in text:
+                glyphs.append((ch, dx))
+                dx += self._advance[ch]
+            lay = self._layouts[text] = (tuple(glyphs), dx)
+        return lay
+
+    def batch(self, items, done_color):
+        """返回 (blits 序列, 各目标区域 Rect 列表)，items 为 [(text, color, x, y, done), ...]。"""
+        seq = []
+        rects = []
+        rasterized = self.rasterized
+        append = seq.append
+        layouts = self._layouts
+        tables = self._glyphs
+        if not self.height:
+            self.height = self.font.get_height()
+        done_table = self.glyphs(done_color)
+        h = self.height
+        Rect = pygame.Rect
+        for text, color, x, y, done in items:
+            glyphs, width = layouts.get(text) or self.layout(text)
+            table = tables.get(color) or self.glyphs(color)
+            if done:
+                for k, (ch, dx) in enumerate(glyphs):
+                    append(((done_table if k < done else table)[ch], (x + dx, y)))
+            else:
+                for ch, dx in glyphs:
+                    append((table[ch], (x + dx, y)))
+            rects.append(Rect(x, y, width, h))
+        self.lookups += len(seq)
+        self.misses += self.rasterized - rasterized
+        return seq, rects
+
+    @property
+    def hit_rate(self):
+        return 1.0 - self.misses / self.lookups if self.lookups else 0.0
+
+    def stats(self):
+        return {'glyphs': len(self._advance), 'colors': len(self._glyphs), 'layouts': len(self._layouts),
+                'rasterized': self.rasterized, 'lookups': self.lookups, 'misses': self.misses,
+                'hit_rate': round(self.hit_rate, 4)}
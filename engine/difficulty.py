@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+自适应难度：根据最近的表现实时调整目标下落速度和生成间隔。
+
+输入两类事件（都是 O(1)，不影响按键响应）：
+- hit(latency)：打完一个目标，latency 为从出现到打完的秒数
+- miss(count)：有目标落出屏幕
+
+滑动窗口内维护命中率与平均反应时间（deque + 累加和）。每个事件之后按
+  误差 = (命中率 - 目标命中率) + latency_weight * (目标时间占比 - 实际时间占比)
+调整难度系数 level：level *= exp(gain * 误差)，并限制在 [min_level, max_level]。
+“时间占比”是平均反应时间 / 目标从顶部落到底部所需的时间，反映孩子还有多少余量。
+
+speed = base_speed * level，spawn_interval = base_interval / level。
+"""
+import math
+from collections import deque
+
+
+class DifficultyEngine:
+    def __init__(self, base_speed=60.0, base_interval=2.0, fall_distance=650.0, target_success=0.8,
+                 target_time_share=0.5, window=20, min_samples=5, gain=0.08, latency_weight=0.5,
+                 min_level=0.6, max_level=3.0):
+        self.base_speed = base_speed
+        self.base_interval = base_interval
+        self.fall_distance = fall_distance
+        self.target_success = target_success
+        self.target_time_share = target_time_share
+        self.min_samples = min_samples
+        self.gain = gain
+        self.latency_weight = latency_weight
+        self.min_level = min_level
+        self.max_level = max_level
+        self.level = 1.0
+        # 命中/落地结果（1/0）与最近命中的反应时间，各自维护累加和
+        self._outcomes = deque(maxlen=window)
+        self._outcome_sum = 0
+        self._latencies = deque(maxlen=window)
+        self._latency_sum = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def speed(self):
+        return self.base_speed * self.level
+
+    @property
+    def spawn_interval(self):
+        return self.base_interval / self.level
+
+    @property
+    def success_rate(self):
+        n = len(self._outcomes)
+        return self._outcome_sum / n if n else None
+
+    @property
+    def avg_latency(self):
+        n = len(self._latencies)
+        return self._latency_sum / n if n else None
+
+    def hit(self, latency):
+        self.hits += 1
+        window = self._latencies
+        if len(window) == window.maxlen:
+            self._latency_sum -= window[0]
+        window.append(latency)
+        self._latency_sum += latency
+        self._record(1)
+
+    def miss(self, count=1):
+        for _ in range(count):
+            self.misses += 1
+            self._record(0)
+
+    def _record(self, outcome):
+        window = self._outcomes
+        if len(window) == window.maxlen:
+            self._outcome_sum -= window[0]
+        window.append(outcome)
+        self._outcome_sum += outcome
+        if len(window) >= self.min_samples:
+            self._adjust()
+
+    def _adjust(self):
+        error = self.success_rate - self.target_success
+        latency = self.avg_latency
+        if latency is not None:
+            # 以当前速度从顶部落到底部需要的时间
+            fall_time = self.fall_distance / self.speed
+            error += self.latency_weight * (self.target_time_share - latency / fall_time)
+        level = self.level * math.exp(self.gain * error)
+        self.level = min(self.max_level, max(self.min_level, level))
+
+    def snapshot(self):
+        """当前状态（用于界面显示或记录）。"""
+        return {
+            'level': round(self.level, 3),
+            'speed': round(self.speed, 1),
+            'spawn_interval': round(self.spawn_interval, 3),
+            'success_rate': self.success_rate,
+            'avg_latency': self.avg_latency,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
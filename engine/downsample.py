@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+折线图降采样：任意长的序列最终都只保留约 max_points 个点。
+
+- lttb(points, n)：Largest-Triangle-Three-Buckets，按桶保留与相邻桶形成最大三角形面积的点，
+  保持曲线的峰谷形状
+- StreamingSeries：流式接收点，内存有上界。每个桶保存首点、最低点、最高点；桶数超过
+  2 * max_points 时相邻两桶合并（每桶覆盖的点数翻倍）。points() 再对候选点做一次 LTTB，
+  结果总是不超过 max_points 个点；点数不超过 max_points 时原样保留。
+
+点的格式为 (x, label, value)，x 为序号（决定横坐标），label 用于坐标轴文字。
+"""
+
+
+def lttb(points, n):
+    """把 points 降到 n 个点（n >= 3），保留首尾；点数不超过 n 时原样返回。"""
+    size = len(points)
+    if n >= size or n < 3:
+        return list(points)
+    out = [points[0]]
+    bucket = (size - 2) / (n - 2)
+    a = 0
+    for i in range(n - 2):
+        start = int(i * bucket) + 1
+        end = int((i + 1) * bucket) + 1
+        # 下一个桶的平均点
+        nstart = end
+        nend = min(int((i + 2) * bucket) + 1, size)
+        if nstart >= nend:
+            nstart, nend = size - 1, size
+        count = nend - nstart
+        avg_x = sum(p[0] for p in points[nstart:nend]) / count
+        avg_y = sum(p[2] for p in points[nstart:nend]) / count
+        ax, ay = points[a][0], points[a][2]
+        best = start
+        best_area = -1.0
+        for j in range(start, end):
+            px, py = points[j][0], points[j][2]
+            area = abs((ax - avg_x) * (py - ay) - (ax - px) * (avg_y - ay))
+            if area > best_area:
+                best_area = area
+                best = j
+        out.append(points[best])
+        a = best
+    out.append(points[-1])
+    return out
+
+
+class StreamingSeries:
+    def __init__(self, max_points=1000):
+        self.max_points = max(3, int(max_points))
+        self.span = 1      # 每个桶覆盖的点数
+        self.count = 0
+        self._buckets = []  # [first, low, high]
+        self._last = None
+
+    def __len__(self):
+        return self.count
+
+    def add(self, x, label, value):
+        point = (x, label, value)
+        self._last = point
+        if self.count % self.span == 0:
+            self._buckets.append([point, point, point])
+            if len(self._buckets) > 2 * self.max_points:
+                self._merge()
+        else:
+            b = self._buckets[-1]
+            if value < b[1][2]:
+                b[1] = point
+            if value > b[2][2]:
+                b[2] = point
+        self.count += 1
+
+    def _merge(self):
+        merged = []
+        buckets = self._buckets
+        for i in range(0, len(buckets) - 1, 2):
+            a, b = buckets[i], buckets[i + 1]
+            merged.append([a[0], a[1] if a[1][2] <= b[1][2] else b[1], a[2] if a[2][2] >= b[2][2] else b[2]])
+        if len(buckets) % 2:
+            merged.append(buckets[-1])
+        self._buckets = merged
+        self.span *= 2
+
+    def points(self):
+        """按 x 排序的代表点，最多 max_points 个（首尾点总是保留）。"""
+        if self.span == 1:
+            # 尚未合并过：每桶就是一个原始点，但桶数可能达到 2 * max_points
+            points = [b[0] for b in self._buckets]
+            return lttb(points, self.max_points) if len(points) > self.max_points else points
+        seen = set()
+        candidates = []
+        for bucket in self._buckets:
+            for p in bucket:
+                if p[0] not in seen:
+                    seen.add(p[0])
+                    candidates.append(p)
+        if self._last[0] not in seen:
+            candidates.append(self._last)
+        candidates.sort(key=lambda p: p[0])
+        return lttb(candidates, self.max_points)
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""
+字体查找与延迟加载。
+
+查找顺序：项目自带字体（assets/fonts/）→ 常见中文字体（match_font）→ pygame 自带字体。
+系统字体扫描在部分 Linux 上要几百毫秒，因此查找结果（字体文件路径及其 mtime/大小）
+缓存到磁盘，下次启动校验文件未变化即可直接使用。
+“没有找到中文字体”不缓存：之后安装的系统字体在下次启动时就能被找到
+（系统字体目录分散且各平台不同，无法像 assets/fonts 那样靠目录 mtime 判断变化）。
+
+LazyFont 在第一次 render/size 等调用时才真正创建 pygame.font.Font。
+"""
+import glob
+import json
+import os
+import time
+
+import pygame
+
+
+CACHE_VERSION = 1
+
+# 通过 match_font 精确匹配的常见中文字体（SysFont 使用的是同一张系统字体表）
+MATCH_CANDIDATES = [
+    # Windows
+    'msyh', 'microsoft yahei', 'simhei', 'simsun', 'dengxian',
+    # macOS
+    'pingfang sc', 'heiti sc', 'stheiti', 'hiragino sans gb',
+    # Linux / 通用
+    'noto sans cjk sc', 'noto sans cjk', 'source han sans cn', 'wenquanyi zen hei',
+    # 英文字体中包含全字库的（有时可用）
+    'arial unicode ms',
+]
+
+
+def _file_sig(path):
+    st = os.stat(path)
+    return [st.st_mtime_ns, st.st_size]
+
+
+def _dir_sig(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def discover_font(assets_font_dir):
+    """扫描可用的中文字体文件，返回路径；都找不到时返回 None。"""
+    # 1) 项目自带字体（将 .ttf/.otf 放到 assets/fonts/ 下即可生效）
+    custom_fonts = []
+    for pattern in ("*.ttf", "*.otf", "*.ttc"):
+        custom_fonts.extend(glob.glob(os.path.join(assets_font_dir, pattern)))
+    for font_file in sorted(custom_fonts):
+        try:
+            pygame.font.Font(font_file, 12)
+            return font_file
+        except Exception:
+            continue
+
+    # 2) 系统常见中文字体
+    if not pygame.font.get_init():
+        pygame.font.init()
+    for name in MATCH_CANDIDATES:
+        try:
+            path = pygame.font.match_font(name)
+            if path:
+                return path
+        except Exception:
+            continue
+    return None
+
+
+def load_cached_path(assets_font_dir, cache_path):
+    """读取缓存的查找结果。返回 (命中, 路径)；字体文件或 assets/fonts 目录有变化、
+    或缓存的是“没有找到”（旧版本写入的）时视为未命中。"""
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+    except Exception:
+        return False, None
+    if cached.get('version') != CACHE_VERSION or cached.get('assets') != _dir_sig(assets_font_dir):
+        return False, None
+    path = cached.get('path')
+    if path is None:
+        return False, None
+    try:
+        if _file_sig(path) == cached.get('sig'):
+            return True, path
+    except OSError:
+        pass
+    return False, None
+
+
+def save_cached_path(assets_font_dir, cache_path, path):
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        data = {'version': CACHE_VERSION, 'assets': _dir_sig(assets_font_dir),
+                'path': path, 'sig': _file_sig(path) if path else None}
+        tmp = f"{cache_path}.{os.getpid()}.tmp"  # 多个进程同时启动时互不覆盖临时文件
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, cache_path)
+    except Exception:
+        pass
+
+
+class FontSource:
+    """同一字体文件的多个字号共享一次查找；记录查找耗时与是否命中缓存。"""
+
+    def __init__(self, assets_font_dir, cache_path=None):
+        self.assets_font_dir = assets_font_dir
+        self.cache_path = cache_path
+        self.resolve_ms = None
+        self.cache_hit = False
+        self._path = None
+
+    @property
+    def resolved(self):
+        return self.resolve_ms is not None
+
+    @property
+    def path(self):
+        if self.resolve_ms is None:
+            t0 = time.perf_counter()
+            hit, path = (load_cached_path(self.assets_font_dir, self.cache_path)
+                         if self.cache_path else (False, None))
+            if not hit:
+                path = discover_font(self.assets_font_dir)
+                if self.cache_path and path:
+                    save_cached_path(self.assets_font_dir, self.cache_path, path)
+            self._path = path
+            self.cache_hit = hit
+            self.resolve_ms = (time.perf_counter() - t0) * 1000.0
+        return self._path
+
+    def font(self, size, bold=False):
+        return LazyFont(self, size, bold)
+
+
+class LazyFont:
+    """第一次使用时才创建的 pygame.font.Font 代理。"""
+
+    def __init__(self, source, size, bold=False):
+        self._source = source
+        self._size = size
+        self._bold = bold
+        self._font = None
+
+    def load(self):
+        if self._font is None:
+            if not pygame.font.get_init():
+                pygame.font.init()
+            path = self._source.path
+            font = None
+            if path:
+                try:
+                    font = pygame.font.Font(path, self._size)
+                except Exception:
+                    font = None
+            if font is None:
+                # 兜底：pygame 自带字体（无法显示中文，会出现方块）；不用 SysFont，避免再次扫描系统字体
+                font = pygame.font.Font(None, self._size)
+                font.set_bold(self._bold)
+            self._font = font
+        return self._font
+
+    @property
+    def source(self):
+        return self._source
+
+    @property
+    def loaded(self):
+        return self._font is not None
+
+    def render(self, *args, **kwargs):
+        return self.load().render(*args, **kwargs)
+
+    def size(self, text):
+        return self.load().size(text)
+
+    def __getattr__(self, name):
+        return getattr(self.load(), name)
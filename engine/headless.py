@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""
+无窗口运行支持：SDL dummy 驱动 + 脚本化按键事件。
+
+use_dummy_drivers() 必须在 pygame 初始化显示之前调用（即 Game.init() 之前，也可直接用 Game.init(headless=True)）。
+key_script() 生成 type_game.run_game(script=...) 需要的回调：按帧号注入 KEYDOWN 事件。
+"""
+import os
+
+
+def use_dummy_drivers():
+    os.environ['SDL_VIDEODRIVER'] = 'dummy'
+    os.environ['SDL_AUDIODRIVER'] = 'dummy'
+
+
+def key_event(key):
+    """由单个字符（'a'、'1'）或按键名（'escape'、'return'）构造 KEYDOWN 事件。"""
+    import pygame
+
+    if len(key) == 1:
+        return pygame.event.Event(pygame.KEYDOWN, key=pygame.key.key_code(key.lower()), unicode=key, mod=0)
+    code = pygame.key.key_code(key)
+    return pygame.event.Event(pygame.KEYDOWN, key=code, unicode='\x1b' if code == pygame.K_ESCAPE else '', mod=0)
+
+
+def key_script(schedule):
+    """schedule: {帧号: 按键或按键列表}，返回 script(frame) 回调。"""
+    events = {}
+    for frame, keys in schedule.items():
+        if isinstance(keys, str):
+            keys = [keys]
+        events[int(frame)] = [key_event(k) for k in keys]
+
+    def script(frame):
+        return events.get(frame, ())
+    return script
+
+
+def parse_keys(spec):
+    """解析命令行按键脚本，如 "0:1,30:b,31:a,600:escape"。"""
+    schedule = {}
+    for item in filter(None, (p.strip() for p in spec.split(','))):
+        frame, _, key = item.partition(':')
+        schedule.setdefault(int(frame), []).append(key)
+    return schedule
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+后台任务：把报表导出、HTML 生成这类耗时操作移出 pygame 事件线程。
+
+- submit(key, fn, ...)：在线程池中运行 fn(job)；同一个 key 的任务还没结束时再次提交会被合并（忽略），
+  requeue=True 时改为在进行中的任务结束后再运行一次（多次提交只补跑一次，用最后一次的参数）；
+  lane 相同的任务按提交顺序逐个运行（例如同一档案的报表任务共用检查点与报表缓存），
+  排队的任务不占用线程池
+- job.progress(text)：从工作线程发回进度文字；job.check() 在被取消时抛出 JobCancelled
+- job.run_in_process(fn, *args)：把纯计算部分交给进程池（历史很长时避免与渲染线程争抢 GIL）
+- poll()：每帧调用一次，非阻塞地取出所有进度/结果消息，交给菜单的 set_message 显示
+- cancel(key) / cancel(match=...) / shutdown()：取消任务（match 按 key 筛选）；
+  进程池中已开始的计算无法中断，其结果会被丢弃
+"""
+import queue
+import sys
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def _extend_sys_path(paths):
+    for p in paths:
+        if p not in sys.path:
+            sys.path.insert(0, p)
+
+
+class Job:
+    def __init__(self, runner, key):
+        self.runner = runner
+        self.key = key
+        self._cancel = threading.Event()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def cancel(self):
+        self._cancel.set()
+
+    def check(self):
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def progress(self, text):
+        if not self._cancel.is_set():
+            self.runner._messages.put(text)
+
+    def run_in_process(self, fn, *args):
+        """在进程池中运行 fn(*args) 并等待结果；等待期间响应取消。"""
+        future = self.runner._process_pool().submit(fn, *args)
+        while True:
+            if self._cancel.is_set():
+                future.cancel()
+                raise JobCancelled()
+            try:
+                return future.result(timeout=0.1)
+            except FutureTimeout:
+                continue
+
+
+class JobRunner:
+    def __init__(self, max_workers=2, process_paths=()):
+        self._threads = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='report-job')
+        self._processes = None
+        self._process_paths = list(process_paths)
+        self._messages = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._requeued = {}  # key -> (fn, args, kwargs)，进行中的任务结束后补跑
+        self._lanes = {}     # lane -> deque[run]，队首为正在运行的任务
+
+    def _process_pool(self):
+        with self._lock:
+            if self._processes is None:
+                self._processes = ProcessPoolExecutor(
+                    max_workers=1, initializer=_extend_sys_path, initargs=(self._process_paths,))
+            return self._processes
+
+    def busy(self, key=None):
+        with self._lock:
+            return bool(self._jobs) if key is None else key in self._jobs
+
+    def submit(self, key, fn, *args, error_message=None, cancelled_message=None, requeue=False, lane=None):
+        """提交任务 fn(job, *args)，返回值（字符串）作为完成消息。同 key 任务进行中（或排队中）时返回 False
+        （requeue=True 时记下这次提交，等进行中的任务结束后再运行）。
+
+        lane 不为 None 时，同一 lane 的任务依次运行：前一个结束后才开始下一个。
+        """
+        with self._lock:
+            if key in self._jobs:
+                if requeue:
+                    self._requeued[key] = (fn, args, {'error_message': error_message,
+                                                      'cancelled_message': cancelled_message, 'lane': lane})
+                return False
+            job = Job(self, key)
+            self._jobs[key] = job
+
+        def run():
+            try:
+                job.check()  # 排队期间被取消
+                result = fn(job, *args)
+                if result and not job.cancelled:
+                    self._messages.put(result)
+            except JobCancelled:
+                if cancelled_message:
+                    self._messages.put(cancelled_message)
+            except Exception:
+                if error_message and not job.cancelled:
+                    self._messages.put(error_message)
+            finally:
+                nxt = None
+                with self._lock:
+                    self._jobs.pop(key, None)
+                    again = self._requeued.pop(key, None)
+                    if lane is not None:
+                        waiting = self._lanes[lane]
+                        waiting.popleft()
+                        if waiting:
+                            nxt = waiting[0]
+                        else:
+                            del self._lanes[lane]
+                try:
+                    if nxt is not None:
+                        self._threads.submit(nxt)
+                    if again is not None and not job.cancelled:
+                        fn_, args_, kwargs_ = again
+                        self.submit(key, fn_, *args_, **kwargs_)
+                except RuntimeError:
+                    pass  # shutdown() 之后线程池不再接受任务
+
+        if lane is not None:
+            with self._lock:
+                waiting = self._lanes.setdefault(lane, deque())
+                waiting.append(run)
+                if len(waiting) > 1:
+                    return True  # 排在同一 lane 的前一个任务之后
+        self._threads.submit(run)
+        return True
+
+    def cancel(self, key=None, match=None):
+        """取消指定任务，返回被取消的任务数。
+
+        key 与 match 都为 None 时取消全部；match(key) 为真的任务都会被取消。
+        """
+        with self._lock:
+            if key is not None:
+                jobs = [self._jobs[key]] if key in self._jobs else []
+            else:
+                jobs = [job for k, job in self._jobs.items() if match is None or match(k)]
+            for job in jobs:
+                self._requeued.pop(job.key, None)
+        for job in jobs:
+            job.cancel()
+        return len(jobs)
+
+    def poll(self):
+        """取出所有待显示的消息（非阻塞）。"""
+        out = []
+        while True:
+            try:
+                out.append(self._messages.get_nowait())
+            except queue.Empty:
+                return out
+
+    def shutdown(self):
+        self.cancel()
+        self._threads.shutdown(wait=False)
+        if self._processes is not None:
+            self._processes.shutdown(wait=False)
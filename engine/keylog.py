@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+"""
+逐键记录：每次按键（以及落地未打完的目标）记一条 (时间, 目标, 应按字符, 实际按键, 是否正确, 反应时间)。
+反应时间是从该字符“轮到要打”（目标出现或上一次按键，取较晚者）到按下的毫秒数。
+
+- KeystrokeRecorder：预分配的环形缓冲区（标准库 array），record() 只做几次数组写入；
+  一局超过 capacity 条时覆盖最早的记录并计入 dropped
+- KeystrokeLog：每局结束时把缓冲区编码成一个数据块追加到 data/keystrokes.bin（append_payload 可在写入线程中调用）
+- read_keylog()：逐局读取，产出 KeystrokeSession；iter_blocks() 只解压不解码，供 engine.analytics 向量化解析
+
+文件格式：文件头 b'TGKL' + 版本号，之后每局一个数据块：varint(压缩后长度) + zlib 压缩的内容。
+内容全部是 varint：模式、结束时间（Unix 秒，与成绩记录的 timestamp 对应）、dropped、
+目标文字表（数量 + 每项 UTF-8 长度与字节）、事件数 n，然后按列存放 n 个时间差（毫秒）、
+n 个文字表下标、n 个应按字符码、n 个 (实际按键 << 1 | 是否正确)、n 个反应时间（毫秒）；
+实际按键 0 表示与应按字符相同，1 表示没有按键（目标落地），其余为字符码 + 2。数据块用 raw deflate 压缩（不带 zlib 头尾）。
+按列存放使同类数值相邻，压缩效果更好。
+"""
+import os
+import zlib
+from array import array
+from collections import namedtuple
+
+
+MAGIC = b'TGKL'
+VERSION = 1
+HEADER = MAGIC + bytes([VERSION])
+COLUMNS = ('dt_ms', 'text', 'expected', 'typed', 'react_ms')
+
+# events: [(t_ms, text, expected, typed, hit, react_ms), ...]；typed 为 '' 表示目标落地时仍未打完
+KeystrokeSession = namedtuple('KeystrokeSession', ['level', 'end_ts', 'dropped', 'events'])
+
+
+def keylog_path(data_dir):
+    return os.path.join(data_dir, 'keystrokes.bin')
+
+
+def _put_varint(out, value):
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _get_varint(buf, pos):
+    result = 0
+    shift = 0
+    while True:
+        b = buf[pos]
+        pos += 1
+        result |= (b & 0x7F) << shift
+        if b < 0x80:
+            return result, pos
+        shift += 7
+
+
+def _typed(expected, value):
+    """解码 (实际按键 << 1 | 是否正确)，返回 (typed, hit)。"""
+    code = value >> 1
+    typed = chr(expected) if code == 0 else '' if code == 1 else chr(code - 2)
+    return typed, bool(value & 1)
+
+
+class KeystrokeRecorder:
+    def __init__(self, capacity=8192):
+        self.capacity = capacity
+        self._t = array('I', bytes(4 * capacity))
+        self._text = array('I', bytes(4 * capacity))
+        self._expected = array('I', bytes(4 * capacity))
+        self._typed = array('I', bytes(4 * capacity))
+        self._react = array('I', bytes(4 * capacity))
+        self._texts = []
+        self._text_ids = {}
+        self._count = 0  # 本局记录总数（含被覆盖的）
+
+    def __len__(self):
+        return min(self._count, self.capacity)
+
+    @property
+    def dropped(self):
+        return max(0, self._count - self.capacity)
+
+    def begin(self):
+        """开始新的一局：清空缓冲区（不释放内存）。"""
+        self._texts = []
+        self._text_ids = {}
+        self._count = 0
+
+    def record(self, t_ms, text, expected, typed, hit, react_ms=0):
+        tid = self._text_ids.get(text)
+        if tid is None:
+            tid = self._text_ids[text] = len(self._texts)
+            self._texts.append(text)
+        i = self._count % self.capacity
+        self._t[i] = t_ms
+        self._text[i] = tid
+        self._expected[i] = ord(expected)
+        code = 0 if typed == expected else ord(typed) + 2 if typed else 1
+        self._typed[i] = code << 1 | hit
+        self._react[i] = react_ms
+        self._count += 1
+
+    def _order(self):
+        n = len(self)
+        start = self._count % self.capacity if self._count > self.capacity else 0
+        return [(start + k) % self.capacity for k in range(n)]
+
+    def events(self):
+        texts = self._texts
+        return [(self._t[i], texts[self._text[i]], chr(self._expected[i]))
+                + _typed(self._expected[i], self._typed[i]) + (self._react[i],)
+                for i in self._order()]
+
+    def encode(self, level, end_ts):
+        """把本局记录编码为一个数据块的内容（未压缩）。"""
+        out = bytearray()
+        _put_varint(out, level)
+        _put_varint(out, int(end_ts))
+        _put_varint(out, self.dropped)
+        _put_varint(out, len(self._texts))
+        for text in self._texts:
+            raw = text.encode('utf-8')
+            _put_varint(out, len(raw))
+            out += raw
+        order = self._order()
+        _put_varint(out, len(order))
+        prev = 0
+        for i in order:
+            t = self._t[i]
+            _put_varint(out, max(0, t - prev))
+            prev = t
+        for col in (self._text, self._expected, self._typed, self._react):
+            for i in order:
+                _put_varint(out, col[i])
+        return bytes(out)
+
+
+class KeystrokeLog:
+    """追加写入的逐键记录文件。"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def append(self, recorder, level, end_ts):
+        """把 recorder 中本局的记录追加到文件；没有记录时不写入。返回写入的字节数。"""
+        if not len(recorder):
+            return 0
+        return self.append_payload(recorder.encode(level, end_ts))
+
+    def append_payload(self, payload):
+        """把 recorder.encode() 得到的一局内容压缩后追加到文件，返回写入的字节数。
+
+        编码必须在 recorder 被下一局复用之前完成；压缩与写入可以放到其他线程（见 engine/async_runner.py）。
+        """
+        block = _pack_block(payload)
+        with open(self.path, 'ab') as f:
+            if f.tell() == 0:
+                f.write(HEADER)
+            f.write(block)
+        return len(block)
+
+
+def _pack_block(payload):
+    """varint(压缩后长度) + raw deflate 压缩的 payload。"""
+    packer = zlib.compressobj(9, zlib.DEFLATED, -15)
+    block = packer.compress(payload) + packer.flush()
+    head = bytearray()
+    _put_varint(head, len(block))
+    return bytes(head) + block
+
+
+def decode_header(payload):
+    """解析数据块的头部，返回 (level, end_ts, dropped, texts, n, 列数据起始位置)。"""
+    pos = 0
+    level, pos = _get_varint(payload, pos)
+    end_ts, pos = _get_varint(payload, pos)
+    dropped, pos = _get_varint(payload, pos)
+    n_texts, pos = _get_varint(payload, pos)
+    texts = []
+    for _ in range(n_texts):
+        size, pos = _get_varint(payload, pos)
+        texts.append(payload[pos:pos + size].decode('utf-8'))
+        pos += size
+    n, pos = _get_varint(payload, pos)
+    return level, end_ts, dropped, texts, n, pos
+
+
+def decode_block(payload):
+    level, end_ts, dropped, texts, n, pos = decode_header(payload)
+    cols = []
+    for _ in COLUMNS:
+        col = []
+        for _ in range(n):
+            v, pos = _get_varint(payload, pos)
+            col.append(v)
+        cols.append(col)
+    events = []
+    t = 0
+    for dt, tid, expected, typed, react in zip(*cols):
+        t += dt
+        events.append((t, texts[tid], chr(expected)) + _typed(expected, typed) + (react,))
+    return KeystrokeSession(level, end_ts, dropped, events)
+
+
+def _read_varint(f):
+    result = 0
+    shift = 0
+    while True:
+        b = f.read(1)
+        if not b:
+            return None
+        result |= (b[0] & 0x7F) << shift
+        if b[0] < 0x80:
+            return result
+        shift += 7
+
+
+def iter_blocks(path):
+    """逐局产出解压后的数据块内容；文件不存在或版本不符时不产出任何内容，末尾不完整的数据块会被忽略。"""
+    if not os.path.exists(path):
+        return
+    with open(path, 'rb') as f:
+        if f.read(len(HEADER)) != HEADER:
+            return
+        while True:
+            size = _read_varint(f)
+            if size is None:
+                return
+            block = f.read(size)
+            if len(block) < size:
+                return
+            yield zlib.decompress(block, -15)
+
+
+def read_keylog(path):
+    """逐局流式读取逐键记录文件，产出 KeystrokeSession。"""
+    for payload in iter_blocks(path):
+        yield decode_block(payload)
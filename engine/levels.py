@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""
+关卡包：关卡的题目、出题权重、速度曲线和显示名称都来自 JSON 文件（默认 assets/levels/default.json）。
+
+JSON 格式：
+  {
+    "name": "默认关卡包",
+    "levels": [
+      {"id": 1, "name": "大写字母", "short": "大写",
+       "items": "ABC...",                       # 字符串（每个字符一题）或列表
+       "speed": {"base": 60, "ramp_per_min": 0, "max": 60},   # 像素/秒；也可以直接写数字
+       "spawn_interval": 2.0},                 # 秒
+      {"id": 3, "name": "拼音", "items": ["ba", ["ma", 2.0], ...]}   # [题目, 权重]，权重默认 1
+    ]
+  }
+
+第一次加载时编译成 marshal 二进制缓存（默认 data/level_cache/<文件名>.bin，按源文件大小与 mtime 校验），
+其中已经算好每个关卡的累积权重表，之后加载只需一次 marshal.loads，
+成千上万个音节/单词也不需要重新解析；出题是累积权重上的二分查找。
+按键匹配只看屏幕上的目标（engine/matcher.py 的前缀树），不需要整个题库的前缀表。
+"""
+import bisect
+import json
+import marshal
+import os
+import random
+
+
+COMPILED_VERSION = 2
+DEFAULT_SPEED = 60.0
+DEFAULT_INTERVAL = 2.0
+
+
+def _items(raw):
+    items, weights = [], []
+    for entry in (list(raw) if isinstance(raw, str) else raw):
+        text, weight = (entry, 1.0) if isinstance(entry, str) else (entry[0], float(entry[1]))
+        if not text or weight <= 0:
+            raise ValueError(f"无效的题目：{entry!r}")
+        items.append(text)
+        weights.append(weight)
+    return items, weights
+
+
+def compile_pack(raw):
+    """把 JSON 内容检查并编译成只含基本类型的字典（可直接 marshal）。"""
+    levels = []
+    seen = set()
+    for spec in raw.get('levels', []):
+        lid = int(spec['id'])
+        if lid in seen:
+            raise ValueError(f"关卡编号重复：{lid}")
+        seen.add(lid)
+        items, weights = _items(spec.get('items', ()))
+        if not items:
+            raise ValueError(f"关卡 {lid} 没有题目")
+        speed = spec.get('speed', DEFAULT_SPEED)
+        if not isinstance(speed, dict):
+            speed = {'base': speed}
+        base = float(speed.get('base', DEFAULT_SPEED))
+        cum = []
+        acc = 0.0
+        for w in weights:
+            acc += w
+            cum.append(acc)
+        name = spec.get('name') or str(lid)
+        levels.append({
+            'id': lid,
+            'name': name,
+            'short': spec.get('short') or name,
+            'items': items,
+            'weights': weights,
+            'cum': cum,
+            'base_speed': base,
+            'ramp_per_min': float(speed.get('ramp_per_min', 0.0)),
+            'max_speed': float(speed.get('max', base)),
+            'spawn_interval': float(spec.get('spawn_interval', DEFAULT_INTERVAL)),
+        })
+    if not levels:
+        raise ValueError("关卡包中没有关卡")
+    return {'name': raw.get('name', ''), 'levels': levels}
+
+
+class Level:
+    def __init__(self, data):
+        self.id = data['id']
+        self.name = data['name']
+        self.short = data['short']
+        self.items = data['items']
+        self.weights = data['weights']
+        self.base_speed = data['base_speed']
+        self.ramp_per_min = data['ramp_per_min']
+        self.max_speed = data['max_speed']
+        self.spawn_interval = data['spawn_interval']
+        self._cum = data['cum']
+
+    def choice(self, rng=random):
+        """按权重随机出一题。"""
+        return self.items[bisect.bisect_right(self._cum, rng.random() * self._cum[-1])]
+
+    def speed_factor(self, t):
+        """速度曲线：本局进行 t 秒时相对 base_speed 的倍数（ramp_per_min 为每分钟增加的像素/秒，不超过 max_speed）。"""
+        if not self.ramp_per_min:
+            return 1.0
+        return min(self.max_speed, self.base_speed + self.ramp_per_min * t / 60.0) / self.base_speed
+
+    def weight_map(self):
+        return dict(zip(self.items, self.weights))
+
+
+class LevelPack:
+    def __init__(self, data, path=None, from_cache=False):
+        self.name = data['name']
+        self.path = path
+        self.from_cache = from_cache
+        self.levels = {spec['id']: Level(spec) for spec in data['levels']}
+
+    def __getitem__(self, level_id):
+        return self.levels[level_id]
+
+    def __contains__(self, level_id):
+        return level_id in self.levels
+
+    def ids(self):
+        return list(self.levels)
+
+    def items(self):
+        """{关卡: 题目列表}"""
+        return {lid: lv.items for lid, lv in self.levels.items()}
+
+    def names(self):
+        return {lid: lv.name for lid, lv in self.levels.items()}
+
+    def display_name(self, level_id):
+        lv = self.levels.get(level_id)
+        return lv.name if lv is not None else str(level_id)
+
+
+def _source_sig(path):
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def cache_path_for(path, cache_dir):
+    return os.path.join(cache_dir, os.path.splitext(os.path.basename(path))[0] + '.bin')
+
+
+def load_pack(path, cache_dir=None):
+    """加载关卡包：缓存有效时直接读取编译结果，否则解析 JSON、编译并写入缓存（写入失败不影响使用）。"""
+    sig = _source_sig(path)
+    cache = cache_path_for(path, cache_dir) if cache_dir else None
+    if cache and os.path.exists(cache):
+        try:
+            with open(cache, 'rb') as f:
+                blob = marshal.loads(f.read())
+            if blob.get('format') == COMPILED_VERSION and blob.get('source') == sig:
+                return LevelPack(blob['pack'], path, from_cache=True)
+        except Exception:
+            pass
+    with open(path, 'r', encoding='utf-8') as f:
+        data = compile_pack(json.load(f))
+    if cache:
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp = f"{cache}.{os.getpid()}.tmp"
+            with open(tmp, 'wb') as f:
+                f.write(marshal.dumps({'format': COMPILED_VERSION, 'source': sig, 'pack': data}))
+            os.replace(tmp, cache)
+        except OSError:
+            pass
+    return LevelPack(data, path)
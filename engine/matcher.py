@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+按键路由：把每次按键交给屏幕上任意一个能接上的目标，而不只是最靠下的那个。
+
+PrefixIndex 是活动目标文字（小写）的前缀树，每个结点记录经过它的目标句柄；
+目标出现时插入、被打完或落出屏幕时删除（各 O(文字长度)），空结点随之回收，
+因此树的大小只与屏幕上的目标有关。
+
+匹配状态是“当前锁定的目标 + 已打出的前缀所在结点”：
+- 按键能接上已打出的前缀时，只沿子结点走一步；锁定的目标接得上就继续打它，
+  否则换成同一前缀下另一个接得上的目标（例如已打 b，锁定 ba，按 o 时换到 bo）
+- 接不上时从根结点重新开始：换到任意一个以该字符开头的目标
+- 都接不上算按错，保留锁定与进度（对一年级友好：打错一个字符不用从头再来）
+
+每次按键只做常数次字典查找，与屏幕上的目标数量无关；同一结点下有多个目标时选最早出现的
+（字典保持插入顺序，最早出现的一般也最靠下、最先落地）。
+"""
+
+
+class _Node:
+    __slots__ = ('children', 'handles')
+
+    def __init__(self):
+        self.children = {}
+        self.handles = {}  # 句柄 -> None，当作有序集合使用
+
+
+class PrefixIndex:
+    def __init__(self):
+        self.root = _Node()
+        self._text_of = {}
+        self.engaged = None  # 当前锁定的目标句柄
+        self.depth = 0       # 已打出的字符数
+        self._node = self.root
+
+    def __len__(self):
+        return len(self._text_of)
+
+    def __contains__(self, handle):
+        return handle in self._text_of
+
+    def clear(self):
+        self.root = _Node()
+        self._text_of = {}
+        self.release()
+
+    def release(self):
+        """取消锁定（下一次按键从根结点开始）。"""
+        self.engaged = None
+        self.depth = 0
+        self._node = self.root
+
+    def add(self, handle, text):
+        key = text.lower()
+        self._text_of[handle] = key
+        node = self.root
+        for ch in key:
+            child = node.children.get(ch)
+            if child is None:
+                child = node.children[ch] = _Node()
+            child.handles[handle] = None
+            node = child
+
+    def remove(self, handle):
+        """删除目标（不存在时忽略）；删除的是锁定目标时取消锁定。"""
+        key = self._text_of.pop(handle, None)
+        if key is None:
+            return
+        if handle == self.engaged:
+            self.release()
+        node = self.root
+        for ch in key:
+            child = node.children[ch]
+            del child.handles[handle]
+            if not child.handles:
+                # 之后的结点只含这个目标，整枝剪掉
+                del node.children[ch]
+                break
+            node = child
+
+    def press(self, char):
+        """路由一次按键，返回 (接受的句柄, 它已打出的字符数, 被放弃的句柄)。
+
+        没有目标接得上时接受的句柄为 None；换了目标时，被放弃的句柄为原锁定目标
+        （调用方把它的进度清零），否则为 None。
+        """
+        ch = char.lower()
+        previous = self.engaged
+        child = self._node.children.get(ch) if previous is not None else None
+        if child is not None:
+            depth = self.depth + 1
+        else:
+            child = self.root.children.get(ch)
+            if child is None:
+                return None, 0, None
+            depth = 1
+        handle = previous if previous in child.handles else next(iter(child.handles))
+        self.engaged = handle
+        self.depth = depth
+        self._node = child
+        return handle, depth, previous if previous is not None and previous != handle else None
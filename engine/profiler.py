@@ -0,0 +1,215 @@
+# -*- coding: utf-8 -*-
+"""
+帧循环分阶段计时。
+
+每帧调用 begin_frame()，每个阶段结束时调用 lap('阶段名')，帧末调用 end_frame()；
+lap 记录的是距离上一次 lap（或帧开始）的耗时。同时记录每帧净增的内存块数
+（sys.getallocatedblocks）和期间发生的 GC 次数，用来发现热路径上的对象分配。
+帧与帧之间按帧率上限等待的时间用 idle(秒) 单独记录：不算进帧耗时和任何阶段，
+report() 的 fps 是实际帧率（含等待），avg/worst_frame_ms 只是每帧的工作量。
+
+不需要计时时使用 NULL_PROFILER，所有方法都是空操作（游戏默认如此，没有额外开销）。
+
+LiveProfiler 供游戏内性能浮层使用：另外保留最近若干帧的帧耗时（p50/p99，不含等待）与实际帧率，
+并能录制之后若干帧：
+- start_trace(path, frames)：每个 lap 记为一个命名区间，写出 Chrome trace JSON
+  （chrome://tracing 或 https://ui.perfetto.dev 打开）
+- start_cprofile(path, frames)：用 cProfile 采样这些帧，写出 .prof（python -m pstats 查看）
+"""
+import cProfile
+import gc
+import json
+import os
+import sys
+import time
+from collections import deque
+
+
+PHASES = ('events', 'spawn', 'move', 'draw', 'flip')
+
+
+class FrameProfiler:
+    def __init__(self, phases=PHASES):
+        self.phases = tuple(phases)
+        self.totals = {p: 0.0 for p in self.phases}
+        self.frames = 0
+        self.frame_total = 0.0
+        self.worst_frame = 0.0
+        self.idle_total = 0.0
+        self.alloc_blocks = 0
+        self._t0 = 0.0
+        self._t = 0.0
+        self._blocks = 0
+        self._gc_start = None
+        self.last_frame = 0.0
+
+    def begin_frame(self):
+        if self._gc_start is None:
+            self._gc_start = sum(s['collections'] for s in gc.get_stats())
+        self._blocks = sys.getallocatedblocks()
+        self._t0 = self._t = time.perf_counter()
+
+    def lap(self, phase):
+        now = time.perf_counter()
+        self.totals[phase] = self.totals.get(phase, 0.0) + (now - self._t)
+        self._t = now
+
+    def end_frame(self):
+        dt = self.last_frame = time.perf_counter() - self._t0
+        self.frames += 1
+        self.frame_total += dt
+        if dt > self.worst_frame:
+            self.worst_frame = dt
+        self.alloc_blocks += sys.getallocatedblocks() - self._blocks
+
+    def idle(self, seconds):
+        """记录 end_frame() 之后、下一帧之前的等待时间（秒）。"""
+        self.idle_total += seconds
+
+    def report(self):
+        frames = self.frames or 1
+        gc_runs = 0
+        if self._gc_start is not None:
+            gc_runs = sum(s['collections'] for s in gc.get_stats()) - self._gc_start
+        wall = self.frame_total + self.idle_total
+        return {
+            'frames': self.frames,
+            'fps': round(self.frames / wall, 1) if wall else 0.0,
+            'avg_frame_ms': round(self.frame_total * 1000.0 / frames, 4),
+            'idle_ms': round(self.idle_total * 1000.0 / frames, 4),
+            'worst_frame_ms': round(self.worst_frame * 1000.0, 4),
+            'phase_ms': {p: round(t * 1000.0 / frames, 4) for p, t in self.totals.items()},
+            'alloc_blocks_per_frame': round(self.alloc_blocks / frames, 2),
+            'gc_collections': gc_runs,
+        }
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+class LiveProfiler(FrameProfiler):
+    def __init__(self, phases=PHASES, window=240):
+        super().__init__(phases)
+        self.recent = deque(maxlen=window)  # 最近 window 帧的帧耗时（秒，不含等待）
+        self.recent_wall = deque(maxlen=window)  # 同样这些帧的实际间隔（帧耗时 + 等待）
+        self._trace = None                  # 录制中的 [(阶段, 开始, 结束)]
+        self._profile = None                # 录制中的 cProfile.Profile
+        self._capture_left = 0
+        self._capture_path = None
+        self._capture_start = 0.0
+        self._pending = None                # 已请求、从下一帧开始的录制
+        self.completed = []                 # 录制完成的文件路径，由调用方取走
+
+    @property
+    def capturing(self):
+        return self._pending is not None or self._capture_left > 0
+
+    def begin_frame(self):
+        super().begin_frame()
+        if self._pending is not None:
+            kind, self._capture_path, self._capture_left = self._pending
+            self._pending = None
+            self._capture_start = self._t0
+            if kind == 'trace':
+                self._trace = []
+            else:
+                self._profile = cProfile.Profile()
+                self._profile.enable()
+
+    def lap(self, phase):
+        now = time.perf_counter()
+        self.totals[phase] = self.totals.get(phase, 0.0) + (now - self._t)
+        if self._trace is not None:
+            self._trace.append((phase, self._t, now))
+        self._t = now
+
+    def end_frame(self):
+        super().end_frame()
+        self.recent.append(self.last_frame)
+        self.recent_wall.append(self.last_frame)
+        if self._capture_left:
+            if self._trace is not None:
+                self._trace.append(('frame', self._t0, self._t0 + self.last_frame))
+            self._capture_left -= 1
+            if not self._capture_left:
+                self._finish_capture()
+
+    def idle(self, seconds):
+        super().idle(seconds)
+        if self.recent_wall:
+            self.recent_wall[-1] += seconds
+        if self._trace is not None:
+            now = time.perf_counter()
+            self._trace.append(('idle', now - seconds, now))
+
+    def live_stats(self):
+        """最近 window 帧：{'fps'（实际帧率）, 'p50_ms', 'p99_ms'（帧耗时，不含等待）}。"""
+        values = sorted(self.recent)
+        wall = sum(self.recent_wall)
+        return {
+            'fps': len(self.recent_wall) / wall if wall else 0.0,
+            'p50_ms': _percentile(values, 0.5) * 1000.0,
+            'p99_ms': _percentile(values, 0.99) * 1000.0,
+        }
+
+    def start_trace(self, path, frames=300):
+        """从下一帧起录制 frames 帧的各阶段区间，完成后写出 Chrome trace 到 path。已在录制时返回 False。"""
+        if self.capturing:
+            return False
+        self._pending = ('trace', path, max(1, int(frames)))
+        return True
+
+    def start_cprofile(self, path, frames=300):
+        """从下一帧起用 cProfile 录制 frames 帧，完成后写出到 path。已在录制时返回 False。"""
+        if self.capturing:
+            return False
+        self._pending = ('cprofile', path, max(1, int(frames)))
+        return True
+
+    def _finish_capture(self):
+        path = self._capture_path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if self._profile is not None:
+            self._profile.disable()
+            self._profile.dump_stats(path)
+            self._profile = None
+        if self._trace is not None:
+            write_chrome_trace(self._trace, path, self._capture_start)
+            self._trace = None
+        self.completed.append(path)
+
+
+def write_chrome_trace(spans, path, t0=0.0):
+    """把 [(名称, 开始, 结束)]（perf_counter 秒）写成 Chrome trace 的完整事件（ph='X'）。"""
+    events = [{'name': name, 'cat': 'frame' if name == 'frame' else 'phase', 'ph': 'X', 'pid': 1, 'tid': 1,
+               'ts': round((start - t0) * 1e6, 1), 'dur': round((end - start) * 1e6, 1)}
+              for name, start, end in spans]
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+
+class NullProfiler:
+    """关闭计时时使用，所有方法都是空操作。"""
+
+    def begin_frame(self):
+        pass
+
+    def lap(self, phase):
+        pass
+
+    def end_frame(self):
+        pass
+
+    def idle(self, seconds):
+        pass
+
+    def report(self):
+        return {}
+
+
+NULL_PROFILER = NullProfiler()
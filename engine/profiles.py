@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+学习者档案：同一台电脑上的每个孩子一个档案，成绩按档案分区存放。
+
+- 默认档案（DEFAULT_PROFILE）就是 data/ 本身，已有的成绩记录不需要迁移
+- 其他档案各占一个目录 data/profiles/<名字>/，目录里是该档案自己的 scores.sqlite3、keystrokes.bin 与报表
+- 当前档案记在 data/profile.json 中，下次启动时沿用
+
+列出档案只扫描目录名，不打开任何成绩文件；成绩、最佳分与最近 N 次统计只在切换到该档案时
+按索引读取（见 StatsEngine.from_store），因此档案再多、历史再长，切换也只取决于当前档案。
+"""
+import json
+import os
+
+
+DEFAULT_PROFILE = '默认'
+INVALID_CHARS = set('/\\:*?"<>|')
+
+
+def clean_name(name):
+    """去掉首尾空白后的档案名；为空、以 . 开头或包含路径字符时返回 None。"""
+    name = name.strip() if isinstance(name, str) else ''
+    if not name or name.startswith('.') or INVALID_CHARS & set(name):
+        return None
+    return name
+
+
+class ProfileRegistry:
+    def __init__(self, data_dir):
+        self.data_dir = data_dir
+        self.root = os.path.join(data_dir, 'profiles')
+        self.state_path = os.path.join(data_dir, 'profile.json')
+
+    def names(self):
+        """默认档案在前，其余按名字排序。"""
+        try:
+            others = sorted(e.name for e in os.scandir(self.root) if e.is_dir() and not e.name.startswith('.'))
+        except OSError:
+            others = []
+        return [DEFAULT_PROFILE] + [n for n in others if n != DEFAULT_PROFILE]
+
+    def path(self, name):
+        """档案的数据目录。"""
+        if name == DEFAULT_PROFILE:
+            return self.data_dir
+        return os.path.join(self.root, name)
+
+    def create(self, name):
+        """新建档案（已存在时直接返回），返回数据目录。名字不能为空或包含路径字符。"""
+        cleaned = clean_name(name)
+        if cleaned is None:
+            raise ValueError(f"无效的档案名：{name!r}")
+        name = cleaned
+        path = self.path(name)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def active(self):
+        """上次使用的档案；记录缺失、名字无效或档案已被删除时为默认档案。"""
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                name = clean_name(json.load(f).get('active'))
+        except Exception:
+            return DEFAULT_PROFILE
+        if name is None or (name != DEFAULT_PROFILE and not os.path.isdir(self.path(name))):
+            return DEFAULT_PROFILE
+        return name
+
+    def set_active(self, name):
+        os.makedirs(self.data_dir, exist_ok=True)
+        tmp = f"{self.state_path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'active': name}, f, ensure_ascii=False)
+        os.replace(tmp, self.state_path)
+
+    def next_name(self, current):
+        names = self.names()
+        if current not in names:
+            return names[0]
+        return names[(names.index(current) + 1) % len(names)]
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+屏幕呈现：脏矩形模式与整帧模式。
+
+- full：沿用原来的做法，每帧整屏填充背景 + display.flip()。
+- dirty：只擦除上一帧画过的区域、只重画本帧的精灵，并用
+  display.update(rects) 提交变化的矩形。静态画面（如菜单）只在
+  invalidate() 之后重画一次，空闲时几乎没有开销。
+  脏区域过多时（如压力测试的大量目标），自动退回整帧提交，避免逐块擦除反而更慢。
+
+调用顺序：begin_frame() → (needs_full_redraw 时画静态层) → draw()/draw_batch()/mark() → present()
+"""
+import time
+
+import pygame
+
+
+RENDER_MODES = ('dirty', 'full')
+
+
+class Renderer:
+    def __init__(self, surface, bg_color, mode='dirty', max_dirty_rects=64):
+        if mode not in RENDER_MODES:
+            raise ValueError(f"未知渲染模式：{mode}（可选：{', '.join(RENDER_MODES)}）")
+        self.surface = surface
+        self.bg_color = bg_color
+        self.mode = mode
+        self.max_dirty_rects = max_dirty_rects
+        self._full_pending = True
+        self._flip_frame = True  # 本帧是否整屏提交
+        self._background = None
+        self._prev_rects = []   # 上一帧精灵占用的区域，本帧需要擦除
+        self._rects = []        # 本帧新画的区域
+        self._frame_start = 0.0
+        # 帧耗时统计（毫秒），用于两种模式的对比
+        self.frames = 0
+        self.total_ms = 0.0
+        self.last_ms = 0.0
+
+    @property
+    def needs_full_redraw(self):
+        """本帧是否需要整屏重画（整帧模式恒为 True）。"""
+        return self.mode == 'full' or self._full_pending
+
+    def invalidate(self):
+        """静态内容发生变化（切换界面、菜单文字更新等），下一帧整屏重画。"""
+        self._full_pending = True
+
+    def begin_frame(self):
+        self._frame_start = time.perf_counter()
+        self._flip_frame = self.needs_full_redraw or len(self._prev_rects) > self.max_dirty_rects
+        if self._flip_frame:
+            self.surface.fill(self.bg_color)
+            self._prev_rects = []
+        elif self._prev_rects:
+            # 用背景图一次性 blits 擦除，比逐块 fill 少很多调用开销
+            bg = self._background_surface()
+            self.surface.blits([(bg, r, r) for r in self._prev_rects], False)
+        self._rects = []
+
+    def _background_surface(self):
+        if self._background is None or self._background.get_size() != self.surface.get_size():
+            self._background = pygame.Surface(self.surface.get_size()).convert(self.surface)
+            self._background.fill(self.bg_color)
+        return self._background
+
+    def draw(self, surf, pos):
+        """绘制会移动/变化的精灵，并记录其区域以便下一帧擦除。"""
+        rect = self.surface.blit(surf, pos)
+        self._rects.append(rect)
+        return rect
+
+    def draw_batch(self, seq, rects):
+        """用一次 Surface.blits 画完一批精灵（seq 为 blits 序列），rects 为它们各自占用的区域。"""
+        surface = self.surface
+        surface.blits(seq, False)
+        if len(self._rects) + len(rects) > self.max_dirty_rects:
+            # 超过上限时下一帧整屏提交，这些区域只用于计数，不必逐个裁剪
+            self._rects.extend(rects)
+            return
+        bounds = surface.get_rect()
+        self._rects.extend(bounds.clip(r) for r in rects if bounds.colliderect(r))
+
+    def mark(self, rect):
+        """记录通过其它方式（pygame.draw 等）画到屏幕上的区域。"""
+        self._rects.append(pygame.Rect(rect))
+
+    def present(self):
+        if self._flip_frame:
+            pygame.display.flip()
+            self._full_pending = False
+        else:
+            changed = self._prev_rects + self._rects
+            if changed:
+                pygame.display.update(changed)
+        self._prev_rects = self._rects
+        self._rects = []
+        self.last_ms = (time.perf_counter() - self._frame_start) * 1000.0
+        self.frames += 1
+        self.total_ms += self.last_ms
+
+    @property
+    def avg_frame_ms(self):
+        return self.total_ms / self.frames if self.frames else 0.0
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+报表缓存：成绩没有变化时不重新生成报表。
+
+- fingerprint(path)：成绩文件的指纹 = 大小 + 修改时间 + 末尾 4KB 的哈希（SQLite 同时计入 -wal 文件），
+  只做 stat 和一次小读取，不解析记录
+- cache_key(fp, kind, params, version)：(指纹, 报表类型, 参数, 工具版本) 的哈希
+- read_changes(path, head, cursor)：用存储的 tail 游标读出上次之后新增的记录，返回变化的模式
+- ReportCache：<输出目录>/report_cache/ 下的 index.json 记录每个输出文件的键、输出文件的 stat
+  以及调用方自定义的状态（如读取游标、分段摘要）；sections/ 按内容哈希保存报表分段，
+  成绩变化时只重建受影响的分段（例如某一模式的图表）
+
+输出文件被删除或被外部修改（stat 不符）时视为未命中。
+同一进程中的多个报表任务可能同时写同一个 index.json：store() 在锁内重新读取磁盘上的索引，
+只合并本次的条目再写回（经唯一的临时文件替换），不会覆盖其他任务刚写入的条目。
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+from engine.storage import open_store
+
+
+TAIL_BYTES = 4096
+
+_INDEX_LOCKS = {}
+_INDEX_LOCKS_GUARD = threading.Lock()
+
+
+def _index_lock(index_path):
+    path = os.path.abspath(index_path)
+    with _INDEX_LOCKS_GUARD:
+        lock = _INDEX_LOCKS.get(path)
+        if lock is None:
+            lock = _INDEX_LOCKS[path] = threading.Lock()
+        return lock
+
+
+def _write_atomic(path, text):
+    """先写入同目录下的唯一临时文件，再替换 path。"""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=os.path.basename(path) + '.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def fingerprint(path):
+    parts = []
+    for p in (path, path + '-wal'):
+        try:
+            st = os.stat(p)
+        except OSError:
+            parts.append('-')
+            continue
+        with open(p, 'rb') as f:
+            f.seek(max(0, st.st_size - TAIL_BYTES))
+            tail = f.read()
+        parts.append(f"{st.st_size}:{st.st_mtime_ns}:{hashlib.sha1(tail).hexdigest()}")
+    return hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()
+
+
+def cache_key(fp, kind, params, version):
+    raw = json.dumps([fp, kind, params, version], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def read_changes(path, head, cursor):
+    """返回 (变化的模式集合, 首条记录, 新游标)；需要全部重建时集合为 None
+    （没有游标、首条记录不同即数据源被替换、游标超出范围）。"""
+    if not os.path.exists(path):
+        return None, None, None
+    store = open_store(path)
+    try:
+        first = next(store.iter_sessions(), None)
+        new_head = list(first) if first is not None else None
+        if cursor is None or new_head != head:
+            return None, new_head, store.end_cursor()
+        records, new_cursor = store.tail(cursor)
+        if records is None:
+            return None, new_head, store.end_cursor()
+        return {r.level for r in records}, new_head, new_cursor
+    finally:
+        store.close()
+
+
+def _stat(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+class ReportCache:
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.index_path = os.path.join(cache_dir, 'index.json')
+        self.sections_dir = os.path.join(cache_dir, 'sections')
+        self.index = self._load()
+
+    def _load(self):
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception:
+            return {}
+
+    @classmethod
+    def for_output(cls, out_path):
+        return cls(os.path.join(os.path.dirname(os.path.abspath(out_path)), 'report_cache'))
+
+    def entry(self, out_path):
+        """out_path 上次写入时记录的状态（dict），没有时为 {}。"""
+        return self.index.get(os.path.abspath(out_path)) or {}
+
+    def hit(self, out_path, key):
+        """键相同且输出文件未被改动时命中。"""
+        entry = self.entry(out_path)
+        return entry.get('key') == key and entry.get('out') == _stat(out_path)
+
+    def store(self, out_path, key, **state):
+        """记录 out_path 刚以 key 写入（在输出文件写完之后调用）。"""
+        path = os.path.abspath(out_path)
+        entry = dict(state, key=key, out=_stat(out_path))
+        with _index_lock(self.index_path):
+            index = self._load()
+            previous = index.get(path) or {}
+            index[path] = entry
+            self._prune(index, (previous.get('sections') or {}).values())
+            _write_atomic(self.index_path, json.dumps(index, ensure_ascii=False))
+            self.index = index
+
+    def put_section(self, text):
+        """保存一个分段，返回其内容哈希。"""
+        digest = hashlib.sha1(text.encode('utf-8')).hexdigest()
+        path = os.path.join(self.sections_dir, digest + '.html')
+        if not os.path.exists(path):
+            _write_atomic(path, text)
+        return digest
+
+    def get_section(self, digest):
+        try:
+            with open(os.path.join(self.sections_dir, digest + '.html'), 'r', encoding='utf-8') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def _prune(self, index, candidates):
+        """删除 candidates（被替换的条目引用过的分段）中不再被任何输出引用的分段。
+
+        只看被替换的条目，其他任务刚写入、还没登记到索引的分段不会被误删。
+        """
+        used = set()
+        for entry in index.values():
+            used.update((entry.get('sections') or {}).values())
+        for digest in set(candidates) - used:
+            try:
+                os.remove(os.path.join(self.sections_dir, digest + '.html'))
+            except OSError:
+                pass
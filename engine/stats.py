@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+增量成绩统计：每个模式的历史最佳 + 最近 N 次平均。
+
+原来的 compute_stats 每帧为每个模式扫描一遍全部历史；这里在追加一局成绩时
+以 O(1) 更新最佳分和各个滑动窗口的累加和，查询时直接读取结果，
+开销与 scores.csv 的大小无关。
+"""
+from collections import deque
+
+
+class StatsEngine:
+    def __init__(self, levels=(1, 2, 3), windows=(5, 10, 30)):
+        self.levels = tuple(levels)
+        self.windows = tuple(sorted(set(int(n) for n in windows if int(n) > 0)))
+        self.version = 0  # 每次追加成绩后递增，供界面判断是否需要重画
+        self._best = {lvl: 0 for lvl in self.levels}
+        self._count = {lvl: 0 for lvl in self.levels}
+        # (模式, 窗口大小) -> (最近 N 次分数, 累加和)
+        self._recent = {(lvl, n): deque(maxlen=n) for lvl in self.levels for n in self.windows}
+        self._sums = {(lvl, n): 0 for lvl in self.levels for n in self.windows}
+
+    @classmethod
+    def from_rows(cls, rows, levels=(1, 2, 3), windows=(5, 10, 30)):
+        """从按时间顺序排列的成绩记录（含 level、score）构建。"""
+        engine = cls(levels, windows)
+        for r in rows:
+            engine.add(r['level'], r['score'])
+        return engine
+
+    @classmethod
+    def from_store(cls, store, levels=(1, 2, 3), windows=(5, 10, 30)):
+        """从存储后端的索引查询构建：只读取每个模式最近 max(windows) 局，启动开销与历史长度无关。"""
+        engine = cls(levels, windows)
+        keep = engine.windows[-1] if engine.windows else 0
+        for lvl in engine.levels:
+            for score in store.recent_scores(lvl, keep):
+                engine.add(lvl, score)
+            engine._best[lvl] = store.best(lvl)
+            engine._count[lvl] = store.count(lvl)
+        return engine
+
+    def add(self, level, score):
+        if level not in self._best:
+            return
+        if self._count[level] == 0 or score > self._best[level]:
+            self._best[level] = score
+        self._count[level] += 1
+        for n in self.windows:
+            key = (level, n)
+            window = self._recent[key]
+            if len(window) == n:
+                self._sums[key] -= window[0]
+            window.append(score)
+            self._sums[key] += score
+        self.version += 1
+
+    def best(self, level):
+        return self._best.get(level, 0)
+
+    def count(self, level):
+        return self._count.get(level, 0)
+
+    def recent_avg(self, level, n):
+        key = (level, n)
+        if key not in self._sums:
+            raise KeyError(f"未跟踪的统计窗口：{n}（可选：{self.windows}）")
+        window = self._recent[key]
+        return int(self._sums[key] / len(window)) if window else 0
+
+    def stats(self, n):
+        """与旧版 compute_stats 相同的结构：{level: {'best': .., 'recent_avg': ..}}"""
+        return {lvl: {'best': self.best(lvl), 'recent_avg': self.recent_avg(lvl, n)} for lvl in self.levels}
@@ -0,0 +1,549 @@
+# -*- coding: utf-8 -*-
+"""
+成绩存储后端：每局一条记录（时间、模式、得分、用时、完成数量）。
+
+- SqliteStore（默认，data/scores.sqlite3）：WAL 模式，(level, timestamp) 与 (level, score) 索引，
+  启动时的最佳分、最近 N 次查询都走索引，与历史长度无关
+- BinaryLogStore（data/scores.bin）：定长记录的追加日志 + 每个模式一份记录号索引 + 小型摘要文件
+- CsvStore（data/scores.csv）：原来的 CSV 格式，便于用表格软件查看
+
+open_store(path) 按扩展名选择后端；migrate_csv() 把旧的 scores.csv 一次性导入新后端。
+所有后端的 iter_sessions(level=, since=) 都是单遍流式读取，筛选条件在扫描时直接生效，
+返回紧凑的 SessionRecord（namedtuple），游戏与 tools/ 下的报表脚本共用。
+"""
+import csv
+import json
+import os
+import sqlite3
+import struct
+from array import array
+from collections import namedtuple
+from datetime import date, datetime
+from itertools import islice
+
+
+MODE_NAME = {1: '大写字母', 2: '小写字母', 3: '拼音'}
+CSV_HEADER = ['timestamp', 'level', 'mode', 'score', 'duration_sec', 'completed']
+
+# timestamp 为 ISO 格式字符串（精确到秒），字符串顺序即时间顺序
+SessionRecord = namedtuple('SessionRecord', CSV_HEADER)
+
+
+# 日期 → 周/月标签的缓存；同一天的记录只计算一次 isocalendar
+_DATE_CACHE = {}
+
+
+def record_date(ts):
+    """取时间戳的日期部分。标准格式 YYYY-MM-DDTHH:MM:SS 直接截取并缓存，其它格式退回 fromisoformat。"""
+    day = ts[:10]
+    d = _DATE_CACHE.get(day)
+    if d is None:
+        try:
+            if len(ts) >= 10 and ts[4] == '-' and ts[7] == '-':
+                d = date(int(ts[0:4]), int(ts[5:7]), int(ts[8:10]))
+            else:
+                d = datetime.fromisoformat(ts).date()
+        except (ValueError, IndexError):
+            return None
+        if len(_DATE_CACHE) > 100000:
+            _DATE_CACHE.clear()
+        _DATE_CACHE[day] = d
+    return d
+
+
+def period_key(period, ts):
+    """周报标签 2025-W48 / 月报标签 2025-11；时间戳无法解析时返回 None。"""
+    d = record_date(ts)
+    if d is None:
+        return None
+    if period == 'weekly':
+        year, week, _ = d.isocalendar()
+        return f"{year}-W{week:02d}"
+    return f"{d.year}-{d.month:02d}"
+
+
+def make_record(level, score, duration_sec, completed, timestamp=None, mode=None):
+    """mode 为显示名称，默认按 MODE_NAME 查找（关卡包中新增的关卡由调用方传入）。"""
+    ts = timestamp or datetime.now().isoformat(timespec='seconds')
+    mode = mode or MODE_NAME.get(level, str(level))
+    return SessionRecord(ts, int(level), mode, int(score), int(duration_sec), int(completed))
+
+
+class SessionStore:
+    """存储后端接口。iter_sessions 按时间升序返回 SessionRecord。"""
+
+    def append(self, rec):
+        self.extend([rec])
+
+    def extend(self, records):
+        raise NotImplementedError
+
+    def iter_sessions(self, level=None, since=None):
+        raise NotImplementedError
+
+    def count(self, level=None):
+        return sum(1 for _ in self.iter_sessions(level))
+
+    def best(self, level):
+        return max((r.score for r in self.iter_sessions(level)), default=0)
+
+    def recent_scores(self, level, n):
+        """某模式最近 n 局的分数（时间升序）。"""
+        scores = [r.score for r in self.iter_sessions(level)]
+        return scores[-n:] if n > 0 else []
+
+    def tail(self, cursor=None):
+        """读取游标之后追加的记录，返回 (记录迭代器, 新游标)。
+
+        游标是后端自定义的整数（记录号、行 id 或文件偏移），None 表示从头读取；
+        新游标在读取前确定，迭代器只产出到该位置为止的记录，逐条读取，内存占用与历史长度无关
+        （迭代需在 close() 之前完成）。游标超出当前数据范围（文件被替换或截断）时返回 (None, None)，
+        调用方应从头重建。
+        """
+        start = cursor or 0
+        end = self.end_cursor()
+        if start > end:
+            return None, None
+        return islice(self.iter_sessions(), start, end), end
+
+    def end_cursor(self):
+        """当前数据末尾的游标（与 tail 返回的游标含义相同），不读取记录。"""
+        return self.count()
+
+    def close(self):
+        pass
+
+
+class CsvStore(SessionStore):
+    def __init__(self, path):
+        self.path = path
+
+    def extend(self, records):
+        is_new = not os.path.exists(self.path)
+        with open(self.path, 'a', newline='', encoding='utf-8-sig') as f:
+            writer = csv.writer(f)
+            if is_new:
+                writer.writerow(CSV_HEADER)
+            writer.writerows(records)
+
+    @staticmethod
+    def _parse_rows(rows, columns=None, level=None, since=None):
+        """csv.reader 行 → SessionRecord。先按原始字符串筛选，再做整数转换。"""
+        if columns is None:
+            columns = range(len(CSV_HEADER))
+        i_ts, i_lv, i_mode, i_score, i_dur, i_done = columns
+        want_level = None if level is None else str(level)
+        for row in rows:
+            try:
+                ts = row[i_ts]
+                if since is not None and ts < since:
+                    continue
+                lv = row[i_lv]
+                if want_level is not None and lv != want_level:
+                    continue
+                yield SessionRecord(ts, int(lv or 0), row[i_mode], int(row[i_score] or 0),
+                                    int(row[i_dur] or 0), int(row[i_done] or 0))
+            except (ValueError, IndexError):
+                continue
+
+    def iter_sessions(self, level=None, since=None):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8-sig', newline='') as f:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if not header:
+                return
+            try:
+                columns = [header.index(name) for name in CSV_HEADER]
+            except ValueError:
+                return
+            yield from self._parse_rows(reader, columns, level, since)
+
+    def tail(self, cursor=None):
+        # 游标为文件字节偏移，只消费完整的行；末尾偏移先确定，之后追加的行留给下一次
+        if not os.path.exists(self.path):
+            return (iter(()), 0) if not cursor else (None, None)
+        start = cursor or 0
+        if start > os.path.getsize(self.path):
+            return None, None
+        end = max(start, self.end_cursor())
+        return self._tail_rows(start, end), end
+
+    def _tail_rows(self, start, end):
+        with open(self.path, 'rb') as f:
+            f.seek(start)
+            rows = csv.reader(self._read_lines(f, start, end))
+            columns = None
+            if start == 0:
+                header = next(rows, None) or []
+                try:
+                    columns = [header.index(name) for name in CSV_HEADER]
+                except ValueError:
+                    return
+            yield from self._parse_rows(rows, columns)
+
+    @staticmethod
+    def _read_lines(f, pos, end):
+        """逐行读取 [pos, end) 范围内的完整行并解码（文件开头的 BOM 去掉）。"""
+        first = pos == 0
+        while pos < end:
+            line = f.readline()
+            if not line:
+                break
+            pos += len(line)
+            yield line.decode('utf-8-sig' if first else 'utf-8')
+            first = False
+
+    def end_cursor(self):
+        # 最后一个完整行之后的偏移：从文件末尾向前找换行符
+        if not os.path.exists(self.path):
+            return 0
+        with open(self.path, 'rb') as f:
+            pos = f.seek(0, os.SEEK_END)
+            while pos > 0:
+                step = min(4096, pos)
+                f.seek(pos - step)
+                chunk = f.read(step)
+                nl = chunk.rfind(b'\n')
+                if nl >= 0:
+                    return pos - step + nl + 1
+                pos -= step
+        return 0
+
+
+class SqliteStore(SessionStore):
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                id INTEGER PRIMARY KEY,
+                timestamp TEXT NOT NULL,
+                level INTEGER NOT NULL,
+                mode TEXT NOT NULL,
+                score INTEGER NOT NULL,
+                duration_sec INTEGER NOT NULL,
+                completed INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_sessions_level_ts ON sessions (level, timestamp);
+            CREATE INDEX IF NOT EXISTS idx_sessions_level_score ON sessions (level, score);
+            CREATE INDEX IF NOT EXISTS idx_sessions_ts ON sessions (timestamp);
+        """)
+
+    def extend(self, records):
+        with self.conn:
+            self.conn.executemany(
+                'INSERT INTO sessions (timestamp, level, mode, score, duration_sec, completed) VALUES (?, ?, ?, ?, ?, ?)',
+                records)
+
+    def iter_sessions(self, level=None, since=None):
+        sql = 'SELECT timestamp, level, mode, score, duration_sec, completed FROM sessions'
+        where, args = [], []
+        if level is not None:
+            where.append('level = ?')
+            args.append(level)
+        if since is not None:
+            where.append('timestamp >= ?')
+            args.append(since)
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY timestamp, id'
+        for row in self.conn.execute(sql, args):
+            yield SessionRecord._make(row)
+
+    def count(self, level=None):
+        if level is None:
+            return self.conn.execute('SELECT COUNT(*) FROM sessions').fetchone()[0]
+        return self.conn.execute('SELECT COUNT(*) FROM sessions WHERE level = ?', (level,)).fetchone()[0]
+
+    def best(self, level):
+        row = self.conn.execute('SELECT MAX(score) FROM sessions WHERE level = ?', (level,)).fetchone()
+        return row[0] or 0
+
+    def recent_scores(self, level, n):
+        rows = self.conn.execute(
+            'SELECT score FROM sessions WHERE level = ? ORDER BY timestamp DESC, id DESC LIMIT ?', (level, n)).fetchall()
+        return [r[0] for r in reversed(rows)]
+
+    def tail(self, cursor=None):
+        # 游标为最后读取的行 id；逐行从 SQLite 游标取出，不一次性 fetchall
+        start = cursor or 0
+        last = self.end_cursor()
+        if start > last:
+            return None, None
+        rows = self.conn.execute(
+            'SELECT timestamp, level, mode, score, duration_sec, completed FROM sessions '
+            'WHERE id > ? AND id <= ? ORDER BY id', (start, last))
+        return map(SessionRecord._make, rows), last
+
+    def end_cursor(self):
+        return self.conn.execute('SELECT MAX(id) FROM sessions').fetchone()[0] or 0
+
+    def close(self):
+        self.conn.close()
+
+
+class BinaryLogStore(SessionStore):
+    """定长记录追加日志。
+
+    - <path>：每条记录 struct '<IBiII'（epoch 秒、模式、得分、用时、完成数量）
+    - <path>.L<level>.idx：该模式的记录号（uint32），追加写入，天然按时间有序
+    - <path>.meta.json：每个模式的局数、最佳分与显示名称（记录本身不存名称，
+      关卡包中新增的关卡靠这里还原名称）
+
+    写入顺序是数据文件 → 索引 → 摘要，记录总数以数据文件大小为准。打开时总数（或各索引的长度）
+    与摘要不符，说明上次写入中途退出：截掉末尾不完整的记录，扫描一遍数据文件重建摘要与索引。
+    """
+
+    RECORD = struct.Struct('<IBiII')
+
+    def __init__(self, path):
+        self.path = path
+        self.meta_path = path + '.meta.json'
+        self.meta = None
+        try:
+            with open(self.meta_path, 'r', encoding='utf-8') as f:
+                self.meta = json.load(f)
+        except (OSError, ValueError):
+            pass
+        self._names = {}
+        if self.meta is not None:
+            self._names = {int(k): v['name'] for k, v in self.meta['levels'].items() if v.get('name')}
+        count = self._record_count()
+        if self.meta is None or self.meta.get('count') != count or not self._indexes_match():
+            self._rebuild()
+
+    def _idx_path(self, level):
+        return f"{self.path}.L{level}.idx"
+
+    def _record_count(self):
+        """数据文件中完整记录的条数；末尾有不完整的记录（写入中途退出）时把它截掉。"""
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return 0
+        count, partial = divmod(size, self.RECORD.size)
+        if partial:
+            with open(self.path, 'r+b') as f:
+                f.truncate(count * self.RECORD.size)
+        return count
+
+    def _indexes_match(self):
+        itemsize = array('I').itemsize
+        for level, lv in self.meta['levels'].items():
+            try:
+                size = os.path.getsize(self._idx_path(level))
+            except OSError:
+                size = 0
+            if size != lv['count'] * itemsize:
+                return False
+        return True
+
+    def _rebuild(self):
+        """扫描数据文件，重写摘要与所有索引（已知的模式名称保留）。"""
+        meta = {'count': 0, 'levels': {}}
+        per_level = {}
+        for recno, rec in enumerate(self.iter_sessions()):
+            lv = meta['levels'].setdefault(str(rec.level), {'count': 0, 'best': rec.score, 'name': rec.mode})
+            lv['count'] += 1
+            lv['best'] = max(lv['best'], rec.score)
+            per_level.setdefault(rec.level, array('I')).append(recno)
+            meta['count'] += 1
+        prefix = os.path.basename(self.path) + '.L'
+        directory = os.path.dirname(os.path.abspath(self.path))
+        for name in (os.listdir(directory) if os.path.isdir(directory) else ()):
+            if name.startswith(prefix) and name.endswith('.idx'):
+                os.remove(os.path.join(directory, name))
+        for level, recnos in per_level.items():
+            with open(self._idx_path(level), 'wb') as f:
+                recnos.tofile(f)
+        self.meta = meta
+        self._names = {int(k): v['name'] for k, v in meta['levels'].items()}
+        if meta['count'] or os.path.exists(self.meta_path):
+            self._write_meta()
+
+    def _write_meta(self):
+        tmp = self.meta_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.meta, f)
+        os.replace(tmp, self.meta_path)
+
+    def _encode(self, rec):
+        epoch = int(datetime.fromisoformat(rec.timestamp).timestamp())
+        return self.RECORD.pack(epoch, rec.level, rec.score, rec.duration_sec, rec.completed)
+
+    def _decode(self, buf):
+        epoch, level, score, duration, completed = self.RECORD.unpack(buf)
+        ts = datetime.fromtimestamp(epoch).isoformat(timespec='seconds')
+        mode = self._names.get(level) or MODE_NAME.get(level, str(level))
+        return SessionRecord(ts, level, mode, score, duration, completed)
+
+    def extend(self, records):
+        per_level = {}
+        with open(self.path, 'ab') as f:
+            # 记录号按数据文件的实际大小计算，不依赖摘要中的计数
+            recno = f.tell() // self.RECORD.size
+            for rec in records:
+                f.write(self._encode(rec))
+                per_level.setdefault(rec.level, array('I')).append(recno)
+                lv = self.meta['levels'].setdefault(str(rec.level), {'count': 0, 'best': rec.score})
+                if rec.mode and lv.get('name') != rec.mode:
+                    lv['name'] = self._names[rec.level] = rec.mode
+                lv['count'] += 1
+                lv['best'] = max(lv['best'], rec.score)
+                recno += 1
+        for level, recnos in per_level.items():
+            with open(self._idx_path(level), 'ab') as f:
+                recnos.tofile(f)
+        self.meta['count'] = recno
+        self._write_meta()
+
+    def _read_recnos(self, level, last=None):
+        path = self._idx_path(level)
+        if not os.path.exists(path):
+            return array('I')
+        itemsize = array('I').itemsize
+        out = array('I')
+        with open(path, 'rb') as f:
+            if last is not None:
+                f.seek(0, os.SEEK_END)
+                f.seek(max(0, f.tell() - last * itemsize))
+            out.frombytes(f.read())
+        return out
+
+    def iter_sessions(self, level=None, since=None):
+        if not os.path.exists(self.path):
+            return
+        size = self.RECORD.size
+        with open(self.path, 'rb') as f:
+            if level is None:
+                while True:
+                    buf = f.read(size * 4096)
+                    if not buf:
+                        break
+                    for off in range(0, len(buf) - size + 1, size):
+                        rec = self._decode(buf[off:off + size])
+                        if since is None or rec.timestamp >= since:
+                            yield rec
+            else:
+                for recno in self._read_recnos(level):
+                    f.seek(recno * size)
+                    rec = self._decode(f.read(size))
+                    if since is None or rec.timestamp >= since:
+                        yield rec
+
+    def tail(self, cursor=None):
+        # 游标为记录号
+        start = cursor or 0
+        total = self.meta['count']
+        if start > total:
+            return None, None
+        return self._tail_records(start, total), total
+
+    def _tail_records(self, start, end):
+        if start >= end:
+            return
+        size = self.RECORD.size
+        with open(self.path, 'rb') as f:
+            f.seek(start * size)
+            remaining = (end - start) * size
+            while remaining > 0:
+                buf = f.read(min(remaining, size * 4096))
+                if len(buf) < size:
+                    break
+                remaining -= len(buf)
+                for off in range(0, len(buf) - size + 1, size):
+                    yield self._decode(buf[off:off + size])
+
+    def end_cursor(self):
+        return self.meta['count']
+
+    def count(self, level=None):
+        if level is None:
+            return self.meta['count']
+        return self.meta['levels'].get(str(level), {}).get('count', 0)
+
+    def best(self, level):
+        return self.meta['levels'].get(str(level), {}).get('best', 0)
+
+    def recent_scores(self, level, n):
+        if n <= 0 or not os.path.exists(self.path):
+            return []
+        size = self.RECORD.size
+        out = []
+        with open(self.path, 'rb') as f:
+            for recno in self._read_recnos(level, last=n):
+                f.seek(recno * size)
+                out.append(self.RECORD.unpack(f.read(size))[2])
+        return out
+
+
+BACKENDS = {
+    'sqlite': ('scores.sqlite3', SqliteStore),
+    'binlog': ('scores.bin', BinaryLogStore),
+    'csv': ('scores.csv', CsvStore),
+}
+
+
+def store_path(data_dir, backend='sqlite'):
+    return os.path.join(data_dir, BACKENDS[backend][0])
+
+
+def open_store(path):
+    """按扩展名打开存储：.csv → CsvStore，.bin → BinaryLogStore，其余 → SqliteStore。"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.csv':
+        return CsvStore(path)
+    if ext == '.bin':
+        return BinaryLogStore(path)
+    return SqliteStore(path)
+
+
+def read_sessions(path, level=None, since=None):
+    """共享的流式读取入口：打开 path 对应的存储，逐条产出 SessionRecord，读完自动关闭。"""
+    if not os.path.exists(path):
+        return
+    store = open_store(path)
+    try:
+        yield from store.iter_sessions(level=level, since=since)
+    finally:
+        store.close()
+
+
+def migrate_csv(csv_path, store, batch=10000):
+    """把 CSV 中的记录批量导入 store，返回导入条数。"""
+    total = 0
+    chunk = []
+    for rec in CsvStore(csv_path).iter_sessions():
+        chunk.append(rec)
+        if len(chunk) >= batch:
+            store.extend(chunk)
+            total += len(chunk)
+            chunk = []
+    if chunk:
+        store.extend(chunk)
+        total += len(chunk)
+    return total
+
+
+def find_scores(data_dir):
+    """返回 data_dir 下已存在的成绩文件（依次查找 sqlite、binlog、csv），都不存在时返回 sqlite 路径。"""
+    for backend in BACKENDS:
+        path = store_path(data_dir, backend)
+        if os.path.exists(path):
+            return path
+    return store_path(data_dir, 'sqlite')
+
+
+def open_game_store(data_dir, backend='sqlite'):
+    """打开游戏使用的存储；新建非 CSV 存储时，若存在旧的 scores.csv 则一次性迁移。"""
+    path = store_path(data_dir, backend)
+    fresh = not os.path.exists(path)
+    store = open_store(path)
+    legacy_csv = store_path(data_dir, 'csv')
+    if fresh and backend != 'csv' and os.path.exists(legacy_csv):
+        migrate_csv(legacy_csv, store)
+    return store
@@ -0,0 +1,425 @@
+# -*- coding: utf-8 -*-
+"""
+下落目标池：结构化数组（SoA）存储，按 y 从下到上排列，队首就是最靠近屏幕底部的目标。
+
+- x、y、速度、进度、文字 id、颜色 id、出现时间各占一条连续缓冲区（有 NumPy 时用 ndarray，
+  否则退回标准库 array），文字与颜色都以整数 id 存放（文字在池内驻留去重）
+- update(bottom, dt)：一步完成全部目标的移动（speed * dt）、排序检查、落出屏幕剔除和批量压缩
+- front()：O(1) 取得最靠下的活动目标（键盘输入优先匹配它）
+- discard()：只做标记，真正的删除在下一次 update() 中批量完成
+- press(char)：按键路由到任意能接上的目标（见 engine/matcher.py），前缀索引随目标出现/消失增量维护
+- PooledTarget：带 __slots__ 的外观对象，保持原 Target 的 x/y/text/completed_part 等接口；
+  未加入目标池时值保存在自身，加入后读写直接落到池的缓冲区
+
+大量目标时可以用 spawn() 直接写入缓冲区，不创建任何 Python 对象；
+绘制时用 items() 一次性取出 (text, color, x, y, done) 列表；固定步长模拟时传入 lag，
+按速度把 y 插值回两步之间的位置。
+"""
+from array import array
+
+from engine.matcher import PrefixIndex
+
+try:
+    import numpy as np
+except ImportError:  # 没有 NumPy 时退回标准库 array，逐个元素循环
+    np = None
+
+
+# 字段名 -> (array 类型码, NumPy dtype)
+_FIELDS = {
+    'x': ('f', 'float32'),
+    'y': ('f', 'float32'),
+    'speed': ('f', 'float32'),
+    'progress': ('H', 'uint16'),
+    'text_id': ('i', 'int32'),
+    'color_id': ('B', 'uint8'),
+    'born': ('d', 'float64'),  # 出现时的模拟时间（秒），用于统计反应时间
+    'handle': ('i', 'int32'),
+    'alive': ('B', 'bool'),
+}
+
+
+def _alloc(name, capacity):
+    typecode, dtype = _FIELDS[name]
+    if np is not None:
+        return np.zeros(capacity, dtype=dtype)
+    return array(typecode, bytes(capacity * array(typecode).itemsize))
+
+
+def _grow(buf, name, n, capacity):
+    new = _alloc(name, capacity)
+    new[:n] = buf[:n]
+    return new
+
+
+class PooledTarget:
+    """目标外观对象：与原 Target 相同的属性接口，数据可存放在 TargetPool 中。"""
+
+    __slots__ = ('_pool', '_handle', '_text', '_color_id', '_x', '_y', '_speed', '_progress', '_alive', '_born')
+
+    # 未挂接到目标池时用于解析 color_id 的调色板，子类可覆盖
+    palette = ((0, 0, 0),)
+
+    def __init__(self, text, speed, x=0, y=-50, color_id=0, born=0.0):
+        self._pool = None
+        self._handle = -1
+        self._text = text
+        self._color_id = color_id
+        self._x = x
+        self._y = y
+        self._speed = speed
+        self._progress = 0
+        self._alive = True
+        self._born = born
+
+    # --- 与池之间的挂接 ---
+    def _slot(self):
+        return self._pool._slot_of[self._handle]
+
+    def _detach(self):
+        """从池中移出时把当前值拷回自身，之后仍可正常读写。"""
+        pool = self._pool
+        i = pool._slot_of[self._handle]
+        self._x = float(pool.x[i])
+        self._y = float(pool.y[i])
+        self._speed = float(pool.speed[i])
+        self._progress = int(pool.progress[i])
+        self._born = float(pool.born[i])
+        self._pool = None
+        self._handle = -1
+        self._alive = False
+
+    # --- 属性 ---
+    @property
+    def text(self):
+        return self._text
+
+    @property
+    def color(self):
+        pool = self._pool
+        return (pool.palette if pool is not None else self.palette)[self._color_id]
+
+    @property
+    def x(self):
+        return self._x if self._pool is None else float(self._pool.x[self._slot()])
+
+    @x.setter
+    def x(self, value):
+        if self._pool is None:
+            self._x = value
+        else:
+            self._pool.x[self._slot()] = value
+
+    @property
+    def y(self):
+        return self._y if self._pool is None else float(self._pool.y[self._slot()])
+
+    @y.setter
+    def y(self, value):
+        if self._pool is None:
+            self._y = value
+        else:
+            self._pool.y[self._slot()] = value
+            self._pool._order_dirty = True
+
+    @property
+    def speed(self):
+        return self._speed if self._pool is None else float(self._pool.speed[self._slot()])
+
+    @speed.setter
+    def speed(self, value):
+        if self._pool is None:
+            self._speed = value
+        else:
+            self._pool.speed[self._slot()] = value
+
+    @property
+    def completed_part(self):
+        """已经打出的部分（用于拼音模式）。"""
+        done = self._progress if self._pool is None else int(self._pool.progress[self._slot()])
+        return self._text[:done]
+
+    @completed_part.setter
+    def completed_part(self, value):
+        if self._pool is None:
+            self._progress = len(value)
+        else:
+            self._pool.progress[self._slot()] = len(value)
+
+    @property
+    def born(self):
+        return self._born if self._pool is None else float(self._pool.born[self._slot()])
+
+    @property
+    def alive(self):
+        return self._alive if self._pool is None else bool(self._pool.alive[self._slot()])
+
+    def move(self, dt=1.0):
+        self.y = self.y + self.speed * dt
+
+
+class TargetPool:
+    def __init__(self, palette, capacity=256):
+        self.palette = tuple(palette)
+        self._capacity = max(1, int(capacity))
+        self._n = 0        # 已占用的槽位（含已标记删除、尚未压缩的）
+        self._live = 0     # 活动目标数量
+        self._order_dirty = False
+        for name in _FIELDS:
+            setattr(self, name, _alloc(name, self._capacity))
+        # 句柄 -> 槽位；压缩或重排后槽位会变，外观对象通过句柄定位
+        self._slot_of = _alloc('handle', self._capacity)
+        self._free_handles = []
+        self._next_handle = 0
+        self._facades = {}
+        # 文字驻留表
+        self._texts = []
+        self._text_ids = {}
+        # 按键路由用的前缀索引（只含活动目标）
+        self.index = PrefixIndex()
+
+    def __len__(self):
+        return self._live
+
+    def __bool__(self):
+        return self._live > 0
+
+    def __iter__(self):
+        """按从下到上的顺序遍历活动目标的外观对象。"""
+        alive = self.alive
+        handle = self.handle
+        for i in range(self._n):
+            if alive[i]:
+                yield self._facade(int(handle[i]), i)
+
+    # --- 内部工具 ---
+    def _intern(self, text):
+        tid = self._text_ids.get(text)
+        if tid is None:
+            tid = len(self._texts)
+            self._texts.append(text)
+            self._text_ids[text] = tid
+        return tid
+
+    def _ensure_capacity(self, need):
+        if need <= self._capacity:
+            return
+        cap = self._capacity
+        while cap < need:
+            cap *= 2
+        for name in _FIELDS:
+            setattr(self, name, _grow(getattr(self, name), name, self._n, cap))
+        self._slot_of = _grow(self._slot_of, 'handle', self._next_handle, cap)
+        self._capacity = cap
+
+    def _new_handle(self):
+        if self._free_handles:
+            return self._free_handles.pop()
+        h = self._next_handle
+        self._next_handle += 1
+        return h
+
+    def _facade(self, h, slot):
+        f = self._facades.get(h)
+        if f is None:
+            f = PooledTarget.__new__(PooledTarget)
+            f._pool = self
+            f._handle = h
+            f._text = self._texts[self.text_id[slot]]
+            f._color_id = int(self.color_id[slot])
+            self._facades[h] = f
+        return f
+
+    def _reindex(self):
+        n = self._n
+        if np is not None:
+            self._slot_of[self.handle[:n]] = np.arange(n, dtype='int32')
+        else:
+            slot_of = self._slot_of
+            handle = self.handle
+            for i in range(n):
+                slot_of[handle[i]] = i
+
+    def _take(self, idx):
+        """按下标序列 idx 重排/压缩所有缓冲区，结果占据前 len(idx) 个槽位。"""
+        m = len(idx)
+        for name in _FIELDS:
+            buf = getattr(self, name)
+            if np is not None:
+                buf[:m] = buf[:self._n][idx]
+            else:
+                buf[:m] = array(buf.typecode, [buf[i] for i in idx])
+        self._n = m
+        self._reindex()
+
+    def _release(self, slots):
+        index = self.index
+        for i in slots:
+            h = int(self.handle[i])
+            index.remove(h)
+            f = self._facades.pop(h, None)
+            if f is not None:
+                f._detach()
+            self._free_handles.append(h)
+
+    def _sort(self):
+        n = self._n
+        if n > 1:
+            if np is not None:
+                order = np.argsort(-self.y[:n], kind='stable')
+            else:
+                y = self.y
+                order = sorted(range(n), key=lambda i: -y[i])
+            self._take(order)
+        self._order_dirty = False
+
+    # --- 公共接口 ---
+    def clear(self):
+        self._release(i for i in range(self._n))
+        self.index.clear()
+        self._n = 0
+        self._live = 0
+        self._order_dirty = False
+
+    def spawn(self, text, speed, x, y, color_id=0, born=0.0):
+        """直接写入缓冲区（不创建 Python 对象），返回句柄。"""
+        n = self._n
+        self._ensure_capacity(max(n + 1, self._next_handle + 1))
+        h = self._new_handle()
+        self.x[n] = x
+        self.y[n] = y
+        self.speed[n] = speed
+        self.progress[n] = 0
+        self.text_id[n] = self._intern(text)
+        self.color_id[n] = color_id
+        self.born[n] = born
+        self.handle[n] = h
+        self.alive[n] = True
+        self._slot_of[h] = n
+        self.index.add(h, text)
+        # 新目标一般从顶部出现（y 最小），直接落在队尾；否则下次访问前重新排序
+        if n and self.y[n - 1] < self.y[n]:
+            self._order_dirty = True
+        self._n = n + 1
+        self._live += 1
+        return h
+
+    def add(self, target):
+        """把一个未挂接的 PooledTarget 放入池中，之后它的读写都落到缓冲区。"""
+        h = self.spawn(target._text, target._speed, target._x, target._y, target._color_id, target._born)
+        self.progress[self._n - 1] = target._progress
+        target._pool = self
+        target._handle = h
+        target._alive = True
+        self._facades[h] = target
+        return target
+
+    def front(self):
+        """最靠近底部（y 最大）的活动目标；没有目标时返回 None。"""
+        if self._order_dirty:
+            self._sort()
+        alive = self.alive
+        for i in range(self._n):
+            if alive[i]:
+                return self._facade(int(self.handle[i]), i)
+        return None
+
+    def discard(self, target):
+        """标记删除（例如被打完），实际移除延迟到下一次 update()。"""
+        if target._pool is self:
+            i = self._slot_of[target._handle]
+            if self.alive[i]:
+                self.alive[i] = False
+                self._live -= 1
+                self.index.remove(target._handle)
+
+    def engaged(self):
+        """当前锁定（正在打）的目标；没有锁定时为最靠下的目标。用于记录按错的键。"""
+        h = self.index.engaged
+        if h is None:
+            return self.front()
+        return self._facade(h, self._slot_of[h])
+
+    def press(self, char):
+        """把一次按键交给能接上的目标并更新其进度，返回该目标（外观对象）；没有目标接得上时返回 None。
+
+        换到另一个目标时，原来锁定的目标进度清零。
+        """
+        h, depth, dropped = self.index.press(char)
+        if dropped is not None:
+            self.progress[self._slot_of[dropped]] = 0
+        if h is None:
+            return None
+        i = self._slot_of[h]
+        self.progress[i] = depth
+        return self._facade(h, i)
+
+    def update(self, bottom, dt=1.0, fallen_out=None):
+        """把所有目标移动 speed * dt，剔除 y > bottom 的目标，并批量清理已标记删除的目标。
+
+        返回本次落出屏幕的目标数量；传入列表 fallen_out 时把这些目标的 (text, 已打出字符数, born) 追加进去。
+        """
+        n = self._n
+        if n == 0:
+            return 0
+        if np is not None:
+            y = self.y[:n]
+            if dt == 1.0:
+                y += self.speed[:n]
+            else:
+                y += self.speed[:n] * np.float32(dt)
+            # 速度不同时可能出现“超车”，此时整体重新排序
+            if self._order_dirty or (n > 1 and bool((y[1:] > y[:-1]).any())):
+                self._sort()
+                y = self.y[:n]
+            alive = self.alive[:n]
+            fallen_mask = alive & (y > bottom)
+            fallen = int(np.count_nonzero(fallen_mask))
+            if fallen and fallen_out is not None:
+                idx = np.flatnonzero(fallen_mask)
+                texts = self._texts
+                fallen_out.extend(zip([texts[t] for t in self.text_id[idx].tolist()], self.progress[idx].tolist(),
+                                      self.born[idx].tolist()))
+            keep = alive & ~fallen_mask
+            if fallen or self._live != n:
+                self._release(np.flatnonzero(~keep).tolist())
+                self._take(np.flatnonzero(keep))
+        else:
+            y = self.y
+            speed = self.speed
+            unordered = self._order_dirty
+            for i in range(n):
+                y[i] += speed[i] * dt
+                if i and y[i] > y[i - 1]:
+                    unordered = True
+            if unordered:
+                self._sort()
+            alive = self.alive
+            keep = [i for i in range(n) if alive[i] and y[i] <= bottom]
+            fallen_idx = [i for i in range(n) if alive[i] and y[i] > bottom]
+            fallen = len(fallen_idx)
+            if fallen and fallen_out is not None:
+                fallen_out.extend((self._texts[self.text_id[i]], self.progress[i], self.born[i]) for i in fallen_idx)
+            if len(keep) != n:
+                kept = set(keep)
+                self._release([i for i in range(n) if i not in kept])
+                self._take(keep)
+        self._live = self._n
+        return fallen
+
+    def items(self, lag=0.0):
+        """绘制用：[(text, color, x, y, done), ...]，按从下到上的顺序。
+
+        lag > 0 时返回 y - speed * lag（上一次 update 与本次之间的插值位置）。
+        """
+        n = self._n
+        texts = self._texts
+        palette = self.palette
+        if np is not None:
+            ys = self.y[:n] - self.speed[:n] * np.float32(lag) if lag else self.y[:n]
+            cols = zip(self.text_id[:n].tolist(), self.color_id[:n].tolist(), self.x[:n].tolist(),
+                       ys.tolist(), self.progress[:n].tolist(), self.alive[:n].tolist())
+        else:
+            ys = [y - v * lag for y, v in zip(self.y[:n], self.speed[:n])] if lag else self.y[:n]
+            cols = zip(self.text_id[:n], self.color_id[:n], self.x[:n], ys, self.progress[:n], self.alive[:n])
+        return [(texts[t], palette[c], x, y, d) for t, c, x, y, d, a in cols if a]
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""
+文字表面缓存：按 (字体, 文本, 颜色) 缓存 Font.render 的结果。
+
+TrueType 光栅化是每帧最贵的操作之一；同样的字母、分数、按钮文字
+反复出现，缓存后每帧只剩 blit 开销。使用 LRU 淘汰，容量有上限，
+并记录命中/未命中次数，便于观察缓存效果。
+"""
+from collections import OrderedDict
+
+
+class TextCache:
+    def __init__(self, max_entries=512):
+        self.max_entries = max(1, int(max_entries))
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, font, text, color, antialias=True):
+        """返回已渲染的 Surface；未命中时调用 font.render 并放入缓存。"""
+        key = (font, text, tuple(color), antialias)
+        entries = self._entries
+        surf = entries.get(key)
+        if surf is not None:
+            entries.move_to_end(key)
+            self.hits += 1
+            return surf
+        self.misses += 1
+        surf = font.render(text, antialias, color)
+        entries[key] = surf
+        if len(entries) > self.max_entries:
+            entries.popitem(last=False)
+        return surf
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hit_rate, 4),
+        }
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""
+固定步长模拟：渲染帧率与游戏逻辑解耦。
+
+每帧把真实经过的时间交给 advance()，得到本帧需要运行的模拟步数（每步 dt 秒）；
+剩余不足一步的时间留到下一帧，alpha（0~1）是它占一步的比例，用于在上一步与当前步
+之间插值绘制。帧率下降时一帧内补跑多步，游戏速度、生成节奏与得分都不受影响。
+
+单帧超过 max_frame 秒（例如窗口被拖动、机器卡顿）时只补 max_frame，避免越补越慢。
+"""
+
+
+class FixedTimestep:
+    def __init__(self, hz=60, max_frame=0.25):
+        self.dt = 1.0 / hz
+        self.max_frame = max_frame
+        self.accumulator = 0.0
+        self.steps = 0  # 累计模拟步数
+        self.dropped = 0.0  # 因超过 max_frame 而丢弃的时间（秒）
+
+    def reset(self):
+        self.accumulator = 0.0
+
+    def advance(self, elapsed):
+        """累加 elapsed 秒，返回本帧应运行的模拟步数。"""
+        if elapsed > self.max_frame:
+            self.dropped += elapsed - self.max_frame
+            elapsed = self.max_frame
+        elif elapsed < 0:
+            elapsed = 0.0
+        self.accumulator += elapsed
+        n = int(self.accumulator / self.dt)
+        self.accumulator -= n * self.dt
+        self.steps += n
+        return n
+
+    @property
+    def alpha(self):
+        """当前时刻位于最近两步之间的位置（0 = 上一步，1 = 当前步）。"""
+        return min(1.0, self.accumulator / self.dt)
+
+    @property
+    def lag(self):
+        """当前步之后还剩多少秒未模拟，绘制插值用 (1 - alpha) * dt。"""
+        return (1.0 - self.alpha) * self.dt
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine.downsample import StreamingSeries  # noqa: E402
+
+
+def make_series(max_points, n):
+    series = StreamingSeries(max_points)
+    for i in range(n):
+        series.add(i, str(i), (i * 37) % 101)
+    return series
+
+
+def test_points_capped_before_first_merge():
+    # max_points < n <= 2 * max_points：还没有合并过桶，也不能超过 max_points
+    for n in (11, 15, 20):
+        series = make_series(10, n)
+        assert series.span == 1
+        points = series.points()
+        assert len(points) == 10
+        assert points[0][0] == 0 and points[-1][0] == n - 1
+        assert [p[0] for p in points] == sorted(p[0] for p in points)
+
+
+def test_points_kept_when_within_cap():
+    points = make_series(10, 10).points()
+    assert [p[0] for p in points] == list(range(10))
+
+
+def test_points_capped_after_merge():
+    series = make_series(10, 1000)
+    assert series.span > 1
+    points = series.points()
+    assert len(points) <= 10
+    assert points[-1][0] == 999
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+from engine.jobs import JobRunner  # noqa: E402
+from engine.storage import make_record  # noqa: E402
+
+
+def wait_idle(runner, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while runner.busy():
+        assert time.monotonic() < deadline, 'jobs did not finish'
+        time.sleep(0.01)
+
+
+def test_lane_runs_jobs_one_at_a_time_in_order():
+    runner = JobRunner(max_workers=2)
+    running = []
+    overlap = []
+    order = []
+    lock = threading.Lock()
+
+    def job(j, name):
+        with lock:
+            running.append(name)
+            if len(running) > 1:
+                overlap.append(tuple(running))
+        time.sleep(0.05)
+        with lock:
+            running.remove(name)
+            order.append(name)
+        return name
+
+    try:
+        for name in ('weekly', 'monthly', 'html'):
+            assert runner.submit(f'job:{name}', job, name, lane='report:a')
+        # 同 key 的任务排队中时同样被合并
+        assert not runner.submit('job:monthly', job, 'again', lane='report:a')
+        wait_idle(runner)
+    finally:
+        runner.shutdown()
+    assert order == ['weekly', 'monthly', 'html']
+    assert not overlap
+    assert sorted(runner.poll()) == ['html', 'monthly', 'weekly']
+
+
+def test_cancelled_job_in_lane_does_not_block_the_rest():
+    runner = JobRunner(max_workers=2)
+    gate = threading.Event()
+    done = []
+    try:
+        runner.submit('first', lambda j: gate.wait(5) and done.append('first'), lane='l')
+        runner.submit('second', lambda j: done.append('second'), lane='l', cancelled_message='cancelled')
+        runner.submit('third', lambda j: done.append('third'), lane='l')
+        assert runner.cancel('second') == 1
+        gate.set()
+        wait_idle(runner)
+    finally:
+        runner.shutdown()
+    assert done == ['first', 'third']
+    assert runner.poll() == ['cancelled']
+
+
+def test_export_and_html_report_back_to_back(tmp_path, monkeypatch):
+    import type_game as tg
+
+    monkeypatch.setattr(tg.webbrowser, 'open', lambda url: True)
+    game = tg.Game(data_dir=str(tmp_path)).init(headless=True)
+    try:
+        game.store.extend([make_record(i % 3 + 1, i, 30, 5, timestamp=f'2025-11-{i % 28 + 1:02d}T10:00:00')
+                           for i in range(500)])
+        for _ in range(3):
+            # 连续按 E、M、V
+            for action in ('EXPORT_WEEKLY', 'EXPORT_MONTHLY', 'VIEW_REPORT'):
+                game.menu_action(action)
+            wait_idle(game.jobs)
+            messages = game.jobs.poll()
+            assert not [m for m in messages if '失败' in m], messages
+        for name in ('report_weekly.csv', 'report_monthly.csv', 'report.html'):
+            assert os.path.exists(os.path.join(game.profile_dir, name))
+        assert not [f for f in os.listdir(game.profile_dir) if f.endswith('.tmp')]
+    finally:
+        game.close()
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine.keylog import KeystrokeLog, KeystrokeRecorder, read_keylog  # noqa: E402
+
+
+def test_sessions_round_trip_with_reaction_times(tmp_path):
+    path = str(tmp_path / 'keystrokes.bin')
+    log = KeystrokeLog(path)
+    rec = KeystrokeRecorder()
+
+    rec.begin()
+    rec.record(100, 'AB', 'A', 'A', True, 350)
+    rec.record(250, 'AB', 'B', 'C', False, 120)
+    rec.record(400, 'AB', 'B', '', False, 0)  # 目标落地时仍未打完
+    assert log.append(rec, 1, 1000) > 0
+
+    rec.begin()
+    rec.record(80, 'ma', 'm', 'm', True, 90)
+    log.append_payload(rec.encode(3, 2000))
+
+    rec.begin()
+    assert log.append(rec, 2, 3000) == 0  # 没有记录的一局不写入
+
+    sessions = list(read_keylog(path))
+    assert [(s.level, s.end_ts, s.dropped) for s in sessions] == [(1, 1000, 0), (3, 2000, 0)]
+    assert sessions[0].events == [
+        (100, 'AB', 'A', 'A', True, 350),
+        (250, 'AB', 'B', 'C', False, 120),
+        (400, 'AB', 'B', '', False, 0),
+    ]
+    assert sessions[1].events == [(80, 'ma', 'm', 'm', True, 90)]
+
+
+def test_ring_buffer_keeps_latest_events(tmp_path):
+    path = str(tmp_path / 'keystrokes.bin')
+    rec = KeystrokeRecorder(capacity=4)
+    for i in range(6):
+        rec.record(i * 10, 'a', 'a', 'a', True, i)
+    KeystrokeLog(path).append(rec, 2, 500)
+    (session,) = read_keylog(path)
+    assert session.dropped == 2
+    assert [e[-1] for e in session.events] == [2, 3, 4, 5]
+
+
+def test_unknown_header_reads_nothing(tmp_path):
+    path = str(tmp_path / 'keystrokes.bin')
+    with open(path, 'wb') as f:
+        f.write(b'junk!')
+    assert list(read_keylog(path)) == []
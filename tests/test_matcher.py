@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine.matcher import PrefixIndex  # noqa: E402
+from engine.targets import TargetPool  # noqa: E402
+
+
+def make_index(*texts):
+    index = PrefixIndex()
+    for h, text in enumerate(texts):
+        index.add(h, text)
+    return index
+
+
+def test_continues_engaged_target():
+    index = make_index('ba', 'ma')
+    assert index.press('m') == (1, 1, None)
+    assert index.press('a') == (1, 2, None)
+
+
+def test_switches_to_sibling_with_same_prefix():
+    index = make_index('ba', 'bo')
+    assert index.press('b') == (0, 1, None)
+    # 已打 b、锁定 ba，按 o 时换到 bo，ba 的进度由调用方清零
+    assert index.press('o') == (1, 2, 0)
+    assert index.engaged == 1 and index.depth == 2
+
+
+def test_restarts_from_root_on_another_first_letter():
+    index = make_index('ba', 'ma')
+    index.press('b')
+    assert index.press('m') == (1, 1, 0)
+
+
+def test_wrong_key_keeps_engaged_target_and_progress():
+    index = make_index('bao', 'ma')
+    index.press('b')
+    index.press('a')
+    assert index.press('x') == (None, 0, None)
+    assert index.engaged == 0 and index.depth == 2
+    assert index.press('o') == (0, 3, None)
+
+
+def test_prefers_earliest_target_and_ignores_case():
+    index = make_index('ni', 'NI')
+    assert index.press('N') == (0, 1, None)
+
+
+def test_removing_engaged_target_releases_lock():
+    index = make_index('ba', 'bo')
+    index.press('b')
+    index.remove(0)
+    assert index.engaged is None and index.depth == 0
+    assert 0 not in index and len(index) == 1
+    # 被剪掉的分支不再接受按键，其余目标从根结点重新开始
+    assert index.press('a') == (None, 0, None)
+    assert index.press('b') == (1, 1, None)
+    index.remove(1)
+    assert index.root.children == {}
+
+
+def test_removing_other_target_keeps_lock():
+    index = make_index('ba', 'bo')
+    index.press('b')
+    index.remove(1)
+    assert index.engaged == 0 and index.depth == 1
+    assert index.press('a') == (0, 2, None)
+
+
+def test_pool_press_resets_dropped_target_progress():
+    pool = TargetPool(((0, 0, 0),))
+    pool.spawn('ba', 0, 0, 100)
+    pool.spawn('bo', 0, 0, 50)
+    ba, bo = pool
+    assert pool.press('b') is ba
+    assert ba.completed_part == 'b'
+    assert pool.press('o') is bo
+    assert (ba.completed_part, bo.completed_part) == ('', 'bo')
+    pool.discard(bo)
+    assert pool.engaged() is ba  # 没有锁定时退回最靠下的目标
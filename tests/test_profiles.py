@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine.profiles import DEFAULT_PROFILE, ProfileRegistry  # noqa: E402
+
+
+def write_state(registry, value):
+    with open(registry.state_path, 'w', encoding='utf-8') as f:
+        json.dump({'active': value}, f, ensure_ascii=False)
+
+
+@pytest.mark.parametrize('value', ['', '   ', None, 3, '.hidden', 'a/b'])
+def test_active_falls_back_to_default_for_invalid_names(tmp_path, value):
+    registry = ProfileRegistry(str(tmp_path))
+    os.makedirs(registry.root)  # '' 会拼出 profiles/ 本身，它确实存在
+    write_state(registry, value)
+    assert registry.active() == DEFAULT_PROFILE
+
+
+def test_active_keeps_existing_profile(tmp_path):
+    registry = ProfileRegistry(str(tmp_path))
+    registry.create('小明')
+    write_state(registry, ' 小明 ')
+    assert registry.active() == '小明'
+    write_state(registry, '小红')  # 档案已被删除
+    assert registry.active() == DEFAULT_PROFILE
+
+
+def test_create_rejects_blank_names(tmp_path):
+    registry = ProfileRegistry(str(tmp_path))
+    with pytest.raises(ValueError):
+        registry.create('  ')
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+from array import array
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine.storage import BACKENDS, BinaryLogStore, make_record, open_store, store_path  # noqa: E402
+
+RECORDS = [
+    make_record(1, 10, 30, 5, timestamp='2025-11-01T09:00:00'),
+    make_record(3, 40, 60, 8, timestamp='2025-11-01T10:00:00'),
+    make_record(1, 25, 30, 7, timestamp='2025-11-02T09:00:00'),
+    make_record(4, 99, 45, 9, timestamp='2025-11-03T09:00:00', mode='古诗'),
+    make_record(1, 15, 30, 6, timestamp='2025-11-04T09:00:00'),
+]
+
+
+@pytest.fixture(params=sorted(BACKENDS))
+def path(request, tmp_path):
+    return store_path(str(tmp_path), request.param)
+
+
+def fill(path, records=RECORDS):
+    store = open_store(path)
+    store.extend(records[:2])
+    for rec in records[2:]:
+        store.append(rec)
+    store.close()
+
+
+def test_backends_agree_on_queries(path):
+    fill(path)
+    store = open_store(path)
+    try:
+        assert list(store.iter_sessions()) == RECORDS
+        assert [r.score for r in store.iter_sessions(level=1)] == [10, 25, 15]
+        assert [r.score for r in store.iter_sessions(since='2025-11-02')] == [25, 99, 15]
+        assert store.count() == 5 and store.count(1) == 3 and store.count(2) == 0
+        assert (store.best(1), store.best(2)) == (25, 0)
+        assert store.recent_scores(1, 2) == [25, 15]
+        assert store.recent_scores(1, 0) == []
+        # 关卡包中新增的关卡保留显示名称
+        assert [r.mode for r in store.iter_sessions(level=4)] == ['古诗']
+    finally:
+        store.close()
+
+
+def test_tail_returns_only_new_records(path):
+    fill(path, RECORDS[:3])
+    store = open_store(path)
+    records, cursor = store.tail()
+    assert list(records) == RECORDS[:3]
+    store.extend(RECORDS[3:])
+    records, end = store.tail(cursor)
+    assert list(records) == RECORDS[3:]
+    assert end == store.end_cursor()
+    assert store.tail(end + 1000) == (None, None)
+    store.close()
+
+
+def test_missing_store_is_empty(path):
+    store = open_store(path)
+    try:
+        assert list(store.iter_sessions()) == []
+        assert store.count() == 0 and store.best(1) == 0 and store.recent_scores(1, 3) == []
+    finally:
+        store.close()
+
+
+def binlog(tmp_path):
+    path = store_path(str(tmp_path), 'binlog')
+    fill(path)
+    return path
+
+
+def assert_recovered(path, extra=()):
+    expected = RECORDS + list(extra)
+    store = BinaryLogStore(path)
+    assert list(store.iter_sessions()) == expected
+    for level in (1, 2, 3, 4):
+        scores = [r.score for r in expected if r.level == level]
+        assert store.count(level) == len(scores)
+        assert store.best(level) == max(scores, default=0)
+        assert store.recent_scores(level, 2) == scores[-2:]
+    assert [r.mode for r in store.iter_sessions(level=4)] == ['古诗']
+    # 恢复后继续追加，记录号与索引仍然一致
+    late = make_record(2, 7, 1, 1, timestamp='2025-11-09T09:00:00')
+    store.append(late)
+    reopened = BinaryLogStore(path)
+    assert reopened.count() == len(expected) + 1
+    assert reopened.recent_scores(2, 1) == [7]
+    assert list(reopened.iter_sessions(level=2))[-1] == late
+
+
+def test_binlog_recovers_record_without_index_or_meta(tmp_path):
+    path = binlog(tmp_path)
+    rec = make_record(2, 77, 1, 1, timestamp='2025-11-05T09:00:00')
+    with open(path, 'ab') as f:
+        f.write(BinaryLogStore(path)._encode(rec))
+    assert_recovered(path, [rec])
+
+
+def test_binlog_recovers_index_written_before_meta(tmp_path):
+    path = binlog(tmp_path)
+    store = BinaryLogStore(path)
+    rec = make_record(3, 66, 1, 1, timestamp='2025-11-05T09:00:00')
+    with open(path, 'ab') as f:
+        f.write(store._encode(rec))
+    with open(store._idx_path(3), 'ab') as f:
+        array('I', [len(RECORDS)]).tofile(f)
+    assert_recovered(path, [rec])
+
+
+def test_binlog_truncates_partial_record(tmp_path):
+    path = binlog(tmp_path)
+    with open(path, 'ab') as f:
+        f.write(b'\x01\x02\x03')
+    assert_recovered(path)
+    assert os.path.getsize(path) % BinaryLogStore.RECORD.size == 0
+
+
+def test_binlog_rebuilds_lost_meta(tmp_path):
+    path = binlog(tmp_path)
+    os.remove(path + '.meta.json')
+    os.remove(path + '.L1.idx')
+    store = BinaryLogStore(path)
+    assert store.count() == len(RECORDS) and store.recent_scores(1, 3) == [10, 25, 15]
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import engine.targets as targets  # noqa: E402
+from engine.targets import PooledTarget, TargetPool  # noqa: E402
+
+PALETTE = ((0, 0, 0), (255, 0, 0))
+
+
+@pytest.fixture(params=['numpy', 'array'])
+def pool(request, monkeypatch):
+    if request.param == 'array':
+        monkeypatch.setattr(targets, 'np', None)
+    elif targets.np is None:
+        pytest.skip('没有安装 NumPy')
+    return TargetPool(PALETTE, capacity=2)
+
+
+def texts(pool):
+    return [t.text for t in pool]
+
+
+def test_front_is_lowest_target(pool):
+    assert pool.front() is None
+    pool.spawn('a', 1, 10, 100)
+    pool.spawn('b', 1, 20, 50)
+    pool.spawn('c', 1, 30, 300)  # 不在队尾的位置，需要重新排序
+    assert pool.front().text == 'c'
+    assert texts(pool) == ['c', 'a', 'b']
+    assert len(pool) == 3
+
+
+def test_overtaking_reorders_on_update(pool):
+    pool.spawn('slow', 1, 0, 100)
+    pool.spawn('fast', 200, 0, 50)
+    pool.update(bottom=1000, dt=1.0)
+    assert pool.front().text == 'fast'
+    assert pool.front().y == pytest.approx(250)
+
+
+def test_discard_is_applied_on_next_update(pool):
+    pool.spawn('a', 0, 0, 200)
+    pool.spawn('b', 0, 0, 100)
+    front = pool.front()
+    pool.discard(front)
+    assert len(pool) == 1
+    assert pool.front().text == 'b'
+    assert pool.update(bottom=1000) == 0
+    assert texts(pool) == ['b']
+    # 移出池后外观对象保留最后的值，仍可读写
+    assert not front.alive
+    assert front.y == pytest.approx(200)
+    front.y = 5
+    assert front.y == 5
+
+
+def test_fallen_targets_are_reported_and_removed(pool):
+    pool.spawn('ba', 10, 0, 95, born=1.5)
+    pool.spawn('ma', 10, 0, 0)
+    pool.press('b')
+    fallen = []
+    assert pool.update(bottom=100, dt=1.0, fallen_out=fallen) == 1
+    assert fallen == [('ba', 1, 1.5)]
+    assert texts(pool) == ['ma']
+
+
+def test_handles_are_reused_and_capacity_grows(pool):
+    first = [pool.spawn(str(i), 0, 0, 100 - i) for i in range(5)]
+    for t in list(pool):
+        pool.discard(t)
+    pool.update(bottom=1000)
+    assert len(pool) == 0
+    again = [pool.spawn(str(i), 0, 0, 100 - i) for i in range(5)]
+    assert sorted(again) == sorted(first)
+    assert texts(pool) == ['0', '1', '2', '3', '4']
+
+
+def test_added_facade_reads_through_pool(pool):
+    t = PooledTarget('hi', speed=2, x=7, y=10, color_id=1)
+    pool.add(t)
+    assert pool.front() is t
+    assert t.color == (255, 0, 0)
+    pool.update(bottom=1000, dt=0.5)
+    assert t.y == pytest.approx(11)
+    t.completed_part = 'h'
+    assert pool.items() == [('hi', (255, 0, 0), 7, pytest.approx(11), 1)]
+
+
+def test_clear_detaches_everything(pool):
+    t = pool.add(PooledTarget('x', speed=1, y=3))
+    pool.spawn('y', 1, 0, 1)
+    pool.clear()
+    assert len(pool) == 0 and pool.front() is None
+    assert not t.alive and t.y == 3
+    assert pool.press('y') is None
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import engine.targets as targets  # noqa: E402
+from engine.targets import TargetPool  # noqa: E402
+from engine.timestep import FixedTimestep  # noqa: E402
+
+
+@pytest.fixture(params=['numpy', 'array'])
+def pool(request, monkeypatch):
+    if request.param == 'array':
+        monkeypatch.setattr(targets, 'np', None)
+    elif targets.np is None:
+        pytest.skip('没有安装 NumPy')
+    return TargetPool(((0, 0, 0),))
+
+
+def test_advance_carries_remainder_between_frames():
+    clock = FixedTimestep(hz=8)  # dt = 0.125，二进制可精确表示
+    assert clock.advance(0.1875) == 1
+    assert clock.alpha == pytest.approx(0.5)
+    assert clock.lag == pytest.approx(0.0625)
+    assert clock.advance(0.0625) == 1
+    assert clock.alpha == pytest.approx(0.0, abs=1e-9)
+    assert clock.steps == 2
+
+
+def test_long_frames_are_clamped():
+    clock = FixedTimestep(hz=10, max_frame=0.25)
+    assert clock.advance(1.0) == 2
+    assert clock.dropped == pytest.approx(0.75)
+    assert clock.advance(-1.0) == 0
+
+
+def test_items_interpolates_back_by_lag(pool):
+    dt = 0.1
+    pool.spawn('a', 50, 0, 0)
+    pool.update(bottom=1000, dt=dt)
+    (_, _, _, y, _), = pool.items(0.0)
+    assert y == pytest.approx(5.0)
+    # lag = dt 时正好回到上一步的位置，lag = 0 时就是当前步
+    (_, _, _, y, _), = pool.items(dt)
+    assert y == pytest.approx(0.0, abs=1e-6)
+    (_, _, _, y, _), = pool.items(dt / 2)
+    assert y == pytest.approx(2.5)
+
+
+def test_items_skips_discarded_targets(pool):
+    pool.spawn('a', 10, 0, 20)
+    pool.spawn('b', 10, 0, 10)
+    pool.discard(pool.front())
+    assert [t for t, *_ in pool.items(0.05)] == ['b']
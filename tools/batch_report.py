@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量生成全班（全校）学习报告：每个孩子一份成绩记录，用进程池并行处理。
+
+输入（二选一）：
+- --dir：目录下每个子目录是一个孩子（子目录中的 scores.sqlite3 / scores.bin / scores.csv），
+  或目录下直接放 <姓名>.sqlite3 / <姓名>.bin / <姓名>.csv。逐键记录（keystrokes.bin）、
+  报表输出（report_*.csv、*_report.csv、class_rollup.csv）等不是成绩记录的文件会被跳过
+- --manifest：CSV 清单，表头 learner,data（data 为相对清单所在目录的路径）
+
+姓名（不区分大小写）重复时（例如同时有 alice.csv 与 alice.sqlite3）直接报错，不会让两个工作进程写同一个输出目录。
+
+输出（--out-dir，默认 data/class_reports）：
+- <姓名>/report.html、<姓名>/report_weekly.csv、<姓名>/report_monthly.csv
+- class_rollup.csv：每个孩子每个模式一行（次数、平均分、最高分、最近 N 次平均、最后一次练习时间、活跃周数）
+
+每个孩子的成绩只读一遍，同时汇总 HTML 报告与周报/月报，由一个工作进程完成（解析、聚合、渲染都在子进程中）。
+成绩文件指纹未变且输出完好时直接复用上次的结果（见 engine/report_cache.py）；结束时打印吞吐量汇总。
+
+用法：
+  python tools/batch_report.py --dir school/ --out-dir data/class_reports --jobs 8
+  python tools/batch_report.py --manifest class3.csv --recent 30
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(TOOLS_DIR))
+sys.path.insert(0, TOOLS_DIR)
+
+from engine.keylog import MAGIC as KEYLOG_MAGIC, keylog_path  # noqa: E402
+from engine.report_cache import ReportCache, cache_key, fingerprint  # noqa: E402
+from engine.storage import BACKENDS, CSV_HEADER, MODE_NAME, find_scores, read_sessions  # noqa: E402
+import export_report  # noqa: E402
+import visualize_report  # noqa: E402
+
+
+BATCH_VERSION = 2
+SCORE_EXTS = tuple(os.path.splitext(filename)[1] for filename, _ in BACKENDS.values())
+ROLLUP_NAME = 'class_rollup.csv'
+# 工具自己生成、与成绩文件扩展名相同的文件
+GENERATED_NAMES = {os.path.basename(keylog_path('')), ROLLUP_NAME}
+ROLLUP_FIELDS = ['learner', 'level', 'mode', 'count', 'avg_score', 'best_score', 'recent_avg',
+                 'last_session', 'active_weeks']
+
+
+def is_session_file(path):
+    """path 是否是成绩记录：扩展名属于存储后端，且不是逐键记录或报表输出。"""
+    name = os.path.basename(path)
+    stem, ext = os.path.splitext(name)
+    ext = ext.lower()
+    if ext not in SCORE_EXTS or name in GENERATED_NAMES:
+        return False
+    if stem.startswith('report_') or stem.endswith('_report'):
+        return False
+    try:
+        if ext == '.csv':
+            with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+                header = next(csv.reader(f), [])
+            return all(col in header for col in CSV_HEADER)
+        if ext == '.bin':
+            with open(path, 'rb') as f:
+                return f.read(len(KEYLOG_MAGIC)) != KEYLOG_MAGIC
+    except (OSError, UnicodeDecodeError, csv.Error):
+        return False
+    return True
+
+
+def check_unique(learners):
+    """姓名不区分大小写重复时抛出 ValueError（各自的输出目录会相同）。"""
+    seen = {}
+    for name, path in learners:
+        seen.setdefault(name.casefold(), []).append(path)
+    dupes = {k: v for k, v in seen.items() if len(v) > 1}
+    if dupes:
+        detail = '；'.join(f"{k}: {', '.join(v)}" for k, v in sorted(dupes.items()))
+        raise ValueError(f"学习者姓名重复（输出目录会冲突）：{detail}")
+
+
+def discover(data_dir):
+    """按 --dir 的约定列出 [(姓名, 成绩路径)]，按姓名排序。"""
+    learners = []
+    for name in sorted(os.listdir(data_dir)):
+        path = os.path.join(data_dir, name)
+        if os.path.isdir(path):
+            scores = find_scores(path)
+            if os.path.exists(scores):
+                learners.append((name, scores))
+        elif is_session_file(path):
+            learners.append((os.path.splitext(name)[0], path))
+    return learners
+
+
+def read_manifest(path):
+    base = os.path.dirname(os.path.abspath(path))
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        return [(row['learner'], os.path.join(base, row['data'])) for row in csv.DictReader(f)
+                if row.get('learner') and row.get('data')]
+
+
+def rollup_rows(learner, summaries, last_ts, recent):
+    rows = []
+    for lvl, summary in sorted(summaries.items()):
+        stats = visualize_report.stats_summary(summary)
+        if not stats['count']:
+            continue
+        rows.append({
+            'learner': learner,
+            'level': lvl,
+            'mode': summary.name or MODE_NAME.get(lvl, str(lvl)),
+            'count': stats['count'],
+            'avg_score': stats['avg'],
+            'best_score': stats['best'],
+            'recent_avg': visualize_report.recent_avg(summary) if recent > 0 else stats['avg'],
+            'last_session': last_ts.get(lvl, ''),
+            'active_weeks': len(summary.weekly),
+        })
+    return rows
+
+
+def process_learner(learner, data_path, out_dir, recent=30, use_cache=True):
+    """在工作进程中处理一个孩子：单遍读取成绩，写出 HTML 报告与周报/月报。
+
+    返回 {'learner', 'sessions', 'rows'（汇总行）, 'cached', 'seconds'}。
+    """
+    t0 = time.perf_counter()
+    html_path = os.path.join(out_dir, 'report.html')
+    csv_paths = {p: os.path.join(out_dir, f'report_{p}.csv') for p in export_report.PERIODS}
+    cache = ReportCache.for_output(html_path)
+    key = cache_key(fingerprint(data_path), 'batch', [os.path.abspath(data_path), recent], BATCH_VERSION)
+    entry = cache.entry(html_path)
+    if use_cache and cache.hit(html_path, key) and all(os.path.exists(p) for p in csv_paths.values()):
+        return {'learner': learner, 'sessions': entry.get('sessions', 0), 'rows': entry.get('rollup', []),
+                'cached': True, 'seconds': time.perf_counter() - t0}
+
+    summaries = {lvl: visualize_report.ModeSummary(recent) for lvl in MODE_NAME}
+    totals = {p: {} for p in export_report.PERIODS}
+    names = {}
+    last_ts = {}
+    sessions = 0
+    for rec in export_report.mode_names(read_sessions(data_path), names):
+        sessions += 1
+        summary = summaries.get(rec.level)
+        if summary is None:
+            # 关卡包中新增的模式
+            summary = summaries[rec.level] = visualize_report.ModeSummary(recent)
+        summary.add(rec)
+        last_ts[rec.level] = rec.timestamp
+        for period, t in totals.items():
+            export_report.add_record(t, period, rec)
+
+    os.makedirs(out_dir, exist_ok=True)
+    tmp = f"{html_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, 'w', encoding='utf-8') as f:
+            visualize_report.write_html(f, summaries, recent=recent)
+        os.replace(tmp, html_path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    for period, path in csv_paths.items():
+        export_report.write_csv(export_report.totals_to_rows(totals[period], names), path)
+    rows = rollup_rows(learner, summaries, last_ts, recent)
+    cache.store(html_path, key, sessions=sessions, rollup=rows)
+    return {'learner': learner, 'sessions': sessions, 'rows': rows, 'cached': False,
+            'seconds': time.perf_counter() - t0}
+
+
+def write_rollup(rows, out_path):
+    with open(out_path, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.DictWriter(f, fieldnames=ROLLUP_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def run_batch(learners, out_dir, recent=30, jobs=None, use_cache=True, progress=print):
+    """并行处理 learners（[(姓名, 成绩路径)]），写出全班汇总，返回统计信息。姓名重复时抛出 ValueError。"""
+    check_unique(learners)
+    os.makedirs(out_dir, exist_ok=True)
+    t0 = time.perf_counter()
+    results, failed = [], []
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = {pool.submit(process_learner, name, path, os.path.join(out_dir, name), recent, use_cache): name
+                   for name, path in learners}
+        for done, future in enumerate(as_completed(futures), 1):
+            name = futures[future]
+            try:
+                res = future.result()
+            except Exception as e:
+                failed.append(name)
+                progress(f"[{done}/{len(futures)}] {name}: 失败（{e}）")
+                continue
+            results.append(res)
+            note = '（缓存）' if res['cached'] else ''
+            progress(f"[{done}/{len(futures)}] {name}: {res['sessions']} 局，{res['seconds'] * 1000:.0f} ms{note}")
+
+    rollup = [row for res in sorted(results, key=lambda r: r['learner']) for row in res['rows']]
+    rollup_path = os.path.join(out_dir, ROLLUP_NAME)
+    write_rollup(rollup, rollup_path)
+    elapsed = time.perf_counter() - t0
+    sessions = sum(r['sessions'] for r in results)
+    return {
+        'learners': len(results),
+        'failed': failed,
+        'cached': sum(1 for r in results if r['cached']),
+        'sessions': sessions,
+        'seconds': elapsed,
+        'learners_per_sec': len(results) / elapsed if elapsed else 0.0,
+        'sessions_per_sec': sessions / elapsed if elapsed else 0.0,
+        'worker_seconds': sum(r['seconds'] for r in results),
+        'rollup': rollup_path,
+    }
+
+
+def main():
+    p = argparse.ArgumentParser(description='批量生成多个孩子的学习报告与全班汇总')
+    src = p.add_mutually_exclusive_group(required=True)
+    src.add_argument('--dir', help='每个孩子一个子目录或一个成绩文件的目录')
+    src.add_argument('--manifest', help='CSV 清单（表头 learner,data）')
+    p.add_argument('--out-dir', default='data/class_reports', help='输出目录')
+    p.add_argument('--recent', type=int, default=30, help='折线图使用最近 N 次（0 表示全部历史）')
+    p.add_argument('--jobs', type=int, default=None, help='工作进程数（默认 CPU 核数）')
+    p.add_argument('--no-cache', action='store_true', help='忽略缓存，全部重建')
+    args = p.parse_args()
+
+    learners = discover(args.dir) if args.dir else read_manifest(args.manifest)
+    if not learners:
+        sys.exit('没有找到任何成绩记录')
+    try:
+        stats = run_batch(learners, args.out_dir, recent=args.recent, jobs=args.jobs, use_cache=not args.no_cache)
+    except ValueError as e:
+        sys.exit(str(e))
+    print(f"{stats['learners']} learners ({stats['cached']} cached, {len(stats['failed'])} failed), "
+          f"{stats['sessions']} sessions in {stats['seconds']:.2f} s: "
+          f"{stats['learners_per_sec']:.1f} learners/s, {stats['sessions_per_sec']:.0f} sessions/s "
+          f"(worker time {stats['worker_seconds']:.2f} s)")
+    print(f"Class roll-up written to {stats['rollup']}")
+    if stats['failed']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+无窗口帧循环基准：用 SDL dummy 驱动运行真实的 asyncio 主循环（Game.run_async），帧之间不限速休眠，
+报告帧率、各阶段（events/spawn/move/draw/flip）耗时和每帧内存分配。
+
+用法：
+  # 标准场景套件（空闲菜单、50/500/5000 个目标、拼音关卡）
+  python tools/bench_frames.py suite --frames 600
+  # 保存基线 / 与基线比较（任一场景平均帧耗时变慢超过 20% 时返回非零）
+  python tools/bench_frames.py suite --save data/bench_baseline.json
+  python tools/bench_frames.py suite --compare data/bench_baseline.json --tolerance 0.2
+  # 单次运行，自定义按键脚本（帧号:按键）
+  python tools/bench_frames.py run --frames 300 --keys "0:3,30:b,31:a" --stress 100
+  # 录制其中一段帧：Chrome trace（chrome://tracing / Perfetto 打开）或 cProfile（python -m pstats 查看）
+  python tools/bench_frames.py run --stress 500 --trace data/traces/run.json --window 100:50
+  python tools/bench_frames.py run --stress 500 --cprofile data/traces/run.prof
+  # 启动耗时（time-to-first-frame）：每次在新进程中导入游戏并画出第一帧，
+  # cold 为没有字体缓存时，warm 为字体缓存已存在时；同样支持 --save / --compare
+  python tools/bench_frames.py startup --runs 5
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine.headless import key_script, parse_keys  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 在子进程中执行：导入游戏、运行一帧，输出 startup 报告
+STARTUP_CHILD = """
+import json, sys, tempfile
+sys.path.insert(0, sys.argv[1])
+import type_game
+with tempfile.TemporaryDirectory() as tmp:
+    game = type_game.Game(data_dir=tmp).init(headless=True)
+    rep = game.run(max_frames=1, tick=False)
+    game.close()
+print(json.dumps(rep['startup']))
+"""
+
+
+def pinyin_schedule(frames, every=4):
+    """拼音关卡：进入第三关后按固定节奏轮流输入各音节的字母。"""
+    letters = "bamadenilegekehebofotenimale"
+    schedule = {0: '3'}
+    for i, f in enumerate(range(10, frames, every)):
+        schedule[f] = letters[i % len(letters)]
+    return schedule
+
+
+SCENES = {
+    'menu_idle': lambda frames: ({}, 0),
+    'play_50': lambda frames: ({0: '1'}, 50),
+    'play_500': lambda frames: ({0: '1'}, 500),
+    'play_5000': lambda frames: ({0: '1'}, 5000),
+    'pinyin': lambda frames: (pinyin_schedule(frames), 20),
+}
+
+
+def run_scene(tg, schedule, stress, frames, capture=None):
+    """运行一个场景。capture=(kind, path, start, count)：从第 start 帧起录制 count 帧，
+    kind 为 'trace'（Chrome trace）或 'cprofile'。"""
+    import pygame
+    from engine.profiler import FrameProfiler, LiveProfiler
+
+    random.seed(0)
+    profiler = LiveProfiler() if capture is not None else FrameProfiler()
+    with tempfile.TemporaryDirectory() as tmp:
+        game = tg.Game(data_dir=tmp, stress_targets=stress).init(headless=True)
+        pygame.event.clear()
+        script = key_script(schedule)
+        if capture is not None:
+            # 录制请求从下一帧生效：在第 start - 1 帧（start 为 0 时在运行前）发出
+            kind, path, start, count = capture
+            begin = profiler.start_trace if kind == 'trace' else profiler.start_cprofile
+            keys = script
+            if start <= 0:
+                begin(path, count)
+
+            def script(frame):
+                if frame == start - 1:
+                    begin(path, count)
+                return keys(frame)
+        try:
+            # 每帧固定模拟一步，场景内容与机器快慢无关，便于与基线比较
+            return game.run(max_frames=frames, script=script, tick=False,
+                            profiler=profiler, frame_dt=1.0 / tg.SIM_HZ)
+        finally:
+            game.close()
+
+
+def measure_startup(font_cache, runs):
+    """运行 runs 次子进程，返回 startup 报告各项的中位数。font_cache 不存在时每次都是冷启动。"""
+    cold = not os.path.exists(font_cache)
+    env = dict(os.environ, TYPE_GAME_FONT_CACHE=font_cache, PYGAME_HIDE_SUPPORT_PROMPT='1')
+    samples = []
+    for _ in range(runs):
+        if cold and os.path.exists(font_cache):
+            os.remove(font_cache)
+        out = subprocess.run([sys.executable, '-c', STARTUP_CHILD, ROOT], env=env,
+                             check=True, capture_output=True, text=True).stdout
+        samples.append(json.loads(out.strip().splitlines()[-1]))
+    keys = [k for k, v in samples[0].items() if isinstance(v, float)]
+    rep = {k: round(statistics.median(s[k] for s in samples), 2) for k in keys}
+    rep['font_cache_hit'] = samples[-1]['font_cache_hit']
+    return rep
+
+
+def compare(results, baseline, metric, tolerance):
+    """打印与基线的对比，返回变慢超过 tolerance 的项目名。"""
+    regressions = []
+    for name, rep in results.items():
+        base = baseline.get(name)
+        if not base or not base.get(metric):
+            continue
+        ratio = rep[metric] / base[metric]
+        flag = 'REGRESSION' if ratio > 1 + tolerance else 'ok'
+        print(f"{name:<10} {base[metric]:.3f}ms -> {rep[metric]:.3f}ms ({ratio:.2f}x) {flag}")
+        if flag != 'ok':
+            regressions.append(name)
+    return regressions
+
+
+def save_results(results, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"Baseline written to {path}")
+
+
+def load_results(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def print_report(name, rep):
+    phases = ' '.join(f"{p}={ms:.3f}" for p, ms in rep['phase_ms'].items())
+    print(f"{name:<10} fps={rep['fps']:>9.1f} avg={rep['avg_frame_ms']:.3f}ms worst={rep['worst_frame_ms']:.3f}ms "
+          f"alloc/frame={rep['alloc_blocks_per_frame']:.1f} gc={rep['gc_collections']} | {phases}")
+
+
+def main():
+    p = argparse.ArgumentParser(description='无窗口帧循环基准')
+    sub = p.add_subparsers(dest='cmd', required=True)
+    ps = sub.add_parser('suite', help='运行标准场景套件')
+    ps.add_argument('--frames', type=int, default=600)
+    ps.add_argument('--only', nargs='*', choices=sorted(SCENES), help='只运行指定场景')
+    ps.add_argument('--save', help='把结果保存为基线 JSON')
+    ps.add_argument('--compare', help='与基线 JSON 比较')
+    ps.add_argument('--tolerance', type=float, default=0.2, help='允许的变慢比例')
+    pr = sub.add_parser('run', help='单次运行')
+    pr.add_argument('--frames', type=int, default=600)
+    pr.add_argument('--keys', default='', help='按键脚本，如 "0:1,30:a,600:escape"')
+    pr.add_argument('--stress', type=int, default=0, help='保持的目标数量')
+    capture = pr.add_mutually_exclusive_group()
+    capture.add_argument('--trace', help='写出 Chrome trace JSON 的路径')
+    capture.add_argument('--cprofile', help='写出 cProfile 结果（.prof）的路径')
+    pr.add_argument('--window', default=None, help='录制的帧范围 "起始帧:帧数"（默认全部帧）')
+    pst = sub.add_parser('startup', help='测量启动到第一帧的耗时')
+    pst.add_argument('--runs', type=int, default=5, help='冷/热启动各运行几次（取中位数）')
+    pst.add_argument('--save', help='把结果保存为基线 JSON')
+    pst.add_argument('--compare', help='与基线 JSON 比较')
+    pst.add_argument('--tolerance', type=float, default=0.2, help='允许的变慢比例')
+    args = p.parse_args()
+
+    if args.cmd == 'startup':
+        results = {}
+        with tempfile.TemporaryDirectory() as tmp:
+            font_cache = os.path.join(tmp, 'font_cache.json')
+            for name in ('cold', 'warm'):
+                results[name] = rep = measure_startup(font_cache, args.runs)
+                print(f"{name:<10} ttff={rep['time_to_first_frame_ms']:.1f}ms import={rep['import_ms']:.1f}ms "
+                      f"run->frame={rep['run_to_first_frame_ms']:.1f}ms font={rep['font_resolve_ms']:.2f}ms "
+                      f"cache_hit={rep['font_cache_hit']}")
+        if args.save:
+            save_results(results, args.save)
+        if args.compare and compare(results, load_results(args.compare), 'time_to_first_frame_ms', args.tolerance):
+            sys.exit(1)
+        return
+
+    import type_game as tg
+
+    if args.cmd == 'run':
+        capture = None
+        if args.trace or args.cprofile:
+            start, _, count = (args.window or f"0:{args.frames}").partition(':')
+            start = int(start or 0)
+            count = int(count) if count else args.frames - start
+            capture = ('trace', args.trace, start, count) if args.trace else ('cprofile', args.cprofile, start, count)
+        rep = run_scene(tg, parse_keys(args.keys), args.stress, args.frames, capture)
+        print_report('run', rep)
+        print(json.dumps(rep, ensure_ascii=False, indent=2))
+        if capture:
+            print(f"Capture written to {capture[1]}")
+        return
+
+    results = {}
+    for name in args.only or list(SCENES):
+        schedule, stress = SCENES[name](args.frames)
+        results[name] = run_scene(tg, schedule, stress, args.frames)
+        print_report(name, results[name])
+
+    if args.save:
+        save_results(results, args.save)
+    if args.compare and compare(results, load_results(args.compare), 'avg_frame_ms', args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+对比两种渲染模式（dirty / full）的每帧耗时。
+
+场景：
+- idle：静态画面（相当于停在菜单上不动）
+- play：N 个下落目标 + 分数提示（sim ms 为目标池移动+剔除的耗时）
+
+用法：
+  python tools/bench_render.py --frames 600 --targets 50
+  python tools/bench_render.py --headless   # 使用 SDL dummy 驱动，无窗口
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+
+def run_scene(tg, screen, mode, scene, frames, n_targets):
+    """返回 (平均每帧毫秒, 其中移动+剔除的平均毫秒)。"""
+    from engine.renderer import Renderer
+    from engine.targets import TargetPool
+
+    renderer = Renderer(screen, tg.BG_COLOR, mode)
+    rnd = random.Random(0)
+    targets = TargetPool(tg.COLORS)
+
+    def refill(lo, hi):
+        need = (n_targets if scene == 'play' else 0) - len(targets)
+        for y in sorted((rnd.randint(lo, hi) for _ in range(need)), reverse=True):
+            targets.spawn(rnd.choice(tg.LEVEL_1), 1.0, rnd.randint(50, tg.WIDTH - 100), y,
+                          rnd.randrange(len(tg.COLORS)))
+
+    refill(-50, tg.HEIGHT)
+    sim_s = 0.0
+    for _ in range(frames):
+        renderer.begin_frame()
+        if renderer.needs_full_redraw:
+            title = tg.TEXT_CACHE.render(tg.GAME_FONT, "彩虹打字大冒险", tg.COLORS[0])
+            screen.blit(title, (tg.WIDTH // 2 - title.get_width() // 2, 50))
+        t0 = time.perf_counter()
+        targets.update(tg.HEIGHT)
+        refill(-tg.HEIGHT, -50)
+        sim_s += time.perf_counter() - t0
+        tg.draw_targets(renderer, targets.items())
+        if scene == 'play':
+            renderer.draw(tg.TEXT_CACHE.render(tg.SCORE_FONT, "得分: 0", tg.COLORS[4]), (20, 20))
+        renderer.present()
+    return renderer.avg_frame_ms, sim_s * 1000.0 / max(1, frames)
+
+
+def main():
+    p = argparse.ArgumentParser(description='对比脏矩形与整帧渲染的帧耗时')
+    p.add_argument('--frames', type=int, default=600, help='每个场景运行的帧数')
+    p.add_argument('--targets', type=int, default=50, help='play 场景中的目标数量')
+    p.add_argument('--headless', action='store_true', help='使用 SDL dummy 驱动（无窗口）')
+    args = p.parse_args()
+
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import type_game as tg
+    screen = tg.init_display(headless=args.headless)
+
+    print(f"{'scene':<8}{'mode':<8}{'avg ms/frame':>14}{'sim ms':>10}")
+    for scene in ('idle', 'play'):
+        results = {}
+        for mode in ('full', 'dirty'):
+            results[mode], sim_ms = run_scene(tg, screen, mode, scene, args.frames, args.targets)
+            print(f"{scene:<8}{mode:<8}{results[mode]:>14.3f}{sim_ms:>10.3f}")
+        if results['dirty'] > 0:
+            print(f"{scene:<8}{'speedup':<8}{results['full'] / results['dirty']:>13.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -1,85 +1,227 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 """
-导出周报/月报：基于 data/scores.csv 生成聚合报告。
+导出周报/月报：基于成绩记录（data/scores.sqlite3 等）生成聚合报告。
 
 输出：
 - data/report_weekly.csv 或 data/report_monthly.csv
 
 字段：period, level, mode, count, avg_score, best_score, avg_duration_sec, avg_completed
+
+增量导出：每个 (周期, 模式) 的累计量（次数、总分、最高分、总用时、总完成数）保存在
+成绩文件旁的检查点（如 data/scores.sqlite3.agg.json）中，导出时只累加上次检查点之后
+新增的记录；--full 忽略检查点从头统计。同一进程中对同一检查点的 读取→累加→保存 用锁串行
+（游戏里的周报与月报任务可能同时运行），检查点先写入唯一的临时文件再替换。
+
+报表缓存（engine/report_cache.py）：成绩文件指纹、周期与 REPORT_VERSION 都没变且输出文件未被改动时，
+直接返回，连检查点也不读取。
 """
 import argparse
 import csv
+import json
 import os
-from datetime import datetime
-
-
-def read_rows(csv_path):
-    rows = []
-    if not os.path.exists(csv_path):
-        return rows
-    with open(csv_path, 'r', encoding='utf-8-sig') as f:
-        reader = csv.DictReader(f)
-        for r in reader:
-            try:
-                ts = r.get('timestamp', '')
-                try:
-                    dt = datetime.fromisoformat(ts)
-                except Exception:
-                    continue
-                rows.append({
-                    'dt': dt,
-                    'level': int(r.get('level', '0') or 0),
-                    'mode': r.get('mode', ''),
-                    'score': int(r.get('score', '0') or 0),
-                    'duration_sec': int(r.get('duration_sec', '0') or 0),
-                    'completed': int(r.get('completed', '0') or 0),
-                })
-            except Exception:
-                continue
-    return rows
+import sys
+import tempfile
+import threading
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-def group_key(period, dt: datetime):
-    if period == 'weekly':
-        year, week, _ = dt.isocalendar()
-        return f"{year}-W{week:02d}"
-    else:  # monthly
-        return f"{dt.year}-{dt.month:02d}"
+from engine.report_cache import ReportCache, cache_key, fingerprint  # noqa: E402
+from engine.storage import MODE_NAME, find_scores, open_store, period_key, read_sessions  # noqa: E402
 
 
-def aggregate(rows, period: str):
-    groups = {}
-    for r in rows:
-        key = group_key(period, r['dt'])
-        lvl = r['level']
-        groups.setdefault(key, {}).setdefault(lvl, []).append(r)
+def read_rows(path, since=None, level=None):
+    """流式读取成绩记录（.csv / .sqlite3 / .bin 均可），逐条产出 SessionRecord。
+
+    since（ISO 时间字符串）与 level 在扫描时直接筛选；内存占用与文件大小无关。
+    """
+    return read_sessions(path, level=level, since=since)
+
+
+def add_record(totals, period, rec):
+    """把一条记录累加进 totals：{"期间|模式": [count, sum_score, best_score, sum_duration, sum_completed]}"""
+    label = period_key(period, rec.timestamp)
+    if label is None:
+        return
+    key = f"{label}|{rec.level}"
+    t = totals.get(key)
+    if t is None:
+        totals[key] = [1, rec.score, rec.score, rec.duration_sec, rec.completed]
+    else:
+        t[0] += 1
+        t[1] += rec.score
+        if rec.score > t[2]:
+            t[2] = rec.score
+        t[3] += rec.duration_sec
+        t[4] += rec.completed
+
+
+def fold(totals, records, period):
+    """把记录逐条累加进 totals（records 可以是生成器）。"""
+    for rec in records:
+        add_record(totals, period, rec)
+    return totals
 
+
+def totals_to_rows(totals, names=None):
+    """累计量 → 输出行。模式名称取 names（{"模式": 名称}，来自记录中保存的名称），
+    没有时按 MODE_NAME；关卡包中新增的模式同样输出。"""
+    names = names or {}
+    items = []
+    for key, t in totals.items():
+        label, _, lvl = key.rpartition('|')
+        items.append((label, int(lvl), t))
     out = []
-    mode_name = {1: '大写字母', 2: '小写字母', 3: '拼音'}
-    for key, lv_map in sorted(groups.items()):
-        for lvl in (1, 2, 3):
-            items = lv_map.get(lvl, [])
-            if not items:
-                continue
-            count = len(items)
-            avg_score = int(sum(i['score'] for i in items) / count)
-            best_score = max(i['score'] for i in items)
-            avg_dur = int(sum(i['duration_sec'] for i in items) / count)
-            avg_completed = float(sum(i['completed'] for i in items) / count)
-            out.append({
-                'period': key,
-                'level': lvl,
-                'mode': mode_name.get(lvl, str(lvl)),
-                'count': count,
-                'avg_score': avg_score,
-                'best_score': best_score,
-                'avg_duration_sec': avg_dur,
-                'avg_completed': f"{avg_completed:.2f}",
-            })
+    for label, lvl, (count, sum_score, best, sum_dur, sum_completed) in sorted(items, key=lambda x: (x[0], x[1])):
+        out.append({
+            'period': label,
+            'level': lvl,
+            'mode': names.get(str(lvl)) or MODE_NAME.get(lvl, str(lvl)),
+            'count': count,
+            'avg_score': int(sum_score / count),
+            'best_score': best,
+            'avg_duration_sec': int(sum_dur / count),
+            'avg_completed': f"{float(sum_completed / count):.2f}",
+        })
     return out
 
 
+def mode_names(records, names=None):
+    """边迭代 records 边记下每个模式最近一次记录中的名称（写入 names），逐条原样产出。"""
+    names = {} if names is None else names
+    for rec in records:
+        if rec.mode:
+            names[str(rec.level)] = rec.mode
+        yield rec
+
+
+def aggregate(rows, period: str):
+    """单遍聚合：rows 可以是 read_rows() 的生成器，只保留每个 (期间, 模式) 的累计量。"""
+    names = {}
+    return totals_to_rows(fold({}, mode_names(rows, names), period), names)
+
+
+_CHECKPOINT_LOCKS = {}
+_CHECKPOINT_LOCKS_GUARD = threading.Lock()
+
+
+def checkpoint_lock(checkpoint_path):
+    """checkpoint_path 对应的进程内锁（同一路径总是同一把锁）。"""
+    path = os.path.abspath(checkpoint_path)
+    with _CHECKPOINT_LOCKS_GUARD:
+        lock = _CHECKPOINT_LOCKS.get(path)
+        if lock is None:
+            lock = _CHECKPOINT_LOCKS[path] = threading.Lock()
+        return lock
+
+
+CHECKPOINT_VERSION = 1
+REPORT_VERSION = 2  # 输出格式变化时递增，使报表缓存失效
+PERIODS = ('weekly', 'monthly')
+
+
+class IncrementalAggregator:
+    """按 (周期, 模式) 维护累计量的增量聚合器，状态保存在检查点文件中。"""
+
+    def __init__(self, data_path, checkpoint_path=None):
+        self.data_path = data_path
+        self.checkpoint_path = checkpoint_path or data_path + '.agg.json'
+        self._reset()
+        self._load()
+
+    def _reset(self):
+        self.cursor = None
+        self.head = None
+        self.names = {}  # "模式" -> 名称
+        # totals[period]["期间|模式"] = [count, sum_score, best_score, sum_duration, sum_completed]
+        self.totals = {p: {} for p in PERIODS}
+
+    def _load(self):
+        try:
+            with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+                ck = json.load(f)
+        except Exception:
+            return
+        if ck.get('version') != CHECKPOINT_VERSION:
+            return
+        self.cursor = ck.get('cursor')
+        self.head = ck.get('head')
+        self.names = ck.get('names', {})
+        self.totals = {p: ck.get('totals', {}).get(p, {}) for p in PERIODS}
+
+    def save(self):
+        ck = {'version': CHECKPOINT_VERSION, 'cursor': self.cursor, 'head': self.head, 'names': self.names,
+              'totals': self.totals}
+        fd, tmp = tempfile.mkstemp(prefix=os.path.basename(self.checkpoint_path) + '.',
+                                   suffix='.tmp', dir=os.path.dirname(os.path.abspath(self.checkpoint_path)))
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(ck, f, ensure_ascii=False)
+            os.replace(tmp, self.checkpoint_path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def fold(self, records):
+        """单遍把记录累加到所有周期（records 可以是生成器，不整体载入），返回条数。"""
+        targets = [(period, self.totals[period]) for period in PERIODS]
+        n = 0
+        for rec in mode_names(records, self.names):
+            n += 1
+            for period, totals in targets:
+                add_record(totals, period, rec)
+        return n
+
+    def update(self):
+        """累加检查点之后新增的记录并保存检查点，返回新增条数。
+
+        没有检查点（或需要重建）时同样是对全部记录的单遍流式累加。
+        """
+        if not os.path.exists(self.data_path):
+            return 0
+        store = open_store(self.data_path)
+        try:
+            first = next(store.iter_sessions(), None)
+            head = list(first) if first is not None else None
+            if head != self.head and self.cursor is not None:
+                # 数据源被替换（首条记录不同），从头重建
+                self._reset()
+            records, cursor = store.tail(self.cursor)
+            if records is None:
+                self._reset()
+                records, cursor = store.tail(None)
+            # tail 返回的是迭代器，必须在关闭存储前消费完
+            n = self.fold(records)
+        finally:
+            store.close()
+        self.head = head
+        self.cursor = cursor
+        self.save()
+        return n
+
+    def rows(self, period):
+        """与 aggregate() 相同格式的输出行。"""
+        return totals_to_rows(self.totals[period], self.names)
+
+
+def export_incremental(data_path, period, out_path, full=False):
+    """增量更新检查点并写出报表，返回输出行；成绩没变且输出文件完好时（缓存命中）返回 None。"""
+    cache = ReportCache.for_output(out_path)
+    key = cache_key(fingerprint(data_path), f'csv:{period}', [os.path.abspath(data_path)], REPORT_VERSION)
+    if not full and cache.hit(out_path, key):
+        return None
+    checkpoint_path = data_path + '.agg.json'
+    with checkpoint_lock(checkpoint_path):
+        agg = IncrementalAggregator(data_path, checkpoint_path)
+        if full:
+            agg._reset()
+        agg.update()
+        rows = agg.rows(period)
+    write_csv(rows, out_path)
+    cache.store(out_path, key)
+    return rows
+
+
 def write_csv(rows, out_path):
     os.makedirs(os.path.dirname(out_path), exist_ok=True)
     headers = ['period', 'level', 'mode', 'count', 'avg_score', 'best_score', 'avg_duration_sec', 'avg_completed']
@@ -93,17 +235,21 @@ def write_csv(rows, out_path):
 def main():
     parser = argparse.ArgumentParser(description='导出成绩的周报/月报汇总')
     parser.add_argument('--period', choices=['weekly', 'monthly'], default='weekly', help='统计周期')
-    parser.add_argument('--data', default='data/scores.csv', help='成绩 CSV 路径')
+    parser.add_argument('--data', default=None, help='成绩记录路径（.sqlite3/.bin/.csv，默认自动查找 data/ 下的记录）')
     parser.add_argument('--out', default=None, help='输出 CSV 路径（默认 data/report_*.csv）')
+    parser.add_argument('--full', action='store_true', help='忽略检查点，从头统计全部记录')
     args = parser.parse_args()
 
-    rows = read_rows(args.data)
-    agg = aggregate(rows, args.period)
+    if not args.data:
+        args.data = find_scores('data')
     if not args.out:
         suffix = 'weekly' if args.period == 'weekly' else 'monthly'
         args.out = f'data/report_{suffix}.csv'
-    write_csv(agg, args.out)
-    print(f"Exported {len(agg)} rows to {args.out}")
+    agg = export_incremental(args.data, args.period, args.out, full=args.full)
+    if agg is None:
+        print(f"{args.out} is up to date")
+    else:
+        print(f"Exported {len(agg)} rows to {args.out}")
 
 
 if __name__ == '__main__':
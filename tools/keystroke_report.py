@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+逐键弱项分析：基于 data/keystrokes.bin 统计每个字母/拼音音节的正确率与反应时间。
+
+输出：
+- 终端打印正确率最低的若干字母与音节
+- --out-dir 时写出 keys.csv（按字符）、syllables.csv（按目标文字）、weekly.csv（按周趋势）
+
+用法：
+  python tools/keystroke_report.py --top 10
+  python tools/keystroke_report.py --days 28 --out-dir data/keystroke_report
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine import analytics  # noqa: E402
+from engine.keylog import keylog_path  # noqa: E402
+
+
+def write_rows(rows, out_path):
+    if not rows:
+        return
+    with open(out_path, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def print_rows(title, rows):
+    print(title)
+    for r in rows:
+        median = '-' if r['median_ms'] is None else f"{r['median_ms']}ms"
+        p95 = '-' if r['p95_ms'] is None else f"{r['p95_ms']}ms"
+        print(f"  {r['key']:<6} accuracy={r['accuracy']:.1%} attempts={r['attempts']:<6} "
+              f"fallen={r['fallen']:<4} median={median:<8} p95={p95}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='逐键弱项分析（每个字母/音节的正确率与反应时间）')
+    parser.add_argument('--data', default=keylog_path('data'), help='逐键记录文件（默认 data/keystrokes.bin）')
+    parser.add_argument('--days', type=int, default=0, help='只统计最近 N 天（0 表示全部）')
+    parser.add_argument('--top', type=int, default=10, help='打印最弱的前 N 项')
+    parser.add_argument('--out-dir', default=None, help='写出 CSV 的目录')
+    args = parser.parse_args()
+
+    if not analytics.available:
+        sys.exit('逐键分析需要 NumPy：pip install numpy')
+
+    t0 = time.perf_counter()
+    table = analytics.load_keystrokes(args.data, since=time.time() - args.days * 86400 if args.days else None)
+    keys = analytics.key_stats(table, by='char')
+    syllables = [r for r in analytics.key_stats(table, by='text') if len(r['key']) > 1]
+    weekly = analytics.weekly_trend(table, by='text')
+    elapsed = time.perf_counter() - t0
+
+    print(f"{len(table)} keystrokes in {len(table.session_level)} sessions ({elapsed * 1000:.0f} ms)")
+    print_rows('Weakest keys:', keys[:args.top])
+    if syllables:
+        print_rows('Weakest syllables:', syllables[:args.top])
+
+    if args.out_dir:
+        os.makedirs(args.out_dir, exist_ok=True)
+        write_rows(keys, os.path.join(args.out_dir, 'keys.csv'))
+        write_rows(syllables, os.path.join(args.out_dir, 'syllables.csv'))
+        write_rows(weekly, os.path.join(args.out_dir, 'weekly.csv'))
+        print(f"Exported CSV files to {args.out_dir}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+把成绩记录从一种存储迁移到另一种（通常是旧的 data/scores.csv → data/scores.sqlite3）。
+
+游戏首次使用 SQLite/二进制日志时会自动迁移；本工具用于手动迁移或切换后端。
+
+用法：
+  python tools/migrate_scores.py --src data/scores.csv --dst data/scores.sqlite3
+  python tools/migrate_scores.py --src data/scores.csv --dst data/scores.bin
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine.storage import migrate_csv, open_store  # noqa: E402
+
+
+def main():
+    p = argparse.ArgumentParser(description='迁移成绩记录到新的存储后端')
+    p.add_argument('--src', default='data/scores.csv', help='源记录路径')
+    p.add_argument('--dst', default='data/scores.sqlite3', help='目标路径（.sqlite3 / .bin / .csv）')
+    p.add_argument('--force', action='store_true', help='目标已存在时仍然追加导入')
+    args = p.parse_args()
+
+    if not os.path.exists(args.src):
+        sys.exit(f"源文件不存在：{args.src}")
+    if os.path.exists(args.dst) and not args.force:
+        sys.exit(f"目标已存在：{args.dst}（重复导入会产生重复记录，确认请加 --force）")
+
+    t0 = time.perf_counter()
+    dst = open_store(args.dst)
+    try:
+        if args.src.lower().endswith('.csv'):
+            n = migrate_csv(args.src, dst)
+        else:
+            src = open_store(args.src)
+            try:
+                n = 0
+                chunk = []
+                for rec in src.iter_sessions():
+                    chunk.append(rec)
+                    if len(chunk) >= 10000:
+                        dst.extend(chunk)
+                        n += len(chunk)
+                        chunk = []
+                if chunk:
+                    dst.extend(chunk)
+                    n += len(chunk)
+            finally:
+                src.close()
+    finally:
+        dst.close()
+    print(f"Migrated {n} sessions to {args.dst} in {time.perf_counter() - t0:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
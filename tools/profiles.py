@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+管理学习者档案（每个孩子一个档案，成绩分区存放在 data/profiles/<名字>/，见 engine/profiles.py）。
+
+游戏菜单中按 P（或点“学习者”按钮）在档案之间切换；本工具用于批量建档和查看。
+
+用法：
+  python tools/profiles.py list
+  python tools/profiles.py add 小明 小红
+  python tools/profiles.py use 小明
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from engine.profiles import ProfileRegistry  # noqa: E402
+from engine.storage import find_scores  # noqa: E402
+
+
+def main():
+    p = argparse.ArgumentParser(description='管理学习者档案')
+    p.add_argument('--data-dir', default='data', help='数据目录')
+    sub = p.add_subparsers(dest='cmd', required=True)
+    sub.add_parser('list', help='列出档案')
+    add = sub.add_parser('add', help='新建档案')
+    add.add_argument('names', nargs='+')
+    use = sub.add_parser('use', help='设为下次启动时的档案')
+    use.add_argument('name')
+    args = p.parse_args()
+
+    registry = ProfileRegistry(args.data_dir)
+    if args.cmd == 'add':
+        for name in args.names:
+            try:
+                print(f"{name}: {registry.create(name)}")
+            except ValueError as e:
+                sys.exit(str(e))
+    elif args.cmd == 'use':
+        if args.name not in registry.names():
+            sys.exit(f"档案不存在：{args.name}（先用 add 新建）")
+        registry.set_active(args.name)
+        print(f"Active profile: {args.name}")
+    else:
+        active = registry.active()
+        for name in registry.names():
+            scores = find_scores(registry.path(name))
+            size = os.path.getsize(scores) if os.path.exists(scores) else 0
+            print(f"{'*' if name == active else ' '} {name:<12} {scores} ({size} bytes)")
+
+
+if __name__ == '__main__':
+    main()
@@ -3,88 +3,130 @@
 """
 生成可视化学习报告（HTML + 内嵌 SVG），无第三方依赖。
 
-读取 data/scores.csv，按模式绘制：
-- 折线图（最近 N 次成绩，默认 30）
+读取成绩记录（data/scores.sqlite3 等，流式单遍汇总），按模式绘制（内置的三个模式与数据中出现的其它模式，名称取记录中保存的模式名）：
+- 折线图（最近 N 次成绩，默认 30；--recent 0 表示全部历史）
+- 全部历史折线图（记录多于 N 次时附加）
 - 周汇总柱状图（最近 12 周平均分）
 
+折线超过 MAX_POINTS 个点时用 LTTB 降采样（见 engine/downsample.py），全部历史在汇总时就流式降采样，
+HTML 大小与生成时间不随记录总数增长。HTML 分段直接写入文件（先写临时文件再替换）。
+
+报表缓存（engine/report_cache.py）：成绩文件指纹、recent 与 REPORT_VERSION 都没变时直接返回，不读取成绩；
+成绩有新增时只重新汇总、绘制新增记录涉及的模式，其余模式沿用缓存的分段。--no-cache 强制全部重建。
+
 用法：
   python tools/visualize_report.py --recent 30 --out data/report.html
+  python tools/visualize_report.py --recent 0        # 只看全部历史
 
 输出：data/report.html
 """
 import argparse
-import csv
 import os
-from datetime import datetime
+import sys
+import io
+from collections import deque
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-MODE_NAME = {1: '大写字母', 2: '小写字母', 3: '拼音'}
-MODE_COLOR = {1: '#ff6a5c', 2: '#4ecdc4', 3: '#556cd6'}
+from engine.downsample import StreamingSeries, lttb  # noqa: E402
+from engine.report_cache import ReportCache, cache_key, fingerprint, read_changes  # noqa: E402
+from engine.storage import MODE_NAME, find_scores, period_key, read_sessions  # noqa: E402
 
 
-def read_rows(csv_path):
-    rows = []
-    if not os.path.exists(csv_path):
-        return rows
-    with open(csv_path, 'r', encoding='utf-8-sig') as f:
-        reader = csv.DictReader(f)
-        for r in reader:
-            try:
-                ts = r.get('timestamp', '')
-                try:
-                    dt = datetime.fromisoformat(ts)
-                except Exception:
-                    continue
-                rows.append({
-                    'dt': dt,
-                    'timestamp': ts,
-                    'level': int(r.get('level', '0') or 0),
-                    'mode': r.get('mode', ''),
-                    'score': int(r.get('score', '0') or 0),
-                    'duration_sec': int(r.get('duration_sec', '0') or 0),
-                    'completed': int(r.get('completed', '0') or 0),
-                })
-            except Exception:
-                continue
-    # 时间升序
-    rows.sort(key=lambda x: x['dt'])
-    return rows
-
-
-def group_by_mode(rows):
-    out = {1: [], 2: [], 3: []}
-    for r in rows:
-        if r['level'] in out:
-            out[r['level']].append(r)
+MODE_COLOR = {1: '#ff6a5c', 2: '#4ecdc4', 3: '#556cd6'}
+EXTRA_COLORS = ('#f7b731', '#a55eea', '#20bf6b', '#eb3b5a', '#3867d6')  # 关卡包中新增的模式轮流使用
+MAX_POINTS = 1000  # 每条折线最多的点数
+MAX_DOTS = 120     # 点数不超过此值时才逐点画圆点
+REPORT_VERSION = 3  # 报表版式变化时递增，使缓存失效
+
+
+def read_rows(path, since=None, level=None):
+    """流式读取成绩记录，逐条产出 SessionRecord（记录按追加顺序，即时间升序）。"""
+    return read_sessions(path, level=level, since=since)
+
+
+class ModeSummary:
+    """单个模式的流式汇总：总次数/最佳/总分、最近 N 局、全部历史（降采样）、每周分数累计。"""
+
+    __slots__ = ('name', 'count', 'best', 'total', 'recent', 'history', 'weekly')
+
+    def __init__(self, recent):
+        self.name = None  # 最近一条记录中的模式名称
+        self.count = 0
+        self.best = 0
+        self.total = 0
+        self.recent = deque(maxlen=max(0, recent))  # (序号, 时间戳, 分数)
+        self.history = StreamingSeries(MAX_POINTS)
+        self.weekly = {}  # 周标签 -> [总分, 次数]
+
+    def add(self, rec):
+        week = period_key('weekly', rec.timestamp)
+        if week is None:
+            return
+        self.name = rec.mode or self.name
+        if self.count == 0 or rec.score > self.best:
+            self.best = rec.score
+        if self.recent.maxlen:
+            self.recent.append((self.count, rec.timestamp, rec.score))
+        self.history.add(self.count, rec.timestamp[:10], rec.score)
+        self.count += 1
+        self.total += rec.score
+        w = self.weekly.get(week)
+        if w is None:
+            self.weekly[week] = [rec.score, 1]
+        else:
+            w[0] += rec.score
+            w[1] += 1
+
+
+def summarize(records, recent=30):
+    """单遍汇总各模式，内存只与 recent、MAX_POINTS 和周数有关，与记录总数无关。
+
+    内置的三个模式总是有汇总（没有记录时为空）；关卡包中新增的模式遇到记录时再加入。
+    """
+    out = {lvl: ModeSummary(recent) for lvl in MODE_NAME}
+    for rec in records:
+        summary = out.get(rec.level)
+        if summary is None:
+            summary = out[rec.level] = ModeSummary(recent)
+        summary.add(rec)
     return out
 
 
-def isoweek_key(dt: datetime):
-    year, week, _ = dt.isocalendar()
-    return f"{year}-W{week:02d}"
+def report_levels(*groups):
+    """报告中出现的模式：内置的三个模式加上数据里出现的模式，按编号排序。"""
+    levels = set(MODE_NAME)
+    for group in groups:
+        levels.update(int(lvl) for lvl in group)
+    return sorted(levels)
+
 
+def mode_color(lvl):
+    return MODE_COLOR.get(lvl) or EXTRA_COLORS[lvl % len(EXTRA_COLORS)]
 
-def weekly_aggregate(rows):
+
+def weekly_aggregate(summary):
     # 返回最近 12 周（有数据的周）平均分列表
-    bucket = {}
-    for r in rows:
-        k = isoweek_key(r['dt'])
-        bucket.setdefault(k, []).append(r['score'])
-    items = []
-    for k, scores in bucket.items():
-        if scores:
-            items.append((k, int(sum(scores)/len(scores))))
+    items = [(k, int(total / n)) for k, (total, n) in summary.weekly.items() if n]
     items.sort(key=lambda x: x[0])
     return items[-12:]
 
 
-def stats_summary(rows):
-    if not rows:
+def stats_summary(summary):
+    if not summary.count:
         return {'count': 0, 'best': 0, 'avg': 0}
-    count = len(rows)
-    best = max(r['score'] for r in rows)
-    avg = int(sum(r['score'] for r in rows)/count)
-    return {'count': count, 'best': best, 'avg': avg}
+    return {'count': summary.count, 'best': summary.best, 'avg': int(summary.total / summary.count)}
+
+
+def recent_avg(summary):
+    if not summary.recent:
+        return 0
+    return int(sum(score for _, _, score in summary.recent) / len(summary.recent))
+
+
+def recent_points(summary):
+    """最近 N 次的折线点 (序号, MM-DD, 分数)，超过 MAX_POINTS 时降采样。"""
+    return lttb([(i, ts[5:10], score) for i, ts, score in summary.recent], MAX_POINTS)
 
 
 def nice_max(val, step=50):
@@ -95,7 +137,7 @@ def nice_max(val, step=50):
 
 
 def svg_line_chart(title, points, width=760, height=260, color='#556cd6'):
-    # points: list of (label, value)
+    # points: list of (x, label, value)，x 为序号，决定横坐标（降采样后不等距）
     padding = 40
     inner_w = width - padding*2
     inner_h = height - padding*2
@@ -105,17 +147,19 @@ def svg_line_chart(title, points, width=760, height=260, color='#556cd6'):
   <h3>{title}</h3>
   <div class='nodata'>暂无数据</div>
 </div>"""
-    values = [v for _, v in points]
+    values = [v for _, _, v in points]
     vmax = nice_max(max(values), 50)
+    x0 = points[0][0]
+    span = points[-1][0] - x0
     # 坐标转换
-    def tx(i):
-        if len(points) == 1:
+    def tx(x):
+        if not span:
             return padding + inner_w // 2
-        return padding + int(i * inner_w / (len(points)-1))
+        return padding + int((x - x0) * inner_w / span)
     def ty(v):
         return padding + int((vmax - v) * inner_h / vmax)
     # polyline
-    pts = " ".join(f"{tx(i)},{ty(v)}" for i, (_, v) in enumerate(points))
+    pts = " ".join(f"{tx(x)},{ty(v)}" for x, _, v in points)
     # x 轴刻度每 1 个点、y 轴每 step
     y_grid = []
     step = vmax // 5 or 10
@@ -126,11 +170,13 @@ def svg_line_chart(title, points, width=760, height=260, color='#556cd6'):
     # x 轴仅显示首尾标签
     x_labels = []
     if points:
-        x_labels.append(f"<text x='{tx(0)}' y='{height-8}' class='axis' text-anchor='start'>{points[0][0]}</text>")
+        x_labels.append(f"<text x='{tx(x0)}' y='{height-8}' class='axis' text-anchor='start'>{points[0][1]}</text>")
         if len(points) > 1:
-            x_labels.append(f"<text x='{tx(len(points)-1)}' y='{height-8}' class='axis' text-anchor='end'>{points[-1][0]}</text>")
+            x_labels.append(f"<text x='{tx(points[-1][0])}' y='{height-8}' class='axis' text-anchor='end'>{points[-1][1]}</text>")
 
-    dots = "\n".join(f"<circle cx='{tx(i)}' cy='{ty(v)}' r='3' fill='{color}' />" for i, (_, v) in enumerate(points))
+    dots = ""
+    if len(points) <= MAX_DOTS:
+        dots = "\n".join(f"<circle cx='{tx(x)}' cy='{ty(v)}' r='3' fill='{color}' />" for x, _, v in points)
     svg = f"""
 <div class='chart'>
   <h3>{title}</h3>
@@ -191,8 +237,7 @@ def svg_bar_chart(title, items, width=760, height=260, color='#4ecdc4'):
     return svg
 
 
-def build_html(mode_rows, recent=30):
-    parts = []
+def html_header(recent):
     header = """
 <!doctype html>
 <html lang="zh-CN">
@@ -215,58 +260,137 @@ def build_html(mode_rows, recent=30):
 </style>
 <body>
 <h1>学习报告</h1>
-<div class='section'>最近 {recent} 次：折线图；最近 12 周：柱状图</div>
-""".replace('{recent}', str(recent))
-    parts.append(header)
-
-    for lvl in (1, 2, 3):
-        rows = mode_rows.get(lvl, [])
-        name = MODE_NAME.get(lvl, str(lvl))
-        color = MODE_COLOR.get(lvl, '#556cd6')
-        parts.append("<div class='section'>")
-        parts.append(f"<div class='mode-title'><span class='dot' style='background:{color}'></span><h2 style='margin:0'>{name}</h2></div>")
-
-        # 概览
-        s_all = stats_summary(rows)
-        recent_rows = rows[-recent:]
-        s_recent = stats_summary(recent_rows)
-        parts.append("<div class='summary'>")
-        parts.append(f"<div class='card'>历史次数：{s_all['count']}</div>")
-        parts.append(f"<div class='card'>历史最佳：{s_all['best']}</div>")
-        parts.append(f"<div class='card'>历史平均：{s_all['avg']}</div>")
-        parts.append(f"<div class='card'>最近{recent}次平均：{s_recent['avg']}</div>")
-        parts.append("</div>")
-
-        # 折线图（最近 N 次）
-        line_points = [(r['dt'].strftime('%m-%d'), r['score']) for r in recent_rows]
-        parts.append(svg_line_chart('最近成绩（分数）', line_points, color=color))
-
-        # 周汇总柱状图（最近 12 周平均）
-        wk = weekly_aggregate(rows)
-        # 压缩 label 显示：仅显示后缀 Wxx
-        wk_items = [(lab.split('-W')[-1], avg) for (lab, avg) in wk]
-        parts.append(svg_bar_chart('每周平均分（最近 12 周）', wk_items, color=color))
-
-        parts.append("</div>")
-
-    parts.append("<div class='footer'>由 visualize_report.py 生成</div>")
-    parts.append("</body></html>")
-    return "\n".join(parts)
+<div class='section'>{scope}：折线图；最近 12 周：柱状图</div>
+""".replace('{scope}', f'最近 {recent} 次' if recent > 0 else '全部历史')
+    return header
+
+
+def iter_section(lvl, summary, recent):
+    """单个模式的 HTML 分段（逐段产出）。"""
+    name = summary.name or MODE_NAME.get(lvl, str(lvl))
+    color = mode_color(lvl)
+    yield "<div class='section'>"
+    yield f"<div class='mode-title'><span class='dot' style='background:{color}'></span><h2 style='margin:0'>{name}</h2></div>"
+
+    # 概览
+    s_all = stats_summary(summary)
+    yield "<div class='summary'>"
+    yield f"<div class='card'>历史次数：{s_all['count']}</div>"
+    yield f"<div class='card'>历史最佳：{s_all['best']}</div>"
+    yield f"<div class='card'>历史平均：{s_all['avg']}</div>"
+    if recent > 0:
+        yield f"<div class='card'>最近{recent}次平均：{recent_avg(summary)}</div>"
+    yield "</div>"
+
+    # 折线图（最近 N 次；记录更多时再附全部历史）
+    if recent > 0:
+        yield svg_line_chart('最近成绩（分数）', recent_points(summary), color=color)
+    if recent <= 0 or summary.count > recent:
+        yield svg_line_chart(f'全部历史成绩（{summary.count} 次）', summary.history.points(), color=color)
+
+    # 周汇总柱状图（最近 12 周平均）
+    wk = weekly_aggregate(summary)
+    # 压缩 label 显示：仅显示后缀 Wxx
+    wk_items = [(lab.split('-W')[-1], avg) for (lab, avg) in wk]
+    yield svg_bar_chart('每周平均分（最近 12 周）', wk_items, color=color)
+
+    yield "</div>"
+
+
+def section_html(lvl, summary, recent):
+    return "\n".join(iter_section(lvl, summary, recent))
+
+
+def iter_document(recent, sections):
+    """文档头、各模式分段（字符串）、页脚，依次产出。"""
+    yield html_header(recent)
+    yield from sections
+    yield "<div class='footer'>由 visualize_report.py 生成</div>"
+    yield "</body></html>"
+
+
+def iter_html(summaries, recent=30):
+    """逐段产出 HTML（各段之间以换行连接）；recent 为 0 时折线图展示全部历史。"""
+    sections = (section_html(lvl, summaries.get(lvl) or ModeSummary(recent), recent)
+                for lvl in report_levels(summaries))
+    return iter_document(recent, sections)
+
+
+def write_parts(out, parts):
+    """把各段以换行连接写入文本文件对象 out。"""
+    sep = ""
+    for part in parts:
+        out.write(sep)
+        out.write(part)
+        sep = "\n"
+
+
+def write_html(out, summaries, recent=30):
+    write_parts(out, iter_html(summaries, recent))
+
+
+def build_html(summaries, recent=30):
+    buf = io.StringIO()
+    write_html(buf, summaries, recent)
+    return buf.getvalue()
+
+
+def write_report(data_path, out_path, recent=30, use_cache=True):
+    """读取成绩、生成 HTML 并写入 out_path（可在子进程中调用）。
+
+    成绩与参数都没变时直接返回；只有部分模式新增了记录时，只重建这些模式的分段。
+    """
+    cache = ReportCache.for_output(out_path)
+    params = [os.path.abspath(data_path), recent, REPORT_VERSION]
+    key = cache_key(fingerprint(data_path), 'html', params, REPORT_VERSION)
+    if use_cache and cache.hit(out_path, key):
+        return out_path
+    entry = cache.entry(out_path) if use_cache else {}
+    if entry.get('params') != params:
+        entry = {}
+    changed, head, cursor = read_changes(data_path, entry.get('head'), entry.get('cursor'))
+    summaries = summarize(read_rows(data_path), recent=recent) if changed is None else {}
+    old_sections = entry.get('sections') or {}
+    levels = report_levels(summaries) if changed is None else report_levels(old_sections, changed)
+    sections, texts = {}, []
+    for lvl in levels:
+        text = None
+        if changed is not None and lvl not in changed and str(lvl) in old_sections:
+            text = cache.get_section(old_sections[str(lvl)])
+        if text is None:
+            summary = summaries.get(lvl)
+            if summary is None:
+                summary = summarize(read_rows(data_path, level=lvl), recent=recent).get(lvl) or ModeSummary(recent)
+            text = section_html(lvl, summary, recent)
+        sections[str(lvl)] = cache.put_section(text)
+        texts.append(text)
+
+    out_dir = os.path.dirname(out_path)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    tmp = f"{out_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, 'w', encoding='utf-8') as f:
+            write_parts(f, iter_document(recent, texts))
+        os.replace(tmp, out_path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    cache.store(out_path, key, params=params, head=head, cursor=cursor, sections=sections)
+    return out_path
 
 
 def main():
     p = argparse.ArgumentParser(description='生成可视化学习报告（HTML + SVG）')
-    p.add_argument('--data', default='data/scores.csv', help='成绩 CSV 路径')
+    p.add_argument('--data', default=None, help='成绩记录路径（.sqlite3/.bin/.csv，默认自动查找 data/ 下的记录）')
     p.add_argument('--out', default='data/report.html', help='输出 HTML 路径')
-    p.add_argument('--recent', type=int, default=30, help='折线图使用最近 N 次')
+    p.add_argument('--recent', type=int, default=30, help='折线图使用最近 N 次（0 表示全部历史）')
+    p.add_argument('--no-cache', action='store_true', help='忽略报表缓存，全部重建')
     args = p.parse_args()
 
-    rows = read_rows(args.data)
-    mode_rows = group_by_mode(rows)
-    html = build_html(mode_rows, recent=args.recent)
-    os.makedirs(os.path.dirname(args.out), exist_ok=True)
-    with open(args.out, 'w', encoding='utf-8') as f:
-        f.write(html)
+    if not args.data:
+        args.data = find_scores('data')
+    write_report(args.data, args.out, recent=args.recent, use_cache=not args.no_cache)
     print(f"Report written to {args.out}")
 
 
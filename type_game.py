@@ -1,21 +1,39 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
+import time
+STARTUP_T0 = time.perf_counter()  # 启动计时起点（time-to-first-frame 从这里算起）
+
+import asyncio
 import pygame
 import random
 import sys
 import os
-import glob
-import csv
-import time
-from datetime import datetime
 import webbrowser
 import importlib
+from datetime import datetime
+
+from engine import analytics
+from engine.async_runner import FramePacer, WriteBehind, serve_telemetry
+from engine.atlas import GlyphAtlasBank
+from engine.difficulty import DifficultyEngine
+from engine.fonts import FontSource
+from engine.headless import use_dummy_drivers
+from engine.jobs import JobRunner
+from engine.keylog import KeystrokeLog, KeystrokeRecorder, keylog_path
+from engine.levels import load_pack
+from engine.profiler import NULL_PROFILER, LiveProfiler
+from engine.profiles import ProfileRegistry
+from engine.renderer import Renderer
+from engine.stats import StatsEngine
+from engine.storage import make_record, open_game_store, read_sessions
+from engine.targets import PooledTarget, TargetPool
+from engine.text_cache import TextCache
+from engine.timestep import FixedTimestep
 
 # --- 初始化设置 ---
-pygame.init()
+# 导入本模块没有副作用（不初始化 pygame、不打开窗口、不查找字体），窗口在 Game.init() 中创建
 WIDTH, HEIGHT = 800, 600
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption("一年级彩虹打字大冒险")
+CAPTION = "一年级彩虹打字大冒险"
 
 # --- 颜色定义 (马卡龙色系，保护视力且可爱) ---
 WHITE = (255, 255, 255)
@@ -23,433 +41,880 @@ BLACK = (50, 50, 50)
 BG_COLOR = (230, 245, 255) # 淡蓝色背景
 COLORS = [(255, 105, 97), (255, 180, 128), (248, 243, 141), (66, 214, 164), (89, 173, 246)]
 
+# --- 渲染模式 ---
+# dirty：只重画变化的区域（默认）；full：每帧整屏重画。可用环境变量 TYPE_GAME_RENDER 切换。
+RENDER_MODE = os.environ.get('TYPE_GAME_RENDER', 'dirty')
+# 压力测试：TYPE_GAME_STRESS=N 时练习界面始终保持 N 个目标（0 表示正常游戏）
+STRESS_TARGETS = int(os.environ.get('TYPE_GAME_STRESS', '0') or 0)
+# 成绩存储后端：sqlite（默认）/ binlog / csv。首次使用新后端时会自动导入旧的 data/scores.csv
+STORE_BACKEND = os.environ.get('TYPE_GAME_STORE', 'sqlite')
+# 渲染帧率上限：数字（默认 60）；0 表示不限帧率；vsync 表示跟随显示器刷新（不可用时退回不限帧率）。
+# 游戏逻辑固定以 SIM_HZ 步进，与渲染帧率无关
+RENDER_FPS = os.environ.get('TYPE_GAME_FPS', '60').strip().lower()
+SIM_HZ = 60
+# 成绩文件超过该大小时，报表计算放到子进程中进行
+PROCESS_POOL_MIN_BYTES = 16 * 1024 * 1024
+# 性能浮层：F3 显示/隐藏；F4 录制之后 CAPTURE_FRAMES 帧的 Chrome trace，F5 录制 cProfile（写到 data/traces/）。
+# 浮层关闭且没有录制时使用 NULL_PROFILER，没有任何计时开销
+CAPTURE_FRAMES = 300
+OVERLAY_REFRESH = 0.25  # 浮层文字刷新间隔（秒）
+# 本机遥测（占位）：TYPE_GAME_TELEMETRY=<端口> 时每秒向连接到 127.0.0.1:<端口> 的客户端发送一行 JSON 状态
+TELEMETRY_PORT = int(os.environ.get('TYPE_GAME_TELEMETRY', '0') or 0) or None
+# 成绩与逐键记录在后台写入线程中批量写盘，新记录最多等待这么久（秒）
+PERSIST_DELAY = 0.5
+# 出题权重后台计算的任务 key 前缀（后接档案名）
+SAMPLER_JOB = 'analytics:samplers:'
+# 报表任务的串行队列名前缀（后接档案名）
+REPORT_LANE = 'report:'
+# 自适应难度：根据最近的命中率与反应时间调整速度和生成间隔；TYPE_GAME_ADAPTIVE=0 关闭（压力测试时也不启用）
+ADAPTIVE_DIFFICULTY = os.environ.get('TYPE_GAME_ADAPTIVE', '1') != '0'
+
+# 关卡包（题目、权重、速度曲线、显示名称），可用环境变量 TYPE_GAME_LEVELS 指定其它 JSON 文件；
+# 编译结果缓存在 data/level_cache/
+LEVEL_PACK_PATH = os.environ.get('TYPE_GAME_LEVELS') or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'assets', 'levels', 'default.json')
+LEVEL_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'level_cache')
+
+# 字体查找结果缓存（字体文件路径 + mtime），可用环境变量 TYPE_GAME_FONT_CACHE 指定位置
+FONT_CACHE_PATH = os.environ.get('TYPE_GAME_FONT_CACHE') or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'data', 'font_cache.json')
+
 def load_fonts():
-    """加载支持中文的字体：优先使用项目自带字体，其次匹配系统常见中文字体。
+    """支持中文的字体：优先使用项目自带字体，其次匹配系统常见中文字体。
 
+    字体在第一次渲染时才查找和加载，查找结果缓存在 FONT_CACHE_PATH。
     返回: (GAME_FONT, SCORE_FONT)
     """
     base_dir = os.path.dirname(os.path.abspath(__file__))
-    assets_font_dir = os.path.join(base_dir, 'assets', 'fonts')
-
-    # 1) 项目自带字体（将 .ttf/.otf 放到 assets/fonts/ 下即可生效）
-    custom_fonts = []
-    for pattern in ("*.ttf", "*.otf", "*.ttc"):
-        custom_fonts.extend(glob.glob(os.path.join(assets_font_dir, pattern)))
-
-    if custom_fonts:
-        font_file = sorted(custom_fonts)[0]
-        try:
-            game_font = pygame.font.Font(font_file, 60)
-            score_font = pygame.font.Font(font_file, 30)
-            return game_font, score_font
-        except Exception:
-            pass
-
-    # 2) 尝试通过 match_font 精确匹配常见中文字体文件路径
-    match_candidates = [
-        # Windows
-        'msyh', 'microsoft yahei', 'simhei', 'simsun', 'dengxian',
-        # macOS
-        'pingfang sc', 'heiti sc', 'stheiti', 'hiragino sans gb',
-        # Linux / 通用
-        'noto sans cjk sc', 'noto sans cjk', 'source han sans cn', 'wenquanyi zen hei'
-    ]
-
-    for name in match_candidates:
-        try:
-            path = pygame.font.match_font(name)
-            if path:
-                game_font = pygame.font.Font(path, 60)
-                score_font = pygame.font.Font(path, 30)
-                return game_font, score_font
-        except Exception:
-            continue
-
-    # 3) 系统常见中文字体候选（跨平台）使用 SysFont 名称
-    candidates = [
-        # Windows
-        'Microsoft YaHei', 'msyh', 'SimHei', 'SimSun', 'DengXian',
-        # macOS
-        'PingFang SC', 'Heiti SC', 'STHeiti', 'Hiragino Sans GB',
-        # Linux / 通用
-        'Noto Sans CJK SC', 'Source Han Sans CN', 'WenQuanYi Zen Hei', 'Noto Sans CJK',
-        # 英文字体中包含全字库的（有时可用）
-        'Arial Unicode MS'
-    ]
-
-    for name in candidates:
-        try:
-            # SysFont 会在找不到时降级，但这里我们只要能成功创建就算可用
-            game_font = pygame.font.SysFont(name, 60)
-            score_font = pygame.font.SysFont(name, 30)
-            if game_font and score_font:
-                return game_font, score_font
-        except Exception:
-            continue
-
-    # 4) 兜底：Arial（可能无法显示中文，会出现方块）
-    return (
-        pygame.font.SysFont('arial', 60, bold=True),
-        pygame.font.SysFont('arial', 30)
-    )
+    source = FontSource(os.path.join(base_dir, 'assets', 'fonts'), FONT_CACHE_PATH)
+    return source.font(60, bold=True), source.font(30)
 
 # --- 字体设置 ---
 GAME_FONT, SCORE_FONT = load_fonts()
+OVERLAY_FONT = GAME_FONT.source.font(16)  # 性能浮层用的小字号（同样延迟加载）
+# 文字表面缓存：目标、HUD、菜单共用，避免每帧重复光栅化
+TEXT_CACHE = TextCache(max_entries=512)
+# 目标文字的字形图集：每种颜色一张，已打出的部分取自灰色图集；所有目标每帧一次 blits 画完
+GLYPHS = GlyphAtlasBank(GAME_FONT)
+DONE_COLOR = (200, 200, 200)
+IMPORT_DONE = time.perf_counter()
 
 # --- 游戏数据 ---
-# 第一关：认识字母（大写）
-LEVEL_1 = list("ABCDEFGHIJKLMNOPQRSTUVWXYZ")
-# 第二关：认识字母（小写）
-LEVEL_2 = list("abcdefghijklmnopqrstuvwxyz")
-# 第三关：简单拼音（声母+韵母）
-LEVEL_3 = ["ba", "bo", "ma", "fo", "de", "te", "ni", "le", "ge", "ke", "he"]
-
-class Target:
-    def __init__(self, text, speed):
-        self.text = text
-        self.color = random.choice(COLORS)
-        self.x = random.randint(50, WIDTH - 100)
-        self.y = -50
-        self.speed = speed
-        self.completed_part = "" # 已经打出的部分 (用于拼音模式)
+# 关卡来自关卡包（默认：1 大写字母、2 小写字母、3 拼音），见 engine/levels.py。
+# 第一次用到时才加载（可能写入编译缓存），导入本模块时不读写任何文件
+_LEVEL_PACK = None
+
+def level_pack():
+    """当前关卡包（LevelPack），第一次调用时加载。"""
+    global _LEVEL_PACK
+    if _LEVEL_PACK is None:
+        _LEVEL_PACK = load_pack(LEVEL_PACK_PATH, LEVEL_CACHE_DIR)
+    return _LEVEL_PACK
+
+def __getattr__(name):
+    # 兼容模块级的 LEVEL_PACK / LEVELS / LEVEL_1..3：访问时才加载关卡包
+    if name == 'LEVEL_PACK':
+        return level_pack()
+    if name == 'LEVELS':
+        return level_pack().items()
+    if name in ('LEVEL_1', 'LEVEL_2', 'LEVEL_3'):
+        return level_pack().items().get(int(name[-1]), [])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# 菜单上“最近 N 次”统计可切换的窗口
+RECENT_OPTIONS = (5, 10, 30)
+
+def load_scores(path):
+    """读取成绩记录（.sqlite3/.bin/.csv），返回按时间顺序排列的字典列表；读取失败时返回已读到的部分。"""
+    rows = []
+    try:
+        for rec in read_sessions(path):
+            rows.append(rec._asdict())
+    except Exception:
+        pass
+    return rows
+
+def compute_stats(rows, n):
+    """{level: {'best': 历史最佳, 'recent_avg': 最近 n 次平均}}；rows 为按时间顺序的成绩记录。"""
+    return StatsEngine.from_rows(rows, windows=(n,)).stats(n)
+
+def session_record(level:int, final_score:int, start_ts:float, end_ts:float=None):
+    """一局成绩的 SessionRecord（不写盘）。"""
+    end_ts = end_ts or time.time()
+    duration = max(0, int(end_ts - (start_ts or end_ts)))
+    completed = max(0, final_score // 10)
+    timestamp = datetime.fromtimestamp(end_ts).isoformat(timespec='seconds')
+    return make_record(level, final_score, duration, completed, timestamp, mode=level_pack().display_name(level))
+
+def save_session(store, level:int, final_score:int, start_ts:float, end_ts:float=None):
+    """把一局成绩追加到 store。记录失败时返回 False，不抛出异常（不因记录失败中断游戏）。"""
+    try:
+        store.append(session_record(level, final_score, start_ts, end_ts))
+        return True
+    except Exception:
+        return False
+
+def draw_targets(renderer, items):
+    """用一次 blits 画出 items（[(text, color, x, y, done), ...]，done 为已打出的字符数）。
+
+    已打出的字符用灰色显示进度（针对拼音）；各目标区域交给 renderer 供脏矩形渲染使用。
+    """
+    seq, rects = GLYPHS.batch(items, DONE_COLOR)
+    renderer.draw_batch(seq, rects)
+
+def draw_target(surface, text, color, x, y, done):
+    """绘制一个目标，返回占用的屏幕区域。"""
+    seq, rects = GLYPHS.batch(((text, color, x, y, done),), DONE_COLOR)
+    surface.blits(seq, False)
+    return surface.get_rect().clip(rects[0])
+
+class Target(PooledTarget):
+    """单个下落目标。数据存放在 TargetPool 的数组里，这里只是带 __slots__ 的外观对象。"""
+    __slots__ = ()
+    palette = COLORS
+
+    def __init__(self, text, speed, born=0.0):
+        super().__init__(text, speed,
+                         x=random.randint(50, WIDTH - 100), y=-50,
+                         color_id=random.randrange(len(COLORS)), born=born)
 
     def draw(self, surface):
-        # 渲染未完成的部分
-        full_surf = GAME_FONT.render(self.text, True, self.color)
-        surface.blit(full_surf, (self.x, self.y))
-        
-        # 如果打对了一部分，用灰色覆盖显示进度（针对拼音）
-        if self.completed_part:
-            comp_surf = GAME_FONT.render(self.completed_part, True, (200, 200, 200))
-            surface.blit(comp_surf, (self.x, self.y))
-
-    def move(self):
-        self.y += self.speed
+        return draw_target(surface, self.text, self.color, self.x, self.y, len(self.completed_part))
 
-def main():
-    clock = pygame.time.Clock()
-    score = 0
-    game_state = "MENU" # MENU, PLAY, GAMEOVER
-    current_level = 1
-    session_active = False
-    session_start_ts = None
-    
-    targets = []
-    spawn_timer = 0
-    
-    # 难度控制
-    speed = 1.0
-    spawn_rate = 120 # 帧数
-
-    # 进度记录
-    base_dir = os.path.dirname(os.path.abspath(__file__))
-    data_dir = os.path.join(base_dir, 'data')
-    os.makedirs(data_dir, exist_ok=True)
-    scores_csv = os.path.join(data_dir, 'scores.csv')
 
-    def save_session(level:int, final_score:int, start_ts:float):
+def init_display(headless=False, vsync=False):
+    """初始化 pygame 并创建游戏窗口，返回屏幕 Surface。headless=True 时使用 SDL dummy 驱动（无窗口）。"""
+    if headless:
+        use_dummy_drivers()
+    pygame.init()
+    screen = None
+    if vsync and not headless:
         try:
-            duration = max(0, int(time.time() - (start_ts or time.time())))
-            completed = max(0, final_score // 10)
-            mode_name = {1: '大写字母', 2: '小写字母', 3: '拼音'}[level]
-            is_new = not os.path.exists(scores_csv)
-            with open(scores_csv, 'a', newline='', encoding='utf-8-sig') as f:
-                writer = csv.writer(f)
-                if is_new:
-                    writer.writerow(['timestamp', 'level', 'mode', 'score', 'duration_sec', 'completed'])
-                writer.writerow([datetime.now().isoformat(timespec='seconds'), level, mode_name, final_score, duration, completed])
-        except Exception:
-            # 不因记录失败中断游戏
-            pass
-
-    recent_options = [5, 10, 30]
-    recent_idx = 0
-    recent_n = recent_options[recent_idx]
-
-    def load_scores():
-        rows = []
-        if not os.path.exists(scores_csv):
-            return rows
+            # pygame 2 只在 SCALED/OPENGL 窗口上支持 vsync
+            screen = pygame.display.set_mode((WIDTH, HEIGHT), pygame.SCALED, vsync=1)
+        except pygame.error:
+            screen = None
+    if screen is None:
+        screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    pygame.display.set_caption(CAPTION)
+    return screen
+
+class Game:
+    """游戏对象：构造时不做任何初始化，init() 打开窗口、存储和后台任务，run() 运行主循环，close() 释放资源。
+
+    - data_dir：成绩记录目录（默认项目下的 data/）；各学习者档案的成绩在其中分区存放（见 engine/profiles.py）
+    - profile：启动时使用的档案（None 表示上次使用的档案）
+    - stress_targets：压力测试时练习界面保持的目标数量（0 表示正常游戏）
+    - render_fps：渲染帧率上限（见 RENDER_FPS）
+    - telemetry_port：本机遥测端口（见 TELEMETRY_PORT，None 表示不启用）
+
+    游戏逻辑（生成、移动）以固定步长 1/SIM_HZ 秒运行，速度单位是像素/秒，生成间隔单位是秒；
+    渲染帧率变化（卡顿、不限帧率、vsync）不影响游戏速度与得分。
+    主循环是 asyncio 协程（run_async），成绩写盘与遥测在同一事件循环中进行，不阻塞画面。
+    """
+
+    def __init__(self, data_dir=None, stress_targets=STRESS_TARGETS, render_mode=RENDER_MODE,
+                 store_backend=STORE_BACKEND, render_fps=RENDER_FPS, profile=None, telemetry_port=TELEMETRY_PORT):
+        self.base_dir = os.path.dirname(os.path.abspath(__file__))
+        self.data_dir = data_dir or os.path.join(self.base_dir, 'data')
+        self.initial_profile = profile
+        self.profile_name = None
+        self.profile_dir = None
+        self.store = None
+        self.stress_targets = stress_targets
+        self.render_mode = render_mode
+        self.store_backend = store_backend
+        self.vsync = str(render_fps) == 'vsync'
+        self.fps_cap = 0 if self.vsync else int(render_fps or 0)
+        self.telemetry_port = telemetry_port
+        self.timestep = FixedTimestep(SIM_HZ)
+        self.screen = None
+        self.prof = NULL_PROFILER
+        self.live_prof = None  # 浮层/录制使用的 LiveProfiler，第一次按 F3/F4/F5 时创建
+        self.overlay = False
+        self.overlay_surf = None
+        self.overlay_age = 0.0
+        self.running = False
+
+        self.score = 0
+        self.game_state = "MENU" # MENU, PLAY, GAMEOVER
+        self.current_level = 1
+        self.session_active = False
+        self.session_start_ts = None
+
+        self.targets = TargetPool(COLORS)
+        self.spawn_timer = 0.0
+
+        # 难度控制：speed/spawn_interval 为关卡包中当前关卡的基础值；启用自适应难度时由 difficulty 按关卡调整，
+        # 关卡包的速度曲线再按本局进行的时间乘上倍数
+        # 关卡包在 init() 中加载
+        self.pack = None
+        self.level = None
+        self.speed = 0.0 # 像素/秒
+        self.spawn_interval = 0.0 # 秒
+        self.adaptive = ADAPTIVE_DIFFICULTY and not stress_targets
+        self.difficulty = None
+        self.difficulty_by_level = {}
+        self.sim_time = 0.0  # 本局已模拟的时间（秒），用于计算反应时间
+        self.last_key_time = 0.0
+
+        self.recent_idx = 0
+        self.recent_n = RECENT_OPTIONS[self.recent_idx]
+
+        # --- 菜单按钮与动作 ---
+        self.last_message = ""
+        self.last_message_ttl = 0.0  # 剩余显示秒数，>0 时显示消息
+        # 菜单画面缓存：只在统计、最近 N 次或提示消息变化时重建
+        self.menu_layer = None
+        self.menu_buttons = []
+        self.drawn_state = None
+
+    def init(self, headless=False):
+        """初始化 pygame、创建窗口并打开成绩存储。headless=True 时使用 SDL dummy 驱动（无窗口）。"""
+        self._init_t0 = time.perf_counter()
+        self.screen = init_display(headless, self.vsync)
+        self.renderer = Renderer(self.screen, BG_COLOR, self.render_mode)
+
+        # 关卡包：菜单按钮与数字快捷键随关卡增加
+        self.pack = level_pack()
+        self.level = self.pack[self.pack.ids()[0]]
+        self.speed = self.level.base_speed
+        self.spawn_interval = self.level.spawn_interval
+        self.menu_keys = {**{pygame.K_0 + lid: f'START_{lid}' for lid in self.pack.ids() if 1 <= lid <= 9},
+                          **self.MENU_KEYS}
+
+        # --- 报表任务（后台线程执行，不阻塞画面） ---
+        tools_dir = os.path.join(self.base_dir, 'tools')
+        if tools_dir not in sys.path:
+            sys.path.append(tools_dir)
+        self.jobs = JobRunner(process_paths=[self.base_dir, tools_dir])
+        # 成绩与逐键记录的后写队列：游戏线程只入队，写盘在后台线程中批量进行
+        self.writer = WriteBehind(PERSIST_DELAY)
+
+        # 逐键记录（压力测试时不记录）：每局结束追加到成绩文件旁的 keystrokes.bin
+        self.recorder = None if self.stress_targets else KeystrokeRecorder()
+        self._fallen = [] if self.recorder is not None else None
+
+        # 进度记录：打开当前学习者档案
+        os.makedirs(self.data_dir, exist_ok=True)
+        self.profiles = ProfileRegistry(self.data_dir)
+        self.open_profile(self.initial_profile or self.profiles.active())
+        return self
+
+    def open_profile(self, name):
+        """切换到档案 name：关闭上一个档案的存储，只读取新档案的最佳分与最近几局。"""
+        if self.store is not None:
+            # 上一个档案还没写出的记录先写完
+            self.writer.flush()
+            self.store.close()
+        self.profile_name = name
+        self.profile_dir = self.profiles.path(name)
+        os.makedirs(self.profile_dir, exist_ok=True)
+        self.store = open_game_store(self.profile_dir, self.store_backend)
+        self.scores_path = self.store.path
+        # 只按索引读取最佳分与最近几局，之后每局结束增量更新（菜单不再每帧扫描全部历史）
+        self.stats = StatsEngine.from_store(self.store, levels=self.pack.ids(), windows=RECENT_OPTIONS)
+        self.keylog = KeystrokeLog(keylog_path(self.profile_dir))
+        # 难度与出题权重都跟随学习者
+        self.difficulty_by_level = {}
+        # 按弱项加权出题：后台读取最近的逐键记录，算好之前（或没有记录时）均匀随机出题
+        self.samplers = {}
+        self.refresh_samplers()
+        self.invalidate_menu()
+
+    def switch_profile(self, name=None):
+        """切换到 name（默认为下一个档案）并记住选择。"""
+        name = name or self.profiles.next_name(self.profile_name)
+        if name == self.profile_name:
+            return
+        self.open_profile(name)
+        self.profiles.set_active(name)
+        self.set_message(f"当前学习者：{name}")
+
+    def close(self):
+        self.jobs.shutdown()
+        self.writer.close()
+        self.store.close()
+
+    # --- 对局 ---
+    def start_level(self, level):
+        self.current_level = level
+        self.level = self.pack[level]
+        # 本关用到的字符在开始前光栅化好，练习中只从图集取字形
+        GLYPHS.prepare(COLORS + [DONE_COLOR], ''.join(self.level.items))
+        self.speed = self.level.base_speed
+        self.spawn_interval = self.level.spawn_interval
+        self.targets.clear()
+        self.score = 0
+        self.session_active = True
+        self.session_start_ts = time.time()
+        self.spawn_timer = 0.0
+        self.sim_time = 0.0
+        self.last_key_time = 0.0
+        self.timestep.reset()
+        if self.recorder is not None:
+            self.recorder.begin()
+        if self.adaptive:
+            # 同一关卡在本次运行中延续上一局结束时的难度
+            self.difficulty = self.difficulty_by_level.get(level)
+            if self.difficulty is None:
+                self.difficulty = self.difficulty_by_level[level] = DifficultyEngine(
+                    base_speed=self.speed, base_interval=self.spawn_interval, fall_distance=HEIGHT + 50)
+        self.game_state = "PLAY"
+
+    def finish_session(self):
+        end_ts = time.time()
+        # 这里只入队，写盘在后台写入线程中进行，按键到画面的延迟不包含磁盘 I/O
+        self.writer.add_session(self.store, session_record(self.current_level, self.score,
+                                                           self.session_start_ts, end_ts))
+        if self.recorder is not None:
+            if len(self.recorder):
+                # 逐键记录与成绩记录用同一个结束时间关联；编码要在下一局复用 recorder 之前完成
+                self.writer.add_keylog(self.keylog, self.recorder.encode(self.current_level, end_ts))
+            self.refresh_samplers()
+        self.stats.add(self.current_level, self.score)
+        self.session_active = False
+        self.invalidate_menu()
+
+    # --- 菜单 ---
+    def invalidate_menu(self):
+        self.menu_layer = None
+        self.renderer.invalidate()
+
+    def set_message(self, text: str, ttl: float = 3.0):
+        self.last_message = text
+        self.last_message_ttl = ttl
+        self.invalidate_menu()
+
+    def cycle_recent(self):
+        # 切换“最近 N 次”统计窗口
+        self.recent_idx = (self.recent_idx + 1) % len(RECENT_OPTIONS)
+        self.recent_n = RECENT_OPTIONS[self.recent_idx]
+        self.invalidate_menu()
+
+    def menu_action(self, action):
+        if action.startswith('START_'):
+            self.start_level(int(action[6:]))
+        elif action == 'TOGGLE_RECENT':
+            self.cycle_recent()
+        elif action == 'NEXT_PROFILE':
+            self.switch_profile()
+        elif action == 'EXPORT_WEEKLY':
+            self.export_report('weekly')
+        elif action == 'EXPORT_MONTHLY':
+            self.export_report('monthly')
+        elif action == 'VIEW_REPORT':
+            self.build_and_open_html_report(self.recent_n)
+        elif action == 'CANCEL_JOBS':
+            # 取消正在进行的报表任务（出题权重的计算不受影响）
+            if self.jobs.cancel(match=lambda key: not key.startswith(SAMPLER_JOB)):
+                self.set_message("正在取消报表任务…")
+
+    # --- 出题权重 ---
+    def refresh_samplers(self):
+        if self.recorder is None or not analytics.available:
+            return
+        key = SAMPLER_JOB + self.profile_name
+        # 只取消其他档案的过期计算；当前档案的计算进行中时，结束后再补算一次（包含刚结束的一局）
+        self.jobs.cancel(match=lambda k: k.startswith(SAMPLER_JOB) and k != key)
+        self.jobs.submit(key, self.samplers_job, self.profile_name, self.keylog.path, requeue=True)
+
+    def samplers_job(self, job, profile, path):
+        self.writer.flush()  # 包含刚结束的一局
+        base = {lid: lv.weight_map() for lid, lv in self.pack.levels.items()}
+        samplers = analytics.level_samplers(path, self.pack.items(), base_weights=base)
+        job.check()
+        # 计算期间已切换到其他档案时丢弃结果
+        if profile == self.profile_name:
+            self.samplers = samplers
+
+    # --- 报表任务 ---
+    @staticmethod
+    def use_process_pool(scores_path):
+        # 历史很长时把计算交给子进程，避免与渲染线程争抢 GIL
         try:
-            with open(scores_csv, 'r', encoding='utf-8-sig') as f:
-                reader = csv.DictReader(f)
-                for r in reader:
-                    try:
-                        rows.append({
-                            'timestamp': r.get('timestamp',''),
-                            'level': int(r.get('level', '0') or 0),
-                            'mode': r.get('mode',''),
-                            'score': int(r.get('score','0') or 0),
-                            'duration_sec': int(r.get('duration_sec','0') or 0),
-                            'completed': int(r.get('completed','0') or 0),
-                        })
-                    except Exception:
-                        continue
-        except Exception:
-            pass
-        return rows
-
-    def compute_stats(rows, n):
-        stats = {}
-        for lvl in (1,2,3):
-            lv_rows = [r for r in rows if r['level']==lvl]
-            if not lv_rows:
-                stats[lvl] = {'best': 0, 'recent_avg': 0}
+            return os.path.getsize(scores_path) >= PROCESS_POOL_MIN_BYTES
+        except OSError:
+            return False
+
+    # 报表任务在提交时固定成绩与输出路径，生成期间切换档案不影响结果
+    def export_job(self, job, period, scores_path, out_dir):
+        export_report_mod = importlib.import_module('export_report')
+        name = '周报' if period == 'weekly' else '月报'
+        out_path = os.path.join(out_dir, f'report_{"weekly" if period=="weekly" else "monthly"}.csv')
+        job.progress(f"正在导出{name}…")
+        self.writer.flush()  # 报表包含还在写入队列中的成绩
+        # 增量导出：只累加上次导出之后新增的成绩
+        if self.use_process_pool(scores_path):
+            rows = job.run_in_process(export_report_mod.export_incremental, scores_path, period, out_path)
+        else:
+            rows = export_report_mod.export_incremental(scores_path, period, out_path)
+        if rows is None:
+            return f"{name}没有变化：{out_path}"
+        return f"已导出{name}到 {out_path}"
+
+    def html_report_job(self, job, recent_count, scores_path, out_dir):
+        viz = importlib.import_module('visualize_report')
+        out_path = os.path.join(out_dir, 'report.html')
+        job.progress("正在生成学习报告…")
+        self.writer.flush()
+        if self.use_process_pool(scores_path):
+            job.run_in_process(viz.write_report, scores_path, out_path, recent_count)
+        else:
+            viz.write_report(scores_path, out_path, recent_count)
+        job.check()
+        opened = webbrowser.open('file://' + out_path)
+        return "已生成并尝试打开报告" + ("" if opened else f"（请手动打开 {out_path}）")
+
+    def report_lane(self):
+        # 同一档案的报表任务共用检查点与报表缓存索引，按提交顺序逐个运行
+        return REPORT_LANE + self.profile_name
+
+    def export_report(self, period: str):
+        # 同一档案的同一报表正在生成或排队时，重复点击会被合并
+        if not self.jobs.submit(f'export:{period}:{self.profile_name}', self.export_job, period,
+                                self.scores_path, self.profile_dir, lane=self.report_lane(),
+                                error_message="导出失败，请稍后再试", cancelled_message="已取消导出"):
+            self.set_message("正在导出，请稍候…")
+
+    def build_and_open_html_report(self, recent_count: int = 30):
+        if not self.jobs.submit(f'report:html:{self.profile_name}', self.html_report_job, recent_count,
+                                self.scores_path, self.profile_dir, lane=self.report_lane(),
+                                error_message="生成报告失败，请稍后再试", cancelled_message="已取消生成报告"):
+            self.set_message("正在生成报告，请稍候…")
+
+    def build_menu_layer(self):
+        """把整个菜单画到一张离屏 Surface 上，返回 (画面, 按钮列表)。"""
+        layer = pygame.Surface((WIDTH, HEIGHT)).convert()
+        layer.fill(BG_COLOR)
+        stats = self.stats
+        recent_n = self.recent_n
+
+        # UI 常量
+        PANEL_BG = (250, 252, 255)
+        PANEL_BORDER = (210, 220, 230)
+
+        def draw_panel(x, y, w, h, title_text=None):
+            rect = pygame.Rect(x, y, w, h)
+            pygame.draw.rect(layer, PANEL_BG, rect, border_radius=12)
+            pygame.draw.rect(layer, PANEL_BORDER, rect, width=2, border_radius=12)
+            if title_text:
+                title = TEXT_CACHE.render(SCORE_FONT, title_text, (70, 70, 70))
+                layer.blit(title, (x + 12, y + 8))
+            return rect
+
+        def draw_button(text, x, y, action, center=False):
+            surf = TEXT_CACHE.render(SCORE_FONT, text, (30, 30, 30))
+            padding_x, padding_y = 16, 8
+            rect = pygame.Rect(0, 0, surf.get_width() + padding_x * 2, surf.get_height() + padding_y * 2)
+            if center:
+                rect.centerx = x
+                rect.y = y
             else:
-                best = max(r['score'] for r in lv_rows)
-                recent = lv_rows[-n:]
-                if recent:
-                    avg = int(sum(r['score'] for r in recent)/len(recent))
-                else:
-                    avg = 0
-                stats[lvl] = {'best': best, 'recent_avg': avg}
-        return stats
-
-    cached_rows = load_scores()
-    # 菜单渲染时动态计算，确保按 T 切换生效
-
-    # --- 菜单按钮与动作 ---
-    last_message = ""
-    last_message_ttl = 0  # 帧计数，>0 时显示消息
-
-    def set_message(text: str, ttl_frames: int = 180):
-        nonlocal last_message, last_message_ttl
-        last_message = text
-        last_message_ttl = ttl_frames
-
-    def export_report(period: str):
-        try:
-            sys.path.append(os.path.join(base_dir, 'tools'))
-            export_report_mod = importlib.import_module('export_report')
-            rows = export_report_mod.read_rows(scores_csv)
-            agg = export_report_mod.aggregate(rows, period)
-            out_path = os.path.join(data_dir, f'report_{"weekly" if period=="weekly" else "monthly"}.csv')
-            export_report_mod.write_csv(agg, out_path)
-            set_message(f"已导出{ '周报' if period=='weekly' else '月报' }到 {out_path}")
-        except Exception:
-            set_message("导出失败，请稍后再试")
-
-    def build_and_open_html_report(recent_count: int = 30):
-        try:
-            sys.path.append(os.path.join(base_dir, 'tools'))
-            viz = importlib.import_module('visualize_report')
-            rows = viz.read_rows(scores_csv)
-            mode_rows = viz.group_by_mode(rows)
-            html = viz.build_html(mode_rows, recent=recent_count)
-            out_path = os.path.join(data_dir, 'report.html')
-            with open(out_path, 'w', encoding='utf-8') as f:
-                f.write(html)
-            opened = webbrowser.open('file://' + out_path)
-            set_message("已生成并尝试打开报告" + ("" if opened else "（请手动打开 data/report.html）"))
-        except Exception:
-            set_message("生成报告失败，请稍后再试")
-
-    running = True
-    while running:
-        screen.fill(BG_COLOR)
-        
-        # --- 事件处理 ---
+                rect.x = x
+                rect.y = y
+            pygame.draw.rect(layer, (255, 255, 255), rect, border_radius=8)
+            pygame.draw.rect(layer, PANEL_BORDER, rect, width=2, border_radius=8)
+            layer.blit(surf, (rect.x + padding_x, rect.y + padding_y))
+            buttons.append((rect, action))
+
+        # 标题
+        title_surf = TEXT_CACHE.render(GAME_FONT, "彩虹打字大冒险", COLORS[0])
+        layer.blit(title_surf, (WIDTH//2 - title_surf.get_width()//2, 50))
+
+        # 操作反馈提示（标题下方）
+        if self.last_message_ttl > 0 and self.last_message:
+            msg = TEXT_CACHE.render(SCORE_FONT, self.last_message, (60, 120, 60))
+            layer.blit(msg, (WIDTH//2 - msg.get_width()//2, 120))
+
+        buttons = []
+
+        # 左侧：开始面板
+        left_x, left_y, left_w, left_h = 60, 150, 360, 330
+        draw_panel(left_x, left_y, left_w, left_h, "开始练习")
+        btn_y = left_y + 60
+        level_ids = self.pack.ids()
+        vspace = 68 * 3 // max(3, len(level_ids))
+        for i, lid in enumerate(level_ids):
+            draw_button(f"开始：{self.pack[lid].name}", left_x + 20, btn_y + vspace * i, f'START_{lid}')
+        draw_button(f"学习者：{self.profile_name}（切换）", left_x + 20, btn_y + vspace * len(level_ids), 'NEXT_PROFILE')
+
+        # 右侧：统计面板
+        right_x, right_y, right_w = 460, 150, 280
+        stat_h = 170
+        draw_panel(right_x, right_y, right_w, stat_h, "统计（按 T 也可切换）")
+        def stat_line(lvl):
+            return f"最佳 {stats.best(lvl)}｜最近{recent_n}次 {stats.recent_avg(lvl, recent_n)}"
+        # 面板只放得下前三个关卡的统计
+        for i, lid in enumerate(level_ids[:3]):
+            line = TEXT_CACHE.render(SCORE_FONT, f"{self.pack[lid].short}：" + stat_line(lid), (80, 80, 80))
+            layer.blit(line, (right_x + 16, right_y + 50 + 40 * i))
+        draw_button(f"切换统计：最近{recent_n}次", right_x + 16, right_y + stat_h - 54, 'TOGGLE_RECENT')
+
+        # 右下：报表与报告
+        rep_y = right_y + stat_h + 20
+        rep_h = 180
+        draw_panel(right_x, rep_y, right_w, rep_h, "报表与报告")
+        draw_button("导出周报 CSV", right_x + 16, rep_y + 50, 'EXPORT_WEEKLY')
+        draw_button("导出月报 CSV", right_x + 16, rep_y + 50 + 48, 'EXPORT_MONTHLY')
+        draw_button("查看学习报告", right_x + 16, rep_y + 50 + 96, 'VIEW_REPORT')
+
+        # 底部提示
+        start_keys = '/'.join(str(lid) for lid in level_ids if 1 <= lid <= 9)
+        tip = TEXT_CACHE.render(SCORE_FONT, f"快捷键：{start_keys} 开始 · P 学习者 · T 统计 · E/M 导出 · V 报告 · C 取消", (120, 120, 120))
+        layer.blit(tip, (WIDTH//2 - tip.get_width()//2, HEIGHT - 50))
+        return layer, buttons
+
+    # --- 性能浮层与录制 ---
+    def _live_profiler(self):
+        """启用 LiveProfiler；外部传入了其它 profiler（如基准测试）时返回 None。"""
+        if self.prof is NULL_PROFILER:
+            self.live_prof = self.live_prof or LiveProfiler()
+            self.prof = self.live_prof
+        return self.prof if self.prof is self.live_prof else None
+
+    def _release_profiler(self):
+        # 浮层关闭且录制结束后换回 NULL_PROFILER
+        live = self.live_prof
+        if live is not None and self.prof is live and not self.overlay and not live.capturing:
+            self.prof = NULL_PROFILER
+
+    def toggle_overlay(self):
+        if self.overlay:
+            self.overlay = False
+            self._release_profiler()
+        elif self._live_profiler() is not None:
+            self.overlay = True
+            self.overlay_surf = None
+        self.invalidate_menu()
+
+    def start_capture(self, kind):
+        live = self._live_profiler()
+        if live is None:
+            return
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        if kind == 'trace':
+            path = os.path.join(self.data_dir, 'traces', f'trace-{stamp}.json')
+            started = live.start_trace(path, CAPTURE_FRAMES)
+        else:
+            path = os.path.join(self.data_dir, 'traces', f'profile-{stamp}.prof')
+            started = live.start_cprofile(path, CAPTURE_FRAMES)
+        self.set_message(f"正在录制 {CAPTURE_FRAMES} 帧…" if started else "正在录制中，请稍候…")
+
+    PROFILER_KEYS = {
+        pygame.K_F3: toggle_overlay,
+        pygame.K_F4: lambda self: self.start_capture('trace'),
+        pygame.K_F5: lambda self: self.start_capture('cprofile'),
+    }
+
+    def overlay_lines(self):
+        live = self.live_prof
+        st = live.live_stats()
+        glyphs = GLYPHS.stats()
+        return [
+            f"FPS {st['fps']:.0f}  p50 {st['p50_ms']:.1f}ms  p99 {st['p99_ms']:.1f}ms",
+            f"字形图集命中 {glyphs['hit_rate']:.1%}（{glyphs['glyphs']} 字 × {glyphs['colors']} 色）",
+            f"文字缓存命中 {TEXT_CACHE.hit_rate:.1%}（{len(TEXT_CACHE)} 项，HUD/菜单）",
+            f"目标 {len(self.targets)}" + ("  录制中" if live.capturing else ""),
+        ]
+
+    def draw_overlay(self, elapsed):
+        """画性能浮层。文字每 OVERLAY_REFRESH 秒才重新渲染一次，且不经过 TEXT_CACHE（不影响命中率统计）。"""
+        self.overlay_age += elapsed
+        if self.overlay_surf is None or self.overlay_age >= OVERLAY_REFRESH:
+            self.overlay_age = 0.0
+            lines = [OVERLAY_FONT.render(text, True, WHITE) for text in self.overlay_lines()]
+            w = max(l.get_width() for l in lines) + 16
+            h = sum(l.get_height() for l in lines) + 12
+            surf = pygame.Surface((w, h)).convert()
+            surf.fill((40, 40, 40))
+            y = 6
+            for l in lines:
+                surf.blit(l, (8, y))
+                y += l.get_height()
+            self.overlay_surf = surf
+            if self.game_state == "MENU":
+                # 菜单是静态画面：浮层更新时整屏重画一次
+                self.renderer.invalidate()
+        pos = (WIDTH - self.overlay_surf.get_width() - 8, HEIGHT - self.overlay_surf.get_height() - 8)
+        if self.game_state == "MENU":
+            if self.renderer.needs_full_redraw:
+                self.screen.blit(self.overlay_surf, pos)
+        else:
+            self.renderer.draw(self.overlay_surf, pos)
+
+    # --- 事件处理 ---
+    # 数字键开始对应关卡，在 init() 中按关卡包补上（self.menu_keys）
+    MENU_KEYS = {
+        pygame.K_t: 'TOGGLE_RECENT', pygame.K_e: 'EXPORT_WEEKLY', pygame.K_m: 'EXPORT_MONTHLY',
+        pygame.K_v: 'VIEW_REPORT', pygame.K_c: 'CANCEL_JOBS', pygame.K_p: 'NEXT_PROFILE',
+    }
+
+    def handle_event(self, event):
+        if event.type == pygame.QUIT:
+            # 关闭前保存当前局成绩
+            if self.game_state == "PLAY" and self.session_active:
+                self.finish_session()
+            self.running = False
+
+        elif event.type == pygame.KEYDOWN and event.key in self.PROFILER_KEYS:
+            self.PROFILER_KEYS[event.key](self)
+
+        elif event.type == pygame.KEYDOWN:
+            if self.game_state == "MENU":
+                action = self.menu_keys.get(event.key)
+                if action:
+                    self.menu_action(action)
+            elif self.game_state == "PLAY":
+                self.handle_play_key(event)
+
+        elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1 and self.game_state == "MENU":
+            for rect, action in self.menu_buttons:
+                if rect.collidepoint(event.pos):
+                    self.menu_action(action)
+                    break
+
+    def handle_play_key(self, event):
+        if event.key == pygame.K_ESCAPE:
+            # 返回菜单并保存成绩
+            if self.session_active:
+                self.finish_session()
+            self.game_state = "MENU"
+            return
+        char = event.unicode
+        if not char or not self.targets:
+            return
+        # 按键交给屏幕上任意一个能接上的目标（优先继续正在打的目标，忽略大小写差异，对一年级友好）；
+        # 都接不上时算按错，记在正在打的目标（没有时为最靠下的目标）上
+        target = self.targets.press(char)
+        hit = target is not None
+        if hit:
+            done = len(target.completed_part)
+            needed_char = target.text[done - 1]
+        else:
+            target = self.targets.engaged()
+            needed_char = target.text[len(target.completed_part)]
+        if self.recorder is not None:
+            # 反应时间：从目标出现或上一次按键（取较晚者）到本次按键
+            react = self.sim_time - max(target.born, self.last_key_time)
+            self.recorder.record(int(self.sim_time * 1000), target.text, needed_char, char, hit, int(react * 1000))
+        self.last_key_time = self.sim_time
+        if hit:
+            # 播放音效占位 print("Ding!")
+            if done == len(target.text):
+                self.score += 10
+                self.targets.discard(target)
+                if self.difficulty is not None:
+                    self.difficulty.hit(self.sim_time - target.born)
+
+    # --- 每帧 ---
+    def spawn(self, dt):
+        # 生成目标（按模拟时间计时）
+        difficulty = self.difficulty
+        speed = (difficulty.speed if difficulty is not None else self.speed) * self.level.speed_factor(self.sim_time)
+        interval = difficulty.spawn_interval if difficulty is not None else self.spawn_interval
+        self.spawn_timer += dt
+        if self.spawn_timer >= interval:
+            self.spawn_timer -= interval
+            # 有逐键记录时按弱项加权出题（正确率低、反应慢的字母/音节出现得更多）
+            sampler = self.samplers.get(self.current_level)
+            txt = sampler.choice() if sampler is not None else self.level.choice()
+            self.targets.add(Target(txt, speed, self.sim_time))
+        # 压力测试：补足目标数量。首次铺满整个屏幕，之后从屏幕上方补充
+        stress_targets = self.stress_targets
+        targets = self.targets
+        if stress_targets and len(targets) < stress_targets:
+            pool = self.level.items
+            lo, hi = (-50, HEIGHT) if not targets else (-HEIGHT, -50)
+            ys = sorted((random.randint(lo, hi) for _ in range(stress_targets - len(targets))), reverse=True)
+            # 按 y 降序直接写入目标池，每次都落在队尾，也不创建 Target 对象
+            for y in ys:
+                targets.spawn(random.choice(pool), self.speed, random.randint(50, WIDTH - 100), y,
+                              random.randrange(len(COLORS)))
+
+    def step(self, elapsed):
+        """运行一帧：事件处理、后台任务消息、按 elapsed（秒）推进固定步长模拟、绘制与显示。"""
+        prof = self.prof
+        renderer = self.renderer
+        screen = self.screen
         for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                # 关闭前保存当前局成绩
-                if game_state == "PLAY" and session_active:
-                    save_session(current_level, score, session_start_ts)
-                    cached_rows.append({'timestamp': datetime.now().isoformat(timespec='seconds'), 'level': current_level, 'mode': {1:'大写字母',2:'小写字母',3:'拼音'}[current_level], 'score': score, 'duration_sec': max(0,int(time.time()-(session_start_ts or time.time()))), 'completed': max(0, score//10)})
-                    cached_stats = compute_stats(cached_rows)
-                    session_active = False
-                running = False
-            
-            if event.type == pygame.KEYDOWN:
-                if game_state == "MENU":
-                    if event.key == pygame.K_1:
-                        current_level = 1
-                        targets = []
-                        score = 0
-                        session_active = True
-                        session_start_ts = time.time()
-                        game_state = "PLAY"
-                    elif event.key == pygame.K_2:
-                        current_level = 2
-                        targets = []
-                        score = 0
-                        session_active = True
-                        session_start_ts = time.time()
-                        game_state = "PLAY"
-                    elif event.key == pygame.K_3:
-                        current_level = 3
-                        targets = []
-                        score = 0
-                        session_active = True
-                        session_start_ts = time.time()
-                        game_state = "PLAY"
-                    elif event.key == pygame.K_t:
-                        # 切换“最近 N 次”统计窗口
-                        recent_idx = (recent_idx + 1) % len(recent_options)
-                        recent_n = recent_options[recent_idx]
-                    elif event.key == pygame.K_e:
-                        export_report('weekly')
-                    elif event.key == pygame.K_m:
-                        export_report('monthly')
-                    elif event.key == pygame.K_v:
-                        build_and_open_html_report(recent_n)
-                
-                elif game_state == "PLAY":
-                    if event.key == pygame.K_ESCAPE:
-                        # 返回菜单并保存成绩
-                        if session_active:
-                            save_session(current_level, score, session_start_ts)
-                            cached_rows.append({'timestamp': datetime.now().isoformat(timespec='seconds'), 'level': current_level, 'mode': {1:'大写字母',2:'小写字母',3:'拼音'}[current_level], 'score': score, 'duration_sec': max(0,int(time.time()-(session_start_ts or time.time()))), 'completed': max(0, score//10)})
-                            session_active = False
-                        game_state = "MENU"
-                        continue
-                    char = event.unicode
-                    # 寻找屏幕上最靠下的一个目标进行匹配
-                    if targets:
-                        # 找到最下面的且未完成的目标
-                        target = min(targets, key=lambda t: t.y)
-                        
-                        # 逻辑：检查按键是否匹配目标当前需要的字符
-                        needed_char = target.text[len(target.completed_part)]
-                        
-                        # 忽略大小写差异（对一年级友好）
-                        if char.lower() == needed_char.lower():
-                            target.completed_part += needed_char
-                            # 播放音效占位 print("Ding!") 
-                            
-                            if target.completed_part == target.text:
-                                score += 10
-                                targets.remove(target)
-                        
+            self.handle_event(event)
+        prof.lap('events')
+
         # --- 游戏逻辑与渲染 ---
-        if game_state == "MENU":
-            # UI 常量
-            PANEL_BG = (250, 252, 255)
-            PANEL_BORDER = (210, 220, 230)
-
-            def draw_panel(x, y, w, h, title_text=None):
-                rect = pygame.Rect(x, y, w, h)
-                pygame.draw.rect(screen, PANEL_BG, rect, border_radius=12)
-                pygame.draw.rect(screen, PANEL_BORDER, rect, width=2, border_radius=12)
-                if title_text:
-                    title = SCORE_FONT.render(title_text, True, (70, 70, 70))
-                    screen.blit(title, (x + 12, y + 8))
-                return rect
-
-            def draw_button(text, x, y, action, center=False):
-                surf = SCORE_FONT.render(text, True, (30, 30, 30))
-                padding_x, padding_y = 16, 8
-                rect = pygame.Rect(0, 0, surf.get_width() + padding_x * 2, surf.get_height() + padding_y * 2)
-                if center:
-                    rect.centerx = x
-                    rect.y = y
-                else:
-                    rect.x = x
-                    rect.y = y
-                pygame.draw.rect(screen, (255, 255, 255), rect, border_radius=8)
-                pygame.draw.rect(screen, PANEL_BORDER, rect, width=2, border_radius=8)
-                screen.blit(surf, (rect.x + padding_x, rect.y + padding_y))
-                menu_buttons.append((rect, action))
-
-            # 标题
-            title_surf = GAME_FONT.render("彩虹打字大冒险", True, COLORS[0])
-            screen.blit(title_surf, (WIDTH//2 - title_surf.get_width()//2, 50))
-
-            # 操作反馈提示（标题下方）
-            if last_message_ttl > 0 and last_message:
-                msg = SCORE_FONT.render(last_message, True, (60, 120, 60))
-                screen.blit(msg, (WIDTH//2 - msg.get_width()//2, 120))
-                last_message_ttl -= 1
-
-            menu_buttons = []
-
-            # 左侧：开始面板
-            left_x, left_y, left_w, left_h = 60, 150, 360, 260
-            draw_panel(left_x, left_y, left_w, left_h, "开始练习")
-            btn_y = left_y + 60
-            vspace = 68
-            draw_button("开始：大写字母", left_x + 20, btn_y, 'START_1')
-            draw_button("开始：小写字母", left_x + 20, btn_y + vspace, 'START_2')
-            draw_button("开始：拼音", left_x + 20, btn_y + vspace * 2, 'START_3')
-
-            # 右侧：统计面板
-            right_x, right_y, right_w = 460, 150, 280
-            stat_h = 170
-            draw_panel(right_x, right_y, right_w, stat_h, "统计（按 T 也可切换）")
-            def stat_line(lvl):
-                s = compute_stats(cached_rows, recent_n).get(lvl, {'best': 0, 'recent_avg': 0})
-                return f"最佳 {s['best']}｜最近{recent_n}次 {s['recent_avg']}"
-            s1 = SCORE_FONT.render("大写：" + stat_line(1), True, (80, 80, 80))
-            s2 = SCORE_FONT.render("小写：" + stat_line(2), True, (80, 80, 80))
-            s3 = SCORE_FONT.render("拼音：" + stat_line(3), True, (80, 80, 80))
-            screen.blit(s1, (right_x + 16, right_y + 50))
-            screen.blit(s2, (right_x + 16, right_y + 50 + 40))
-            screen.blit(s3, (right_x + 16, right_y + 50 + 80))
-            draw_button(f"切换统计：最近{recent_n}次", right_x + 16, right_y + stat_h - 54, 'TOGGLE_RECENT')
-
-            # 右下：报表与报告
-            rep_y = right_y + stat_h + 20
-            rep_h = 180
-            draw_panel(right_x, rep_y, right_w, rep_h, "报表与报告")
-            draw_button("导出周报 CSV", right_x + 16, rep_y + 50, 'EXPORT_WEEKLY')
-            draw_button("导出月报 CSV", right_x + 16, rep_y + 50 + 48, 'EXPORT_MONTHLY')
-            draw_button("查看学习报告", right_x + 16, rep_y + 50 + 96, 'VIEW_REPORT')
-
-            # 底部提示
-            tip = SCORE_FONT.render("快捷键：1/2/3 开始 · T 切换统计 · E/M 导出 · V 查看报告", True, (120, 120, 120))
-            screen.blit(tip, (WIDTH//2 - tip.get_width()//2, HEIGHT - 50))
-            
-        elif game_state == "PLAY":
-            # 生成目标
-            spawn_timer += 1
-            if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1 and game_state == "MENU":
-                mx, my = event.pos
-                for rect, action in menu_buttons:
-                    if rect.collidepoint(mx, my):
-                        if action == 'START_1':
-                            current_level = 1; targets = []; score = 0; session_active = True; session_start_ts = time.time(); game_state = 'PLAY'
-                        elif action == 'START_2':
-                            current_level = 2; targets = []; score = 0; session_active = True; session_start_ts = time.time(); game_state = 'PLAY'
-                        elif action == 'START_3':
-                            current_level = 3; targets = []; score = 0; session_active = True; session_start_ts = time.time(); game_state = 'PLAY'
-                        elif action == 'TOGGLE_RECENT':
-                            recent_idx = (recent_idx + 1) % len(recent_options)
-                            recent_n = recent_options[recent_idx]
-                        elif action == 'EXPORT_WEEKLY':
-                            export_report('weekly')
-                        elif action == 'EXPORT_MONTHLY':
-                            export_report('monthly')
-                        elif action == 'VIEW_REPORT':
-                            build_and_open_html_report(recent_n)
-                        break
-            if spawn_timer > spawn_rate:
-                spawn_timer = 0
-                if current_level == 1:
-                    txt = random.choice(LEVEL_1)
-                elif current_level == 2:
-                    txt = random.choice(LEVEL_2)
-                else:
-                    txt = random.choice(LEVEL_3)
-                targets.append(Target(txt, speed))
-            
-            # 更新和绘制目标
-            for t in targets[:]:
-                t.move()
-                t.draw(screen)
-                if t.y > HEIGHT:
-                    targets.remove(t)
-                    # 不扣分，不Game Over，只通过让其消失来降低挫败感
-            
+        # 后台报表任务的进度/结果消息
+        for msg in self.jobs.poll():
+            self.set_message(msg)
+        live = self.live_prof
+        if live is not None and live.completed:
+            self.set_message(f"已保存：{live.completed.pop()}")
+            self._release_profiler()
+        if self.game_state != self.drawn_state:
+            renderer.invalidate()
+            self.drawn_state = self.game_state
+        # 消息倒计时，过期时重画菜单以清除提示
+        if self.game_state == "MENU" and self.last_message_ttl > 0:
+            self.last_message_ttl -= elapsed
+            if self.last_message_ttl <= 0:
+                self.last_message_ttl = 0.0
+                self.invalidate_menu()
+        renderer.begin_frame()
+
+        if self.game_state == "MENU":
+            # 菜单是静态画面，只在需要时整屏重画（整帧模式下也只是一次 blit）
+            if renderer.needs_full_redraw:
+                if self.menu_layer is None:
+                    self.menu_layer, self.menu_buttons = self.build_menu_layer()
+                screen.blit(self.menu_layer, (0, 0))
+            prof.lap('draw')
+
+        elif self.game_state == "PLAY":
+            # 固定步长：按真实经过的时间补跑若干步（帧率高于 SIM_HZ 时部分帧不推进）
+            timestep = self.timestep
+            dt = timestep.dt
+            for _ in range(timestep.advance(elapsed)):
+                self.spawn(dt)
+                prof.lap('spawn')
+                # 更新目标（落出屏幕的目标在 update 中移除）
+                fallen_out = self._fallen
+                fallen = self.targets.update(HEIGHT, dt, fallen_out)
+                self.sim_time += dt
+                if fallen and self.difficulty is not None:
+                    self.difficulty.miss(fallen)
+                if fallen_out:
+                    # 落地时仍未打完的目标记为一次未按键的失误
+                    t_ms = int(self.sim_time * 1000)
+                    for text, done, born in fallen_out:
+                        react_ms = int((self.sim_time - max(born, self.last_key_time)) * 1000)
+                        self.recorder.record(t_ms, text, text[done], '', False, react_ms)
+                    fallen_out.clear()
+                prof.lap('move')
+
+            # 绘制目标：在最近两步之间插值，渲染帧率与模拟步长不一致时也保持平滑
+            draw_targets(renderer, self.targets.items(timestep.lag))
+
             # 显示分数
-            score_surf = SCORE_FONT.render(f"得分: {score}", True, COLORS[4])
-            screen.blit(score_surf, (20, 20))
-            
-            # 简单的退出提示
-            esc_surf = SCORE_FONT.render("按 ESC 返回（将记录成绩）", True, (150, 150, 150))
-            screen.blit(esc_surf, (WIDTH - 260, 20))
+            score_surf = TEXT_CACHE.render(SCORE_FONT, f"得分: {self.score}", COLORS[4])
+            renderer.draw(score_surf, (20, 20))
 
-        pygame.display.flip()
-        clock.tick(60)
+            # 简单的退出提示
+            esc_surf = TEXT_CACHE.render(SCORE_FONT, "按 ESC 返回（将记录成绩）", (150, 150, 150))
+            renderer.draw(esc_surf, (WIDTH - 260, 20))
+            prof.lap('draw')
+
+        if self.overlay:
+            self.draw_overlay(elapsed)
+            prof.lap('overlay')
+        renderer.present()
+
+    def startup_report(self):
+        """第一帧显示后调用：模块导入、init() 到首帧、字体查找的耗时（毫秒）。
+
+        time_to_first_frame_ms 从模块开始导入算起，只对进程内第一个 Game 有意义。
+        """
+        now = time.perf_counter()
+        fonts = GAME_FONT.source
+        return {
+            'import_ms': round((IMPORT_DONE - STARTUP_T0) * 1000.0, 2),
+            'run_to_first_frame_ms': round((now - self._init_t0) * 1000.0, 2),
+            'time_to_first_frame_ms': round((now - STARTUP_T0) * 1000.0, 2),
+            'font_resolve_ms': round(fonts.resolve_ms, 2) if fonts.resolved else None,
+            'font_cache_hit': fonts.cache_hit,
+        }
+
+    def telemetry_snapshot(self):
+        """遥测用的状态快照（可 JSON 序列化）。"""
+        snap = {
+            'state': self.game_state,
+            'profile': self.profile_name,
+            'level': self.current_level,
+            'score': self.score,
+            'targets': len(self.targets),
+            'pending_writes': len(self.writer),
+        }
+        if self.live_prof is not None:
+            snap.update(self.live_prof.live_stats())
+        return snap
+
+    def run(self, max_frames=None, script=None, tick=True, profiler=None, frame_dt=None):
+        """运行游戏主循环（在新的 asyncio 事件循环中运行 run_async），参数与返回值见 run_async。"""
+        return asyncio.run(self.run_async(max_frames, script, tick, profiler, frame_dt))
+
+    async def run_async(self, max_frames=None, script=None, tick=True, profiler=None, frame_dt=None):
+        """游戏主循环协程：每帧处理事件、推进模拟并绘制，之后 await 到下一帧，
+        等待期间同一事件循环里的写盘批处理与遥测协程得以运行。
+
+        默认参数即正常游戏；以下参数用于无窗口模拟与性能测试：
+        - max_frames：运行多少帧后自动结束（None 表示直到关闭窗口）
+        - script：script(frame) 返回本帧要注入的 pygame 事件列表
+        - tick：为 False 时不按 render_fps 限速，帧与帧之间不休眠
+        - profiler：engine.profiler.FrameProfiler，记录各阶段耗时（不传时按 F3/F4/F5 可临时启用 LiveProfiler）
+        - frame_dt：每帧推进的模拟时间（秒）；None 表示按真实经过的时间，
+          基准测试传 1/SIM_HZ 使每帧恰好模拟一步，结果与机器快慢无关
+        返回 profiler.report()，另附 startup：启动各阶段耗时（毫秒）。退出前等待本次运行中的记录写完。
+        """
+        base_prof = profiler or NULL_PROFILER
+        if profiler is not None or self.prof is not self.live_prof:
+            self.prof = base_prof  # 浮层/录制进行中时保留 LiveProfiler
+        pacer = FramePacer(self.fps_cap if tick else 0)
+        writer_task = asyncio.create_task(self.writer.run())
+        server = None
+        if self.telemetry_port:
+            try:
+                server = await serve_telemetry(self.telemetry_snapshot, self.telemetry_port)
+            except OSError:
+                server = None  # 端口被占用时不启用遥测
+        startup = None
+        frame = 0
+        last = time.perf_counter()
+        self.running = True
+        try:
+            while self.running:
+                if max_frames is not None and frame >= max_frames:
+                    break
+                # 浮层开关会在帧内替换 self.prof，新的 profiler 从下一帧开始计时
+                prof = self.prof
+                prof.begin_frame()
+                if script is not None:
+                    for scripted in script(frame):
+                        pygame.event.post(scripted)
+                frame += 1
+                now = time.perf_counter()
+                elapsed = now - last if frame_dt is None else frame_dt
+                last = now
+                self.step(elapsed)
+                # step() 以 renderer.present()（display.flip）结束
+                prof.lap('flip')
+                prof.end_frame()
+                if startup is None:
+                    startup = self.startup_report()
+                    if os.environ.get('TYPE_GAME_STARTUP_LOG'):
+                        print(f"startup: {startup}")
+                # 等到下一帧：不算进帧耗时，单独记为 idle
+                t_wait = time.perf_counter()
+                await pacer.wait()
+                prof.idle(time.perf_counter() - t_wait)
+        finally:
+            writer_task.cancel()
+            if server is not None:
+                server.close()
+            await self.writer.drain()
+
+        report = base_prof.report()
+        report['startup'] = startup
+        return report
+
+def run_game(max_frames=None, script=None, tick=True, profiler=None,
+             stress_targets=STRESS_TARGETS, data_dir=None, frame_dt=None):
+    """创建并初始化 Game、运行主循环后释放资源，参数见 Game 与 Game.run()。"""
+    game = Game(data_dir=data_dir, stress_targets=stress_targets).init()
+    try:
+        return game.run(max_frames, script, tick, profiler, frame_dt)
+    finally:
+        game.close()
 
+def main():
+    run_game()
     pygame.quit()
     sys.exit()
 